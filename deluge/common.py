@@ -697,6 +697,49 @@ def parse_human_size(size):
     raise InvalidSize(msg % (size, tokens))
 
 
+def encode_pieces_rle(pieces):
+    """Run-length encodes a list of piece states.
+
+    Args:
+        pieces (list of int): The piece states.
+
+    Returns:
+        list of int: The runs as flat pairs of state and count, e.g.
+            ``[3, 3, 1, 2]`` for ``[3, 3, 3, 1, 1]``.
+
+    """
+    runs = []
+    if not pieces:
+        return runs
+    state = pieces[0]
+    count = 0
+    for piece in pieces:
+        if piece == state:
+            count += 1
+        else:
+            runs.extend((state, count))
+            state = piece
+            count = 1
+    runs.extend((state, count))
+    return runs
+
+
+def decode_pieces_rle(runs):
+    """Decodes the runs of encode_pieces_rle to a list of piece states.
+
+    Args:
+        runs (list of int): The runs as flat pairs of state and count.
+
+    Returns:
+        list of int: The piece states.
+
+    """
+    pieces = []
+    for state, count in zip(runs[::2], runs[1::2]):
+        pieces.extend([state] * count)
+    return pieces
+
+
 def is_url(url):
     """
     A simple test to check if the URL is valid
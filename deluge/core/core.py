@@ -37,9 +37,12 @@
 )
 from deluge.core.eventmanager import EventManager
 from deluge.core.filtermanager import FilterManager
+from deluge.core.geoipcache import GeoIPCache
 from deluge.core.pluginmanager import PluginManager
 from deluge.core.preferencesmanager import PreferencesManager
 from deluge.core.rpcserver import export
+from deluge.core.subscriptionmanager import SubscriptionManager
+from deluge.core.torrent import Torrent
 from deluge.core.torrentmanager import TorrentManager
 from deluge.decorators import deprecated
 from deluge.error import (
@@ -146,6 +149,7 @@ def __init__(
         self.pluginmanager = PluginManager(self)
         self.torrentmanager = TorrentManager()
         self.filtermanager = FilterManager(self)
+        self.subscriptionmanager = SubscriptionManager(self)
         self.authmanager = AuthManager()
 
         # New release check information
@@ -159,6 +163,8 @@ def __init__(
 
         # GeoIP instance with db loaded
         self.geoip_instance = None
+        # The peer country lookups shared by all the torrents
+        self.geoip_cache = GeoIPCache()
 
         # These keys will be dropped from the set_config() RPC and are
         # configurable from the command-line.
@@ -770,26 +776,194 @@ def get_torrent_status(self, torrent_id, keys, diff=False):
         )
 
     @export
-    def get_torrents_status(self, filter_dict, keys, diff=False):
+    def get_torrents_status(self, filter_dict, keys, diff=False, max_age=None):
         """
         returns all torrents , optionally filtered by filter_dict.
+
+        The 'expression' filter_dict key takes filter expressions on the
+        status keys, e.g. 'ratio > 2 and seeding_time > 30d', see
+        deluge.core.filterexpr.
+
+        The status is at most max_age seconds old, by default the
+        TorrentManager status_max_age.
         """
         torrent_ids = self.filtermanager.filter_torrent_ids(filter_dict)
-        d = self.torrentmanager.torrents_status_update(torrent_ids, keys, diff=diff)
-
-        def add_plugin_fields(args):
-            status_dict, plugin_keys = args
-            # Ask the plugin manager to fill in the plugin keys
-            if len(plugin_keys) > 0:
-                for key in status_dict:
-                    status_dict[key].update(
-                        self.pluginmanager.get_status(key, plugin_keys)
-                    )
-            return status_dict
+        d = self.torrentmanager.torrents_status_update(
+            torrent_ids, keys, diff=diff, max_age=max_age
+        )
+        d.addCallback(self._add_plugin_status)
+        return d
+
+    @export
+    def get_torrents_status_page(
+        self,
+        filter_dict,
+        keys,
+        sort_key=None,
+        reverse=False,
+        offset=0,
+        limit=None,
+        max_age=None,
+    ):
+        """Returns a page of the torrents, sorted and filtered by filter_dict.
+
+        The torrents are sorted by the cached status values in the daemon, so
+        only the status of the torrents in the page is sent.
+
+        Args:
+            filter_dict (dict): The filter, as in get_torrents_status.
+            keys (list of str): The status keys of the torrents in the page.
+            sort_key (str, optional): The status key to sort by, the session
+                order if None.
+            reverse (bool, optional): Sort in descending order.
+            offset (int, optional): The index of the first torrent in the page.
+            limit (int, optional): The maximum number of torrents in the page,
+                all the torrents after offset if None.
+            max_age (float, optional): The maximum age of the status in seconds,
+                as in get_torrents_status.
+
+        Returns:
+            Deferred: Fires with a tuple of the number of torrents matching
+                filter_dict and the page, a list of (torrent_id, status) tuples.
+
+        Raises:
+            DelugeError: If offset or limit is negative, or sort_key is not a
+                status key.
+
+        """
+        if offset < 0 or (limit is not None and limit < 0):
+            raise DelugeError('The offset and limit must not be negative')
 
-        d.addCallback(add_plugin_fields)
+        torrent_ids = self.filtermanager.filter_torrent_ids(filter_dict)
+        if sort_key:
+            torrent_ids = self.filtermanager.sort_torrent_ids(
+                torrent_ids, sort_key, reverse
+            )
+        else:
+            # The filters return the torrents in no particular order.
+            matches = set(torrent_ids)
+            torrent_ids = [
+                torrent_id
+                for torrent_id in self.torrentmanager.get_torrent_list()
+                if torrent_id in matches
+            ]
+        total = len(torrent_ids)
+        end = None if limit is None else offset + limit
+        page_ids = torrent_ids[offset:end]
+
+        d = self.torrentmanager.torrents_status_update(page_ids, keys, max_age=max_age)
+        d.addCallback(self._add_plugin_status)
+
+        def on_status(status_dict):
+            return (
+                total,
+                [
+                    (torrent_id, status_dict[torrent_id])
+                    for torrent_id in page_ids
+                    if torrent_id in status_dict
+                ],
+            )
+
+        d.addCallback(on_status)
         return d
 
+    def _add_plugin_status(self, args):
+        status_dict, plugin_keys = args
+        # Ask the plugin manager to fill in the plugin keys
+        if len(plugin_keys) > 0:
+            for key in status_dict:
+                status_dict[key].update(self.pluginmanager.get_status(key, plugin_keys))
+        return status_dict
+
+    @export
+    def get_status_cache_stats(self, reset=False):
+        """Returns the hit and miss counters of the cached torrent status keys.
+
+        The expensive keys files, orig_files, file_progress, peers, pieces and
+        pieces_rle are cached per torrent for a few seconds or until an alert
+        changes them.
+
+        Args:
+            reset (bool, optional): Reset the counters after returning them.
+
+        Returns:
+            dict: The counters in the form ``{key: {'hits': int, 'misses': int}}``.
+
+        """
+        return Torrent.get_status_cache_stats(reset)
+
+    @export
+    def get_geoip_cache_stats(self):
+        """Returns the counters of the peer country lookup cache.
+
+        Returns:
+            dict: The hits, misses, size and max_size of the cache.
+
+        """
+        return self.geoip_cache.get_stats()
+
+    @export
+    def subscribe_status(self, filter_dict, keys, interval=1):
+        """Subscribe the session to status changes of the filtered torrents.
+
+        The session is sent a ``TorrentsStatusChangedEvent`` with only the
+        changed keys of the changed torrents, at most once every interval.
+        A torrent that no longer matches the filter is sent with a status of
+        None. Subscribing again replaces the previous subscription.
+
+        Args:
+            filter_dict (dict): The filter the torrents must match.
+            keys (list of str): The status keys to subscribe to.
+            interval (float, optional): The minimum time in seconds between
+                status updates, defaults to 1.
+
+        Returns:
+            Deferred: Fires with the current status dict of the filtered torrents.
+
+        """
+        rpcserver = component.get('RPCServer')
+        session_id = rpcserver.get_session_id()
+        username = rpcserver.get_session_user()
+        auth_level = rpcserver.get_session_auth_level()
+        d = self.get_torrents_status(dict(filter_dict), keys)
+
+        def on_status(status_dict):
+            self.subscriptionmanager.subscribe(
+                session_id,
+                username,
+                auth_level,
+                filter_dict,
+                keys,
+                interval,
+                status_dict,
+            )
+            return status_dict
+
+        return d.addCallback(on_status)
+
+    @export
+    def get_pushed_status_keys(self, keys):
+        """Returns the status keys of which changes are pushed to subscribed sessions.
+
+        Plugin status keys are only pushed if the plugin reports their changes,
+        the others have to be fetched by the session.
+
+        Args:
+            keys (list of str): The status keys.
+
+        Returns:
+            list: The status keys of which changes are pushed.
+
+        """
+        return self.subscriptionmanager.get_pushed_keys(keys)
+
+    @export
+    def unsubscribe_status(self):
+        """Remove the status subscription of the session."""
+        self.subscriptionmanager.unsubscribe(
+            component.get('RPCServer').get_session_id()
+        )
+
     @export
     def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
         """
@@ -798,6 +972,25 @@ def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
         """
         return self.filtermanager.get_filter_tree(show_zero_hits, hide_cat)
 
+    @export
+    def get_filter_tree_update(self, version, show_zero_hits=True, hide_cat=None):
+        """Returns the filter tree if it changed since a previous request.
+
+        Args:
+            version (int): The version returned with the tree the client has,
+                -1 for none.
+            show_zero_hits (bool): Include the values with no torrents.
+            hide_cat (list of str): The tree fields to leave out.
+
+        Returns:
+            tuple: The current version and the filter tree as in
+                get_filter_tree, the tree is None if unchanged.
+
+        """
+        return self.filtermanager.get_filter_tree_update(
+            version, show_zero_hits, hide_cat
+        )
+
     @export
     def get_session_state(self):
         """Returns a list of torrent_ids in the session."""
@@ -910,7 +1103,9 @@ def set_torrent_options(self, torrent_ids, options):
     @export
     def set_torrent_trackers(self, torrent_id, trackers):
         """Sets a torrents tracker list. trackers will be ``[{"url", "tier"}]``"""
-        return self.torrentmanager[torrent_id].set_trackers(trackers)
+        result = self.torrentmanager[torrent_id].set_trackers(trackers)
+        self.subscriptionmanager.mark_changed([torrent_id])
+        return result
 
     @deprecated
     @export
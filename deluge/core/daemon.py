@@ -19,6 +19,7 @@
 import deluge.component as component
 from deluge.common import get_version, is_ip, is_process_running, windows_check
 from deluge.configmanager import get_config_dir
+from deluge.core.authmanager import AUTH_LEVEL_ADMIN
 from deluge.core.core import Core
 from deluge.core.rpcserver import RPCServer, export
 from deluge.error import DaemonRunningError
@@ -71,6 +72,7 @@ def __init__(
         outgoing_interface=None,
         interface=None,
         port=None,
+        unix_socket=None,
         standalone=False,
         read_only_config_keys=None,
     ):
@@ -84,6 +86,8 @@ def __init__(
                 listen for UI connections on.
             port (int, optional): The port the daemon will listen for UI
                 connections on.
+            unix_socket (str, optional): The path of a Unix domain socket the
+                daemon will also listen for local UI connections on.
             standalone (bool, optional): If True the client is in Standalone
                 mode otherwise, if False, start the daemon as separate process.
             read_only_config_keys (list of str, optional): A list of config
@@ -123,6 +127,9 @@ def win_handler(ctrl_type):
             port = self.core.config['daemon_port']
         self.port = port
 
+        if unix_socket is None:
+            unix_socket = self.core.config['daemon_unix_socket']
+
         if interface and not is_ip(interface):
             log.error('Invalid UI interface (must be IP Address): %s', interface)
             interface = None
@@ -132,6 +139,9 @@ def win_handler(ctrl_type):
             allow_remote=self.core.config['allow_remote'],
             listen=not standalone,
             interface=interface,
+            send_buffer_size=self.core.config['rpc_send_buffer_size'],
+            stuck_timeout=self.core.config['rpc_stuck_timeout'],
+            unix_socket=unix_socket,
         )
 
         log.debug(
@@ -187,6 +197,28 @@ def get_version(self):
         """Returns the daemon version"""
         return get_version()
 
+    @export(AUTH_LEVEL_ADMIN)
+    def get_rpc_stats(self, reset=False):
+        """Returns the RPC call counters per method and per client.
+
+        Args:
+            reset (bool, optional): Reset the counters after returning them.
+
+        Returns:
+            dict: The counters in the form::
+
+                {'since': float,
+                 'methods': {method: {key: value}},
+                 'clients': {client: {key: value}},
+                 'counts': {client: {key: value}}}
+
+            with the keys calls, errors, latency_p50, latency_p95, latency_p99,
+            request_bytes, response_bytes and encode_time. Times are in seconds.
+            The counts are the slow client counters paused, events_coalesced,
+            events_dropped and disconnected.
+        """
+        return self.rpcserver.get_rpc_stats(reset)
+
     @export(1)
     def authorized_call(self, rpc):
         """Determines if session auth_level is authorized to call RPC.
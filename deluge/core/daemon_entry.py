@@ -38,6 +38,12 @@ def add_daemon_options(parser):
         type=int,
         help=_('Port to listen for UI connections on'),
     )
+    group.add_argument(
+        '--unix-socket',
+        metavar='<path>',
+        action='store',
+        help=_('Unix domain socket to also listen for local UI connections on'),
+    )
     group.add_argument(
         '-i',
         '--interface',
@@ -114,6 +120,7 @@ def run_daemon(options):
                 outgoing_interface=options.outgoing_interface,
                 interface=options.ui_interface,
                 port=options.port,
+                unix_socket=options.unix_socket,
                 read_only_config_keys=options.read_only_config_keys.split(','),
             )
             if skip_start:
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Compiles the filter expressions of the 'expression' filter into predicates.
+
+An expression compares torrent status keys to values, combined with ``and``,
+``or``, ``not`` and parentheses, e.g.::
+
+    ratio > 2 and seeding_time > 30d
+    total_size < 1 GiB or (state == Paused and not is_finished == true)
+
+The comparison operators are ``==``, ``!=``, ``<``, ``<=``, ``>`` and ``>=``.
+A value is a number, which may be negative, with an optional size (b, KiB,
+MB, ...) or time (s, m, h, d, w) unit, a quoted or bare string, or ``true``
+and ``false``.
+"""
+
+from __future__ import unicode_literals
+
+import operator
+import re
+from collections import OrderedDict
+
+from deluge.common import size_units
+from deluge.error import InvalidFilterError
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+#: The size units by lowercase prefix, 'm' is a time unit in expressions.
+SIZE_UNITS = {
+    unit['prefix'].lower(): unit['divider']
+    for unit in size_units
+    if unit['prefix'] != 'm'
+}
+
+TIME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+KEYWORDS = {'and', 'or', 'not'}
+
+TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)|
+        (?P<op>==|!=|<=|>=|<|>)|
+        (?P<paren>[()])|
+        (?P<string>"[^"]*"|'[^']*')|
+        (?P<word>[A-Za-z_][\w.-]*)
+    )""",
+    re.VERBOSE,
+)
+
+#: The maximum number of compiled expressions kept.
+CACHE_SIZE = 64
+_cache = OrderedDict()
+
+
+def tokenize(text):
+    """Splits an expression into (kind, value) tokens.
+
+    Raises:
+        InvalidFilterError: If the text has an unknown character.
+
+    """
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if not match:
+            raise InvalidFilterError(
+                'Invalid filter expression at %d: %r' % (pos, text[pos:])
+            )
+        pos = match.end()
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+class FilterExpression(object):
+    """A compiled filter expression.
+
+    Args:
+        text (str): The filter expression.
+
+    Attributes:
+        keys (set): The status keys the expression compares.
+
+    Raises:
+        InvalidFilterError: If the expression can not be parsed.
+
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.keys = set()
+        self.tokens = tokenize(text)
+        self.pos = 0
+        if not self.tokens:
+            raise InvalidFilterError('Empty filter expression')
+        self.match = self._parse_or()
+        if self.pos < len(self.tokens):
+            self._error('Unexpected %r' % self.tokens[self.pos][1])
+        del self.tokens
+
+    def __call__(self, status):
+        """Returns True if the status dict matches the expression."""
+        return self.match(status)
+
+    def _error(self, message):
+        raise InvalidFilterError(
+            'Invalid filter expression %r: %s' % (self.text, message)
+        )
+
+    def _peek(self):
+        try:
+            return self.tokens[self.pos]
+        except IndexError:
+            return None, None
+
+    def _next(self, expected):
+        kind, value = self._peek()
+        if kind is None:
+            self._error('Expected %s at the end' % expected)
+        self.pos += 1
+        return kind, value
+
+    def _accept_word(self, word):
+        kind, value = self._peek()
+        if kind == 'word' and value.lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def _parse_or(self):
+        terms = [self._parse_and()]
+        while self._accept_word('or'):
+            terms.append(self._parse_and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda status: any(term(status) for term in terms)
+
+    def _parse_and(self):
+        terms = [self._parse_not()]
+        while self._accept_word('and'):
+            terms.append(self._parse_not())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda status: all(term(status) for term in terms)
+
+    def _parse_not(self):
+        if self._accept_word('not'):
+            term = self._parse_not()
+            return lambda status: not term(status)
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        kind, value = self._next('a status key')
+        if kind == 'paren' and value == '(':
+            term = self._parse_or()
+            if self._next("')'") != ('paren', ')'):
+                self._error("Expected ')'")
+            return term
+        if kind != 'word' or value.lower() in KEYWORDS:
+            self._error('Expected a status key, got %r' % value)
+        key = value
+
+        kind, value = self._next('an operator')
+        if kind != 'op':
+            self._error('Expected an operator, got %r' % value)
+        compare = OPERATORS[value]
+        operand = self._parse_value()
+        self.keys.add(key)
+
+        def predicate(status):
+            try:
+                return compare(status[key], operand)
+            except (KeyError, TypeError):
+                # No such key or not comparable, e.g. a string to a number.
+                return False
+
+        return predicate
+
+    def _parse_value(self):
+        kind, value = self._next('a value')
+        if kind == 'string':
+            return value[1:-1]
+        if kind == 'word':
+            if value.lower() in KEYWORDS:
+                self._error('Expected a value, got %r' % value)
+            return {'true': True, 'false': False}.get(value.lower(), value)
+        if kind != 'number':
+            self._error('Expected a value, got %r' % value)
+
+        number = float(value) if '.' in value else int(value)
+        unit_kind, unit = self._peek()
+        if unit_kind == 'word':
+            if unit in TIME_UNITS:
+                self.pos += 1
+                return number * TIME_UNITS[unit]
+            if unit.lower() in SIZE_UNITS:
+                self.pos += 1
+                return number * SIZE_UNITS[unit.lower()]
+            if unit.lower() not in KEYWORDS:
+                self._error('Unknown unit %r' % unit)
+        return number
+
+
+def compile_expression(text):
+    """Returns the compiled filter expression, cached by text.
+
+    Args:
+        text (str): The filter expression.
+
+    Returns:
+        FilterExpression: The compiled expression.
+
+    Raises:
+        InvalidFilterError: If the expression can not be parsed.
+
+    """
+    try:
+        expression = _cache.pop(text)
+    except KeyError:
+        expression = FilterExpression(text)
+        if len(_cache) >= CACHE_SIZE:
+            _cache.popitem(last=False)
+    _cache[text] = expression
+    return expression
@@ -15,6 +15,10 @@
 
 import deluge.component as component
 from deluge.common import TORRENT_STATE
+from deluge.core.filterexpr import compile_expression
+from deluge.core.statustable import STATUS_KEYS
+from deluge.core.torrent import Torrent
+from deluge.error import DelugeError, InvalidFilterError
 
 log = logging.getLogger(__name__)
 
@@ -38,10 +42,12 @@ def filter_one_keyword(torrent_ids, keyword):
     searches title,state,tracker-status,tracker,files
     """
     all_torrents = component.get('TorrentManager').torrents
+    # The filename and file paths are searched in the index.
+    matches = component.get('FilterManager').get_keyword_index().search(keyword)
 
     for torrent_id in torrent_ids:
         torrent = all_torrents[torrent_id]
-        if keyword in torrent.filename.lower():
+        if torrent_id in matches:
             yield torrent_id
         elif keyword in torrent.state.lower():
             yield torrent_id
@@ -52,11 +58,6 @@ def filter_one_keyword(torrent_ids, keyword):
         # Want to find broken torrents (search on "error", or "unregistered")
         elif keyword in torrent.tracker_status.lower():
             yield torrent_id
-        else:
-            for t_file in torrent.get_files():
-                if keyword in t_file['path'].lower():
-                    yield torrent_id
-                    break
 
 
 def filter_by_name(torrent_ids, search_string):
@@ -67,17 +68,13 @@ def filter_by_name(torrent_ids, search_string):
         search_string = search_string[0]
         match_case = False
 
-    if match_case is False:
-        search_string = search_string.lower()
+    # The index is of the lowercase names, the case is checked on the matches.
+    matches = component.get('FilterManager').name_index.search(search_string.lower())
 
     for torrent_id in torrent_ids:
-        torrent_name = all_torrents[torrent_id].get_name()
-        if match_case is False:
-            torrent_name = all_torrents[torrent_id].get_name().lower()
-        else:
-            torrent_name = all_torrents[torrent_id].get_name()
-
-        if search_string in torrent_name:
+        if torrent_id not in matches:
+            continue
+        if match_case is False or search_string in all_torrents[torrent_id].get_name():
             yield torrent_id
 
 
@@ -99,6 +96,142 @@ def tracker_error_filter(torrent_ids, values):
     return filtered_torrent_ids
 
 
+class FieldIndex(object):
+    """An inverted index of the torrents by the value of a status field.
+
+    Args:
+        get_value (func): Returns the hashable field value of a torrent, called
+            with the torrent_id.
+
+    """
+
+    def __init__(self, get_value):
+        self.get_value = get_value
+        self.torrent_ids = {}
+        self.values = {}
+
+    def update(self, torrent_id):
+        """Reads the field value of a torrent again.
+
+        Returns:
+            bool: True if the value of the torrent changed.
+
+        """
+        value = self.get_value(torrent_id)
+        if torrent_id in self.values:
+            if self.values[torrent_id] == value:
+                return False
+            self.remove(torrent_id)
+        self.values[torrent_id] = value
+        self.torrent_ids.setdefault(value, set()).add(torrent_id)
+        return True
+
+    def remove(self, torrent_id):
+        """Removes a torrent from the index."""
+        value = self.values.pop(torrent_id)
+        torrent_ids = self.torrent_ids[value]
+        torrent_ids.discard(torrent_id)
+        if not torrent_ids:
+            del self.torrent_ids[value]
+
+    def get_torrent_ids(self, values):
+        """Returns the set of torrents with any of the values."""
+        if len(values) == 1:
+            return self.torrent_ids.get(values[0], set())
+        return set().union(*[self.torrent_ids.get(value, ()) for value in values])
+
+    def get_count(self, value, torrent_ids=None):
+        """Returns the number of torrents with the value, of torrent_ids if given."""
+        ids = self.torrent_ids.get(value, ())
+        if torrent_ids is None:
+            return len(ids)
+        return len(torrent_ids.intersection(ids))
+
+    def get_counts(self, torrent_ids=None):
+        """Returns the number of torrents by value, of torrent_ids if given."""
+        if torrent_ids is None:
+            return {value: len(ids) for value, ids in self.torrent_ids.items()}
+        return {
+            value: len(ids.intersection(torrent_ids))
+            for value, ids in self.torrent_ids.items()
+        }
+
+
+class TextIndex(object):
+    """A trigram index of a lowercase text of the torrents, for substring search.
+
+    Args:
+        get_text (func): Returns the text of a torrent, called with the
+            torrent_id.
+
+    """
+
+    def __init__(self, get_text):
+        self.get_text = get_text
+        self.texts = {}
+        self.trigrams = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def update(self, torrent_id):
+        """Reads the text of a torrent again."""
+        text = self.get_text(torrent_id).lower()
+        if torrent_id in self.texts:
+            if self.texts[torrent_id] == text:
+                return
+            self.remove(torrent_id)
+        self.texts[torrent_id] = text
+        trigrams = self.trigrams
+        for trigram in self.get_trigrams(text):
+            trigrams.setdefault(trigram, set()).add(torrent_id)
+
+    def remove(self, torrent_id):
+        text = self.texts.pop(torrent_id)
+        trigrams = self.trigrams
+        for trigram in self.get_trigrams(text):
+            torrent_ids = trigrams[trigram]
+            torrent_ids.discard(torrent_id)
+            if not torrent_ids:
+                del trigrams[trigram]
+
+    @staticmethod
+    def get_trigrams(text):
+        return {text[i : i + 3] for i in range(len(text) - 2)}
+
+    def search(self, substring, prefix=False):
+        """Returns the torrents with a text containing the substring.
+
+        Args:
+            substring (str): The lowercase string to search for.
+            prefix (bool): Only match the texts starting with the substring.
+
+        Returns:
+            set: The matching torrent_ids.
+
+        """
+        texts = self.texts
+        if len(substring) < 3:
+            # Too short for a trigram, compare all the texts.
+            candidates = texts
+        else:
+            postings = sorted(
+                (
+                    self.trigrams.get(trigram, ())
+                    for trigram in self.get_trigrams(substring)
+                ),
+                key=len,
+            )
+            if not postings[0]:
+                return set()
+            # The trigrams may be apart in the text, check the candidates.
+            candidates = set(postings[0]).intersection(*postings[1:])
+
+        if prefix:
+            return {t_id for t_id in candidates if texts[t_id].startswith(substring)}
+        return {t_id for t_id in candidates if substring in texts[t_id]}
+
+
 class FilterManager(component.Component):
     """FilterManager"""
 
@@ -110,6 +243,7 @@ def __init__(self, core):
         self.registered_filters = {}
         self.register_filter('keyword', filter_keywords)
         self.register_filter('name', filter_by_name)
+        self.register_filter('expression', self.filter_expression)
         self.tree_fields = {}
 
         self.register_tree_field('state', self._init_state_tree)
@@ -126,6 +260,56 @@ def _init_users_tree():
 
         self.register_tree_field('owner', _init_users_tree)
 
+        # The inverted indexes of the fields, kept up to date from the events.
+        # The tree version is increased on any change of the indexed values.
+        self.tree_version = 0
+        self.indexes = {}
+        self.register_index('state', lambda torrent_id: self.torrents[torrent_id].state)
+        self.register_index(
+            'owner', lambda torrent_id: self.torrents[torrent_id].options['owner']
+        )
+        self.register_index(
+            'tracker_host',
+            lambda torrent_id: self.torrents[torrent_id].get_tracker_host(),
+        )
+        # The torrents counted as Active and as tracker Error in the tree.
+        self.active_index = FieldIndex(self._is_active)
+        self.tracker_error_index = FieldIndex(
+            lambda torrent_id: 'Error:' in self.torrents[torrent_id].tracker_status
+        )
+        # The names, and the filename with the file paths searched by keyword,
+        # which is built on the first keyword search.
+        self.name_index = TextIndex(
+            lambda torrent_id: self.torrents[torrent_id].get_name()
+        )
+        self.keyword_index = None
+
+        event_manager = component.get('EventManager')
+        event_manager.register_event_handler('TorrentAddedEvent', self.on_torrent_added)
+        event_manager.register_event_handler(
+            'TorrentRemovedEvent', self.on_torrent_removed
+        )
+        event_manager.register_event_handler(
+            'TorrentStateChangedEvent', self.on_torrent_state_changed
+        )
+        event_manager.register_event_handler(
+            'TorrentOptionsChangedEvent', self.on_torrent_options_changed
+        )
+        event_manager.register_event_handler(
+            'TorrentTrackerStatusEvent', self.on_torrent_tracker_status
+        )
+        event_manager.register_event_handler(
+            'TorrentFileRenamedEvent', self.on_torrent_file_renamed
+        )
+        event_manager.register_event_handler(
+            'TorrentFolderRenamedEvent', self.on_torrent_folder_renamed
+        )
+        alert_manager = component.get('AlertManager')
+        alert_manager.register_handler('state_update_alert', self.on_alert_state_update)
+        alert_manager.register_handler(
+            'metadata_received_alert', self.on_alert_metadata_received
+        )
+
     def filter_torrent_ids(self, filter_dict):
         """
         returns a list of torrent_id's matching filter_dict.
@@ -164,6 +348,15 @@ def filter_torrent_ids(self, filter_dict):
         if not filter_dict:
             return torrent_ids
 
+        # Indexed fields, a set intersection of the torrents with the values.
+        for field in list(filter_dict):
+            if field in self.indexes and field not in self.registered_filters:
+                matches = self.indexes[field].get_torrent_ids(filter_dict.pop(field))
+                torrent_ids = [t_id for t_id in torrent_ids if t_id in matches]
+
+        if not filter_dict:
+            return torrent_ids
+
         # Registered filters
         for field, values in list(filter_dict.items()):
             if field in self.registered_filters:
@@ -179,17 +372,37 @@ def filter_torrent_ids(self, filter_dict):
         torrent_keys, plugin_keys = self.torrents.separate_keys(
             list(filter_dict), torrent_ids
         )
+        # Filter on the status fields in the status table, a column at a time.
+        table_keys = [key for key in torrent_keys if key in STATUS_KEYS]
+        if table_keys:
+            torrent_ids = [
+                t_id for t_id in torrent_ids if t_id in self.torrents.torrents
+            ]
+            for key in table_keys:
+                values = filter_dict.pop(key)
+                torrent_ids = [
+                    torrent_id
+                    for torrent_id, value in zip(
+                        torrent_ids, self.get_table_key(key, torrent_ids)
+                    )
+                    if value in values
+                ]
+            torrent_keys = [key for key in torrent_keys if key not in table_keys]
+
+        if not filter_dict:
+            return torrent_ids
+
         # Leftover filter arguments, default filter on status fields.
-        for torrent_id in list(torrent_ids):
+        def is_match(torrent_id):
             status = self.core.create_torrent_status(
                 torrent_id, torrent_keys, plugin_keys
             )
-            for field, values in filter_dict.items():
-                if field in status and status[field] in values:
-                    continue
-                elif torrent_id in torrent_ids:
-                    torrent_ids.remove(torrent_id)
-        return torrent_ids
+            return all(
+                field in status and status[field] in values
+                for field, values in filter_dict.items()
+            )
+
+        return [torrent_id for torrent_id in torrent_ids if is_match(torrent_id)]
 
     def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
         """
@@ -202,21 +415,41 @@ def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
             for cat in hide_cat:
                 tree_keys.remove(cat)
 
-        torrent_keys, plugin_keys = self.torrents.separate_keys(tree_keys, torrent_ids)
         items = {field: self.tree_fields[field]() for field in tree_keys}
 
-        for torrent_id in list(torrent_ids):
-            status = self.core.create_torrent_status(
-                torrent_id, torrent_keys, plugin_keys
-            )  # status={key:value}
-            for field in tree_keys:
-                value = status[field]
+        # Count the indexed fields from the index, of the torrents of the user.
+        index_keys = [key for key in tree_keys if key in self.indexes]
+        visible_ids = self._get_visible_ids(torrent_ids)
+        for field in index_keys:
+            for value, count in self.indexes[field].get_counts(visible_ids).items():
+                items[field][value] = items[field].get(value, 0) + count
+
+        tree_keys_left = [key for key in tree_keys if key not in index_keys]
+        torrent_keys, plugin_keys = self.torrents.separate_keys(
+            tree_keys_left, torrent_ids
+        )
+
+        # Count the fields in the status table a column at a time.
+        table_keys = [key for key in torrent_keys if key in STATUS_KEYS]
+        for field in table_keys:
+            for value in self.get_table_key(field, torrent_ids):
                 items[field][value] = items[field].get(value, 0) + 1
 
+        torrent_keys = [key for key in torrent_keys if key not in table_keys]
+        status_keys = [key for key in tree_keys_left if key not in table_keys]
+        if status_keys:
+            for torrent_id in list(torrent_ids):
+                status = self.core.create_torrent_status(
+                    torrent_id, torrent_keys, plugin_keys
+                )  # status={key:value}
+                for field in status_keys:
+                    value = status[field]
+                    items[field][value] = items[field].get(value, 0) + 1
+
         if 'tracker_host' in items:
             items['tracker_host']['All'] = len(torrent_ids)
-            items['tracker_host']['Error'] = len(
-                tracker_error_filter(torrent_ids, ('Error',))
+            items['tracker_host']['Error'] = self.tracker_error_index.get_count(
+                True, visible_ids
             )
 
         if not show_zero_hits:
@@ -232,13 +465,52 @@ def get_filter_tree(self, show_zero_hits=True, hide_cat=None):
 
         return sorted_items
 
+    def get_filter_tree_update(self, version, show_zero_hits=True, hide_cat=None):
+        """Returns the filter tree if it changed since version.
+
+        Args:
+            version (int): The tree_version of the tree the client has.
+            show_zero_hits (bool): Include the values with no torrents.
+            hide_cat (list of str): The tree fields to leave out.
+
+        Returns:
+            tuple: The current tree_version and the filter tree, the tree is
+                None if unchanged.
+
+        """
+        tree_keys = [key for key in self.tree_fields if key not in (hide_cat or ())]
+        # The fields without an index can change at any time.
+        if version == self.tree_version and all(
+            key in self.indexes for key in tree_keys
+        ):
+            return self.tree_version, None
+        return (
+            self.tree_version,
+            self.get_filter_tree(show_zero_hits, hide_cat),
+        )
+
+    def bump_tree_version(self):
+        """Marks the filter tree as changed, e.g. after a plugin field changed."""
+        self.tree_version += 1
+
+    def _get_visible_ids(self, torrent_ids):
+        """Returns the torrent_ids as a set, None if all the torrents."""
+        if len(torrent_ids) == len(self.torrents.torrents):
+            return None
+        return set(torrent_ids)
+
+    def _is_active(self, torrent_id):
+        status = self.torrents[torrent_id].status
+        return bool(status.download_payload_rate or status.upload_payload_rate)
+
     def _init_state_tree(self):
+        torrent_ids = self.torrents.get_torrent_list()
         init_state = {}
-        init_state['All'] = len(self.torrents.get_torrent_list())
+        init_state['All'] = len(torrent_ids)
         for state in TORRENT_STATE:
             init_state[state] = 0
-        init_state['Active'] = len(
-            self.filter_state_active(self.torrents.get_torrent_list())
+        init_state['Active'] = self.active_index.get_count(
+            True, self._get_visible_ids(torrent_ids)
         )
         return init_state
 
@@ -255,16 +527,253 @@ def deregister_tree_field(self, field):
         if field in self.tree_fields:
             del self.tree_fields[field]
 
-    def filter_state_active(self, torrent_ids):
-        for torrent_id in list(torrent_ids):
-            status = self.torrents[torrent_id].get_status(
-                ['download_payload_rate', 'upload_payload_rate']
+    def register_index(self, field, get_value):
+        """Registers an inverted index of a status field.
+
+        Filters on the field are then a set lookup instead of reading the status
+        of every torrent. The index is updated when torrents are added or
+        removed, their state changes or an option of the same name is set.
+        Other changes must be reported with update_index.
+
+        Args:
+            field (str): The status field, e.g. 'label'.
+            get_value (func): Returns the hashable field value of a torrent,
+                called with the torrent_id.
+
+        """
+        index = FieldIndex(get_value)
+        for torrent_id in self.torrents.torrents:
+            index.update(torrent_id)
+        self.indexes[field] = index
+        self.tree_version += 1
+
+    def deregister_index(self, field):
+        self.indexes.pop(field, None)
+        self.tree_version += 1
+
+    def update_index(self, field, torrent_id):
+        """Updates the index of a field after the value of a torrent changed.
+
+        Args:
+            field (str): The indexed status field.
+            torrent_id (str): The torrent.
+
+        """
+        if field in self.indexes:
+            self._update_index(self.indexes[field], torrent_id)
+
+    def _update_index(self, index, torrent_id):
+        if torrent_id in self.torrents.torrents and index.update(torrent_id):
+            self.tree_version += 1
+
+    def _get_all_indexes(self):
+        return list(self.indexes.values()) + [
+            self.active_index,
+            self.tracker_error_index,
+        ]
+
+    def filter_expression(self, torrent_ids, expressions):
+        """Filters the torrents with status filter expressions.
+
+        The status keys in the status table are read a column at a time, the
+        others from the cached status of the torrents.
+
+        Args:
+            torrent_ids (list of str): The torrents to filter.
+            expressions (list of str): The filter expressions, see
+                deluge.core.filterexpr, all must match.
+
+        Returns:
+            list: The matching torrent_ids.
+
+        Raises:
+            InvalidFilterError: If an expression is invalid or compares an
+                unknown status key.
+
+        """
+        expressions = [compile_expression(text) for text in expressions]
+        keys = set().union(*[expression.keys for expression in expressions])
+        plugin_fields = self.core.pluginmanager.status_fields
+        unknown_keys = [
+            key
+            for key in keys
+            if key not in Torrent.status_funcs and key not in plugin_fields
+        ]
+        if unknown_keys:
+            raise InvalidFilterError(
+                'Unknown status keys in filter: %s' % ', '.join(sorted(unknown_keys))
             )
-            if status['download_payload_rate'] or status['upload_payload_rate']:
-                pass
+
+        torrent_ids = [t_id for t_id in torrent_ids if t_id in self.torrents.torrents]
+        table_keys = [key for key in keys if key in STATUS_KEYS]
+        torrent_keys = [
+            key
+            for key in sorted(keys)
+            if key in Torrent.status_funcs and key not in table_keys
+        ]
+        plugin_keys = [key for key in keys if key not in Torrent.status_funcs]
+        statuses = self.torrents.get_table_status(torrent_ids, table_keys)
+        if torrent_keys or plugin_keys:
+            for torrent_id in torrent_ids:
+                statuses[torrent_id].update(
+                    self.core.create_torrent_status(
+                        torrent_id, torrent_keys, plugin_keys
+                    )
+                )
+        return [
+            torrent_id
+            for torrent_id in torrent_ids
+            if all(expression(statuses[torrent_id]) for expression in expressions)
+        ]
+
+    def sort_torrent_ids(self, torrent_ids, sort_key, reverse=False):
+        """Sorts the torrents by the cached value of a status key.
+
+        Args:
+            torrent_ids (list of str): The torrents to sort.
+            sort_key (str): The status key to sort by, a torrent or plugin key.
+            reverse (bool): Sort in descending order.
+
+        Returns:
+            list: The sorted torrent_ids, without those no longer in session.
+
+        Raises:
+            DelugeError: If sort_key is not a status key.
+
+        """
+        torrent_ids = [t_id for t_id in torrent_ids if t_id in self.torrents.torrents]
+        if sort_key in STATUS_KEYS:
+            values = self.get_table_key(sort_key, torrent_ids)
+        elif sort_key in Torrent.status_funcs:
+            values = [
+                self.torrents[t_id].get_status([sort_key])[sort_key]
+                for t_id in torrent_ids
+            ]
+        elif sort_key in self.core.pluginmanager.status_fields:
+            values = [
+                self.core.pluginmanager.get_status(t_id, [sort_key]).get(sort_key)
+                for t_id in torrent_ids
+            ]
+        else:
+            raise DelugeError('Unknown sort key: %s' % sort_key)
+
+        def sort_value(item):
+            value = item[0]
+            if isinstance(value, string_types):
+                value = value.lower()
+            # The torrent_id breaks ties, for a stable order between pages.
+            return value, item[1]
+
+        # The torrents without a value go last in either order.
+        items = []
+        missing = []
+        for value, t_id in zip(values, torrent_ids):
+            if value is None:
+                missing.append(t_id)
             else:
-                torrent_ids.remove(torrent_id)
-        return torrent_ids
+                items.append((value, t_id))
+        return [
+            t_id for value, t_id in sorted(items, key=sort_value, reverse=reverse)
+        ] + sorted(missing)
+
+    def get_keyword_index(self):
+        """Returns the index of the filename and file paths of the torrents."""
+        if self.keyword_index is None:
+            self.keyword_index = TextIndex(self._get_keyword_text)
+            for torrent_id in self.torrents.torrents:
+                self.keyword_index.update(torrent_id)
+        return self.keyword_index
+
+    def _get_keyword_text(self, torrent_id):
+        torrent = self.torrents[torrent_id]
+        paths = [t_file['path'] for t_file in torrent.get_files()]
+        return '\n'.join([torrent.filename or ''] + paths)
+
+    def _get_text_indexes(self):
+        if self.keyword_index is None:
+            return [self.name_index]
+        return [self.name_index, self.keyword_index]
+
+    def _update_text_indexes(self, torrent_id):
+        if torrent_id in self.torrents.torrents:
+            for index in self._get_text_indexes():
+                index.update(torrent_id)
+
+    def on_torrent_added(self, torrent_id, from_state):
+        for index in self._get_all_indexes():
+            self._update_index(index, torrent_id)
+        self._update_text_indexes(torrent_id)
+        self.tree_version += 1
+
+    def on_torrent_removed(self, torrent_id):
+        for index in self._get_all_indexes():
+            if torrent_id in index.values:
+                index.remove(torrent_id)
+        for index in self._get_text_indexes():
+            if torrent_id in index.texts:
+                index.remove(torrent_id)
+        self.tree_version += 1
+
+    def on_torrent_state_changed(self, torrent_id, state):
+        self.update_index('state', torrent_id)
+
+    def on_torrent_options_changed(self, torrent_id, keys):
+        for key in keys:
+            self.update_index(key, torrent_id)
+        if 'shared' in keys:
+            # The torrents a user sees in the tree changed.
+            self.tree_version += 1
+        if 'name' in keys and torrent_id in self.torrents.torrents:
+            self.name_index.update(torrent_id)
+
+    def on_torrent_file_renamed(self, torrent_id, index, name):
+        self._update_text_indexes(torrent_id)
+
+    def on_torrent_folder_renamed(self, torrent_id, old, new):
+        self._update_text_indexes(torrent_id)
+
+    def on_alert_metadata_received(self, alert):
+        """Updates the name and paths of a magnet torrent with the metadata."""
+        try:
+            torrent_id = str(alert.handle.info_hash())
+        except RuntimeError:
+            return
+        self._update_text_indexes(torrent_id)
+
+    def on_torrent_tracker_status(self, torrent_id, tracker_status):
+        self._update_index(self.tracker_error_index, torrent_id)
+        self.update_index('tracker_host', torrent_id)
+
+    def on_alert_state_update(self, alert):
+        """Updates the indexes of the values read from the torrent status.
+
+        Called after the TorrentManager has updated the status of the torrents
+        in the state_update_alert.
+        """
+        for t_status in alert.status:
+            try:
+                torrent_id = str(t_status.info_hash)
+            except RuntimeError:
+                continue
+            self._update_index(self.active_index, torrent_id)
+            self.update_index('tracker_host', torrent_id)
+
+    def get_table_key(self, key, torrent_ids):
+        """Returns the values of a status key in the status table of the torrents."""
+        return self.torrents.status_table.get_key(
+            key, torrent_ids, self.torrents.torrents
+        )
+
+    def filter_state_active(self, torrent_ids):
+        return [
+            torrent_id
+            for torrent_id, download_rate, upload_rate in zip(
+                torrent_ids,
+                self.get_table_key('download_payload_rate', torrent_ids),
+                self.get_table_key('upload_payload_rate', torrent_ids),
+            )
+            if download_rate or upload_rate
+        ]
 
     def _hide_state_items(self, state_items):
         """For hide(show)-zero hits"""
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Least recently used cache of the GeoIP peer country lookups."""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+
+class GeoIPCache(object):
+    """A bounded LRU cache of the country codes of peer IPs.
+
+    The same peers are looked up on every status request of the peers of
+    every torrent, so the sanitized country codes are kept by IP for all the
+    torrents. The Core resets the cache when the GeoIP database changes.
+
+    Args:
+        geoip (GeoIP.GeoIP, optional): The GeoIP database, if loaded.
+        max_size (int, optional): The maximum number of IPs kept.
+
+    """
+
+    #: The default maximum number of IPs kept.
+    max_size = 65536
+
+    def __init__(self, geoip=None, max_size=None):
+        if max_size is not None:
+            self.max_size = max_size
+        self.reset(geoip)
+
+    def reset(self, geoip=None):
+        """Empties the cache and resets the counters.
+
+        Args:
+            geoip (GeoIP.GeoIP, optional): The new GeoIP database, if loaded.
+
+        """
+        self.geoip = geoip
+        self.countries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.countries)
+
+    def country_code(self, ip):
+        """Returns the country code of an IP.
+
+        Args:
+            ip (str): The IP address.
+
+        Returns:
+            str: The country code, an empty string if unknown.
+
+        """
+        countries = self.countries
+        try:
+            # Move the IP to the end as most recently used.
+            country = countries.pop(ip)
+        except KeyError:
+            self.misses += 1
+            country = self.lookup(ip)
+            if len(countries) >= self.max_size:
+                countries.popitem(last=False)
+        else:
+            self.hits += 1
+        countries[ip] = country
+        return country
+
+    def lookup(self, ip):
+        """Looks up the country code of an IP in the GeoIP database.
+
+        Args:
+            ip (str): The IP address.
+
+        Returns:
+            str: The country code with any non letters replaced by spaces,
+                an empty string if unknown.
+
+        """
+        try:
+            country = self.geoip.country_code_by_addr(ip)
+        except AttributeError:
+            return ''
+        try:
+            return ''.join([char if char.isalpha() else ' ' for char in country])
+        except TypeError:
+            return ''
+
+    def get_stats(self):
+        """Returns the cache counters.
+
+        Returns:
+            dict: The hits, misses, size and max_size of the cache.
+
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.countries),
+            'max_size': self.max_size,
+        }
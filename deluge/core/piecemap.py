@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Builds the piece map of a torrent for the pieces status keys.
+
+NumPy is used when it is installed, the pure Python builder is used otherwise.
+"""
+
+from __future__ import unicode_literals
+
+from deluge.common import encode_pieces_rle
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#: The piece states, as used by the pieces bar colors.
+PIECE_MISSING = 0  # No known peer has the piece, or not asked for yet.
+PIECE_AVAILABLE = 1  # Available, just not downloaded nor being downloaded.
+PIECE_DOWNLOADING = 2  # Being downloaded from a peer.
+PIECE_COMPLETED = 3
+
+
+def _use_numpy(finished, availability):
+    """Checks if the NumPy builder can be used, zip truncates the lists otherwise."""
+    return numpy is not None and finished and len(finished) == len(availability)
+
+
+def _get_pieces_array(finished, availability, downloading):
+    """Returns the piece states as a NumPy array."""
+    pieces = numpy.where(
+        numpy.asarray(finished, dtype=bool),
+        PIECE_COMPLETED,
+        numpy.asarray(availability) > 0,
+    ).astype(numpy.int8)
+    if downloading:
+        pieces[numpy.asarray(downloading)] = PIECE_DOWNLOADING
+    return pieces
+
+
+def _get_pieces_list(finished, availability, downloading):
+    """Returns the piece states as a list."""
+    pieces = [
+        PIECE_COMPLETED if done else PIECE_AVAILABLE if avail else PIECE_MISSING
+        for done, avail in zip(finished, availability)
+    ]
+    for index in downloading:
+        pieces[index] = PIECE_DOWNLOADING
+    return pieces
+
+
+def get_pieces(finished, availability, downloading):
+    """Returns the state of each piece.
+
+    Args:
+        finished (list of bool): The libtorrent piece bitfield.
+        availability (list of int): The number of peers having each piece.
+        downloading (list of int): The indexes of the pieces being downloaded.
+
+    Returns:
+        list of int: The piece states.
+
+    """
+    if _use_numpy(finished, availability):
+        return _get_pieces_array(finished, availability, downloading).tolist()
+    return _get_pieces_list(finished, availability, downloading)
+
+
+def get_pieces_rle(finished, availability, downloading):
+    """Returns the state of the pieces run-length encoded.
+
+    Most pieces of a torrent are in long runs of the same state, so the runs
+    are much smaller than the list of get_pieces to send to clients. They are
+    decoded with deluge.common.decode_pieces_rle.
+
+    Args:
+        finished (list of bool): The libtorrent piece bitfield.
+        availability (list of int): The number of peers having each piece.
+        downloading (list of int): The indexes of the pieces being downloaded.
+
+    Returns:
+        list of int: The runs as flat pairs of state and count.
+
+    """
+    if not _use_numpy(finished, availability):
+        return encode_pieces_rle(_get_pieces_list(finished, availability, downloading))
+
+    pieces = _get_pieces_array(finished, availability, downloading)
+    starts = numpy.concatenate(([0], numpy.flatnonzero(pieces[1:] != pieces[:-1]) + 1))
+    runs = numpy.empty(len(starts) * 2, dtype=numpy.int64)
+    runs[0::2] = pieces[starts]
+    runs[1::2] = numpy.diff(numpy.append(starts, len(pieces)))
+    return runs.tolist()
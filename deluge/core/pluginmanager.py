@@ -30,6 +30,8 @@ def __init__(self, core):
         component.Component.__init__(self, 'CorePluginManager')
 
         self.status_fields = {}
+        # The status fields the plugins report the changes of.
+        self.pushed_status_fields = set()
 
         # Call the PluginManagerBase constructor
         deluge.pluginmanagerbase.PluginManagerBase.__init__(
@@ -93,16 +95,28 @@ def get_status(self, torrent_id, fields):
                 pass
         return status
 
-    def register_status_field(self, field, function):
+    def register_status_field(self, field, function, push_changes=False):
         """Register a new status field.  This can be used in the same way the
-        client requests other status information from core."""
+        client requests other status information from core.
+
+        If push_changes is True the plugin calls status_changed whenever the
+        field changes, so the changes are pushed to subscribed sessions.
+        Otherwise subscribed sessions keep fetching the field."""
         log.debug('Registering status field %s with PluginManager', field)
         self.status_fields[field] = function
+        if push_changes:
+            self.pushed_status_fields.add(field)
 
     def deregister_status_field(self, field):
         """Deregisters a status field"""
         log.debug('Deregistering status field %s with PluginManager', field)
+        self.pushed_status_fields.discard(field)
         try:
             del self.status_fields[field]
         except Exception:
             log.warning('Unable to deregister status field %s', field)
+
+    def status_changed(self, torrent_ids):
+        """Notify that plugin status fields of the torrents have changed, so the
+        changes are pushed to the sessions subscribed to the fields."""
+        component.get('SubscriptionManager').mark_changed(torrent_ids)
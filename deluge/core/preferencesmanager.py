@@ -43,6 +43,9 @@
     'info_sent': 0.0,
     'daemon_port': 58846,
     'allow_remote': False,
+    'daemon_unix_socket': '',
+    'rpc_send_buffer_size': 4 * 1024 * 1024,
+    'rpc_stuck_timeout': 60,
     'pre_allocate_storage': False,
     'download_location': deluge.common.get_default_download_dir(),
     'listen_ports': [6881, 6891],
@@ -471,6 +474,21 @@ def _on_set_geoip_db_location(self, key, geoipdb_path):
                 log.warning('GeoIP Unavailable')
         else:
             log.warning('Unable to find GeoIP database file: %s', geoipdb_path)
+        # The cached countries are from the previous database.
+        self.core.geoip_cache.reset(self.core.geoip_instance)
+
+    def _on_set_rpc_send_buffer_size(self, key, value):
+        try:
+            component.get('RPCServer').set_send_buffer_size(value)
+        except KeyError:
+            # No RPCServer, e.g. when only testing the core.
+            pass
+
+    def _on_set_rpc_stuck_timeout(self, key, value):
+        try:
+            component.get('RPCServer').set_stuck_timeout(value)
+        except KeyError:
+            pass
 
     def _on_set_cache_size(self, key, value):
         self.core.apply_session_setting('cache_size', value)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Per-torrent storage of the libtorrent fast resume data."""
+
+from __future__ import unicode_literals
+
+import logging
+import os
+from multiprocessing.pool import ThreadPool
+
+from deluge._libtorrent import lt
+from deluge.core.statejournal import fsync_dir
+
+log = logging.getLogger(__name__)
+
+
+class ResumeDataStore(object):
+    """Stores the bencoded resume data of each torrent in its own file.
+
+    The files are sharded into directories by the first two characters of the
+    torrent_id, state/resume/ab/ab57...73.fastresume, so a save only rewrites
+    the torrents with new resume data. Each file is replaced atomically.
+
+    Args:
+        state_dir (str): The directory of the state files.
+        num_threads (int, optional): The number of threads reading the files
+            on load.
+
+    """
+
+    def __init__(self, state_dir, num_threads=8):
+        self.dirpath = os.path.join(state_dir, 'resume')
+        self.num_threads = num_threads
+
+    def get_filepath(self, torrent_id):
+        return os.path.join(self.dirpath, torrent_id[:2], torrent_id + '.fastresume')
+
+    def read(self, torrent_id):
+        """Reads the resume data of a torrent.
+
+        Args:
+            torrent_id (str): The torrent.
+
+        Returns:
+            bytes: The bencoded resume data, None if there is none.
+
+        """
+        try:
+            with open(self.get_filepath(torrent_id), 'rb') as _file:
+                return _file.read() or None
+        except IOError:
+            return None
+
+    def load(self, torrent_ids):
+        """Reads the resume data of the torrents in parallel.
+
+        Args:
+            torrent_ids (list of str): The torrents.
+
+        Returns:
+            dict: The bencoded resume data by torrent_id, of the torrents with
+                resume data.
+
+        """
+        if not torrent_ids or not os.path.isdir(self.dirpath):
+            return {}
+        pool = ThreadPool(min(self.num_threads, len(torrent_ids)))
+        try:
+            resume_data = pool.map(self.read, torrent_ids)
+        finally:
+            pool.close()
+            pool.join()
+        return {
+            torrent_id: data
+            for torrent_id, data in zip(torrent_ids, resume_data)
+            if data is not None
+        }
+
+    def write(self, resume_data):
+        """Writes the resume data of the torrents, each to its own file.
+
+        Args:
+            resume_data (dict): The bencoded, or not yet encoded, resume data
+                by torrent_id.
+
+        Returns:
+            bool: True if all the files were written.
+
+        """
+        dirpaths = set()
+        success = True
+        for torrent_id, data in resume_data.items():
+            if not isinstance(data, bytes):
+                data = lt.bencode(data)
+            filepath = self.get_filepath(torrent_id)
+            filepath_tmp = filepath + '.tmp'
+            dirpath = os.path.dirname(filepath)
+            try:
+                if not os.path.isdir(dirpath):
+                    os.makedirs(dirpath)
+                with open(filepath_tmp, 'wb', 0) as _file:
+                    _file.write(data)
+                    _file.flush()
+                    os.fsync(_file.fileno())
+                os.rename(filepath_tmp, filepath)
+            except (IOError, OSError) as ex:
+                log.error('Unable to save resume data %s: %s', filepath, ex)
+                success = False
+            else:
+                dirpaths.add(dirpath)
+
+        # Sync the rename operations for the directories
+        for dirpath in dirpaths:
+            fsync_dir(dirpath)
+        return success
+
+    def remove(self, torrent_ids):
+        """Removes the resume data files of the torrents."""
+        for torrent_id in torrent_ids:
+            try:
+                os.remove(self.get_filepath(torrent_id))
+            except OSError:
+                pass
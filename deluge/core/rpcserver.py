@@ -14,13 +14,18 @@
 import os
 import stat
 import sys
+import time
 import traceback
-from collections import namedtuple
+from collections import deque, namedtuple
+from timeit import default_timer as timer
 from types import FunctionType
 
+import rencode
 from OpenSSL import crypto
-from twisted.internet import defer, reactor
+from twisted.internet import defer, reactor, task, threads
+from twisted.internet.address import UNIXAddress
 from twisted.internet.protocol import Factory, connectionDone
+from twisted.python.threadpool import ThreadPool
 
 import deluge.component as component
 import deluge.configmanager
@@ -29,6 +34,7 @@
     AUTH_LEVEL_DEFAULT,
     AUTH_LEVEL_NONE,
 )
+from deluge.core.rpcstats import RPCStats
 from deluge.crypto_utils import get_context_factory
 from deluge.error import (
     DelugeError,
@@ -38,11 +44,19 @@
     _ClientSideRecreateError,
 )
 from deluge.event import ClientDisconnectedEvent
-from deluge.transfer import DelugeTransferProtocol
+from deluge.transfer import FLAG_ZLIB, DelugeTransferProtocol
 
 RPC_RESPONSE = 1
 RPC_ERROR = 2
 RPC_EVENT = 3
+RPC_RESPONSE_CHUNK = 4
+
+#: The default number of items per chunk of a daemon.stream response.
+STREAM_CHUNK_SIZE = 1000
+
+#: Events of which only the latest per torrent is kept for a session that is not
+#: reading, keyed by event name and torrent_id.
+COALESCED_EVENTS = ['TorrentStateChangedEvent']
 
 log = logging.getLogger(__name__)
 
@@ -117,6 +131,25 @@ def __init__(self):
         super(DelugeRPCProtocol, self).__init__()
         # namedtuple subclass with auth_level, username for the connected session.
         self.AuthLevel = namedtuple('SessionAuthlevel', 'auth_level, username')
+        # Encoded messages waiting to be written in a single write.
+        self._write_queue = []
+        self._write_queue_size = 0
+        # The index in the write queue of the coalesced events by key.
+        self._write_queue_keys = {}
+        self._write_call = None
+        # The time the transport asked to stop writing, None when writing.
+        self._paused_since = None
+        # Messages waiting for a message before them to be encoded in the
+        # encode thread pool, as [message] lists with None until encoded.
+        self._encoding = deque()
+        # The request size on the wire by request_id, for the RPC stats.
+        self._request_bytes = {}
+        self._message_size = 0
+
+    def _handle_complete_message(self, data, flags=FLAG_ZLIB):
+        # Keep the size of the message for the RPC stats of the requests in it.
+        self._message_size = len(data)
+        super(DelugeRPCProtocol, self)._handle_complete_message(data, flags)
 
     def message_received(self, request):
         """
@@ -137,6 +170,7 @@ def message_received(self, request):
             log.debug('Received invalid message: there are no items')
             return
 
+        request_bytes = self._message_size // len(request)
         for call in request:
             if len(call) != 4:
                 log.debug(
@@ -144,6 +178,7 @@ def message_received(self, request):
                     len(call),
                 )
                 continue
+            self._request_bytes[call[0]] = request_bytes
             # log.debug('RPCRequest: %s', format_request(call))
             reactor.callLater(0, self.dispatch, *call)
 
@@ -155,20 +190,319 @@ def sendData(self, data):  # NOQA: N802
             be one of the RPC message types.
         :type data: object
 
+        :returns: None, or a Deferred if the message is encoded in a thread,
+            see :meth:`transfer_message`.
+
         """
         try:
-            self.transfer_message(data)
+            # Queued messages are written first to keep the message order,
+            # also the events held back while the transport is paused.
+            self.flush_messages(force=True)
+            return self.transfer_message(data)
         except Exception as ex:
             log.warning('Error occurred when sending message: %s.', ex)
             log.exception(ex)
             raise
 
+    def send_response(self, request_id, result, chunk_size=None):
+        """
+        Sends a RPC_RESPONSE to the client.
+
+        With a `chunk_size`, a dict or list result with more items is sent as
+        RPC_RESPONSE_CHUNK messages of `chunk_size` items each, followed by a
+        RPC_RESPONSE with the last items.
+
+        :param request_id: the request_id from the client.
+        :type request_id: int
+        :param result: the result of the RPC.
+        :param chunk_size: the number of items per chunk, None to send the
+            result in a single message.
+        :type chunk_size: int
+
+        :returns: a Deferred firing with the size of the response in bytes and
+            the time spent encoding it.
+        :rtype: twisted.internet.defer.Deferred
+
+        """
+        if (
+            chunk_size
+            and isinstance(result, (dict, list, tuple))
+            and len(result) > chunk_size
+        ):
+            return self._send_chunks(request_id, result, chunk_size)
+        return self._send_message((RPC_RESPONSE, request_id, result))
+
+    def _send_message(self, data):
+        """
+        Sends the data to the client.
+
+        :returns: a Deferred firing with the size of the message in bytes and
+            the time spent encoding it.
+        :rtype: twisted.internet.defer.Deferred
+
+        """
+        self.flush_messages()
+        bytes_sent = self._bytes_sent
+        started = timer()
+        d = self.sendData(data)
+        if d is None:
+            return defer.succeed((self._bytes_sent - bytes_sent, timer() - started))
+        return d
+
+    @defer.inlineCallbacks
+    def _send_chunks(self, request_id, result, chunk_size):
+        """
+        Sends the result in chunks, one chunk per reactor iteration, so the
+        chunks are encoded as they are sent and other sessions are served in
+        between.
+        """
+        if isinstance(result, dict):
+            items = list(result.items())
+            chunks = [
+                dict(items[i : i + chunk_size])
+                for i in range(0, len(items), chunk_size)
+            ]
+        else:
+            chunks = [
+                result[i : i + chunk_size] for i in range(0, len(result), chunk_size)
+            ]
+
+        response_bytes = 0
+        encode_time = 0.0
+        for index, chunk in enumerate(chunks):
+            if index:
+                yield task.deferLater(reactor, 0, lambda: None)
+                if not self.valid_session():
+                    # The client disconnected.
+                    break
+            message_type = (
+                RPC_RESPONSE if index == len(chunks) - 1 else RPC_RESPONSE_CHUNK
+            )
+            sent = yield self._send_message((message_type, request_id, chunk))
+            response_bytes += sent[0]
+            encode_time += sent[1]
+        defer.returnValue((response_bytes, encode_time))
+
+    def transfer_message(self, data):
+        """
+        Encodes and sends the data.
+
+        Large messages are compressed in the RPCServer encode thread pool so
+        the reactor is not blocked. The messages sent after it are held back
+        until it is written to keep the message order.
+
+        :param data: data to be transfered in a data structure serializable by rencode.
+
+        :returns: None if the message was written, or a Deferred firing with
+            the size of the message and the encode time once it is written.
+        :rtype: twisted.internet.defer.Deferred
+
+        """
+        started = timer()
+        payload = rencode.dumps(data)
+        encode_pool = self.factory.encode_pool
+        if encode_pool is None or len(payload) < self.factory.encode_thread_min_size:
+            self.write_message(self.encode_payload(payload))
+            return None
+
+        rencode_time = timer() - started
+        # Check the peer address now, the transport is not thread-safe.
+        self.get_encoding_key()
+        entry = [None]
+        self._encoding.append(entry)
+
+        def encode():
+            encode_started = timer()
+            return self.encode_payload(payload), timer() - encode_started
+
+        def on_encoded(result):
+            message, encode_time = result
+            entry[0] = message
+            self._write_encoded()
+            return len(message), rencode_time + encode_time
+
+        def on_encode_error(failure):
+            entry[0] = b''
+            self._write_encoded()
+            return failure
+
+        d = threads.deferToThreadPool(reactor, encode_pool, encode)
+        return d.addCallbacks(on_encoded, on_encode_error)
+
+    def write_message(self, message):
+        """
+        Writes an encoded message to the transport, after any message still
+        being encoded.
+
+        :param message: the encoded message.
+        :type message: bytes
+
+        """
+        if self._encoding:
+            self._encoding.append([message])
+            return
+        self._bytes_sent += len(message)
+        self.transport.write(message)
+
+    def _write_encoded(self):
+        """
+        Writes the messages held back by messages encoded in a thread, up to
+        the first message that is still being encoded.
+        """
+        while self._encoding and self._encoding[0][0] is not None:
+            message = self._encoding.popleft()[0]
+            if message:
+                self._bytes_sent += len(message)
+                self.transport.write(message)
+
+    def set_client_protocol_version(self, protocol_version):
+        """
+        Sets the protocol version a client sent in daemon.info or daemon.login.
+
+        :param protocol_version: the highest protocol version supported by the client.
+        :type protocol_version: int
+
+        :raises TypeError: if the protocol version is not an int.
+
+        """
+        if not isinstance(protocol_version, int):
+            raise TypeError('Invalid protocol_version: %r' % (protocol_version,))
+        self.set_peer_protocol_version(protocol_version)
+
+    def get_client_name(self):
+        """
+        Returns the name of the client of this session used in the RPC stats.
+
+        :returns: the username and host of the client, e.g. 'user@127.0.0.1'
+        :rtype: str
+
+        """
+        try:
+            username = self.factory.authorized_sessions[
+                self.transport.sessionno
+            ].username
+            host = self.get_peer_host()
+        except (AttributeError, KeyError):
+            return 'unknown'
+        return '%s@%s' % (username, host)
+
+    def queue_message(self, message, key=None):
+        """
+        Queues an encoded message to be sent to the client. The messages queued
+        in the same reactor iteration are sent with a single write.
+
+        While the transport is paused (the client is not reading) the messages
+        are held back, until it resumes or a response is sent. A message with
+        the same `key` as a held back message replaces it, and other messages
+        are dropped once the held back messages exceed the send buffer size.
+
+        :param message: the message as returned by :meth:`encode_message`.
+        :type message: bytes
+        :param key: the key used to coalesce the message, e.g. (event name, torrent_id)
+        :type key: tuple
+
+        """
+        if self._paused_since is not None:
+            if key is not None and key in self._write_queue_keys:
+                index = self._write_queue_keys[key]
+                self._write_queue_size -= len(self._write_queue[index])
+                self._write_queue[index] = b''
+                self.factory.rpc_stats.add_count(
+                    self.get_client_name(), 'events_coalesced'
+                )
+            elif self._write_queue_size + len(message) > self.factory.send_buffer_size:
+                self.factory.rpc_stats.add_count(
+                    self.get_client_name(), 'events_dropped'
+                )
+                return
+
+        if key is not None:
+            self._write_queue_keys[key] = len(self._write_queue)
+        self._write_queue.append(message)
+        self._write_queue_size += len(message)
+        if self._write_call is None and self._paused_since is None:
+            self._write_call = reactor.callLater(0, self.flush_messages)
+
+    def flush_messages(self, force=False):
+        """
+        Sends the queued messages to the client.
+
+        :param force: send the messages held back while the transport is
+            paused, e.g. before a response that must follow them.
+        :type force: bool
+
+        """
+        if self._write_call is not None:
+            if self._write_call.active():
+                self._write_call.cancel()
+            self._write_call = None
+
+        if not self._write_queue or (self._paused_since is not None and not force):
+            return
+
+        messages = b''.join(self._write_queue)
+        self._write_queue = []
+        self._write_queue_size = 0
+        self._write_queue_keys = {}
+        try:
+            self.write_message(messages)
+        except Exception as ex:
+            log.warning('Error occurred when sending queued messages: %s.', ex)
+
+    def pauseProducing(self):  # NOQA: N802
+        """
+        Called by the transport when its send buffer is full, i.e. the client
+        is not reading fast enough.
+        """
+        if self._paused_since is None:
+            self._paused_since = time.time()
+            self.factory.rpc_stats.add_count(self.get_client_name(), 'paused')
+
+    def resumeProducing(self):  # NOQA: N802
+        """
+        Called by the transport when its send buffer has been drained.
+        """
+        self._paused_since = None
+        self.flush_messages()
+
+    def stopProducing(self):  # NOQA: N802
+        """
+        Called by the transport when the connection is lost.
+        """
+        self._paused_since = None
+        self._write_queue = []
+        self._write_queue_size = 0
+        self._write_queue_keys = {}
+
+    def is_stuck(self, timeout):
+        """
+        Checks if the client has not been reading for longer than timeout.
+
+        :param timeout: the time in seconds
+        :type timeout: float
+
+        :returns: True if the transport has been paused for longer than timeout
+        :rtype: bool
+
+        """
+        return (
+            self._paused_since is not None
+            and time.time() - self._paused_since > timeout
+        )
+
     def connectionMade(self):  # NOQA: N802
         """
         This method is called when a new client connects.
         """
         peer = self.transport.getPeer()
-        log.info('Deluge Client connection made from: %s:%s', peer.host, peer.port)
+        if isinstance(peer, UNIXAddress):
+            log.info(
+                'Deluge Client connection made on: %s', self.transport.getHost().name
+            )
+        else:
+            log.info('Deluge Client connection made from: %s:%s', peer.host, peer.port)
+        # The transport pauses the session when the client is not reading.
+        self.transport.registerProducer(self, True)
         # Set the initial auth level of this session to AUTH_LEVEL_NONE
         self.factory.authorized_sessions[self.transport.sessionno] = self.AuthLevel(
             AUTH_LEVEL_NONE, ''
@@ -183,6 +517,13 @@ def connectionLost(self, reason=connectionDone):  # NOQA: N802
 
         """
 
+        if self._write_call is not None and self._write_call.active():
+            self._write_call.cancel()
+        self._write_call = None
+        self.stopProducing()
+        self._request_bytes = {}
+        self._encoding.clear()
+
         # We need to remove this session from various dicts
         del self.factory.authorized_sessions[self.transport.sessionno]
         if self.transport.sessionno in self.factory.session_protocols:
@@ -215,6 +556,45 @@ def dispatch(self, request_id, method, args, kwargs):
         :type kwargs: dict
 
         """
+        started = timer()
+        request_bytes = self._request_bytes.pop(request_id, 0)
+        # The number of items per chunk of a streamed response.
+        chunk_size = None
+
+        def add_call_stats(response_bytes=0, encode_time=0.0, error=False):
+            self.factory.rpc_stats.add_call(
+                method,
+                self.get_client_name(),
+                timer() - started,
+                request_bytes,
+                response_bytes,
+                encode_time,
+                error,
+            )
+
+        def send_result(result):
+            """
+            Sends the result in a RPC_RESPONSE and adds the call to the RPC stats.
+            """
+
+            def on_sent(result):
+                response_bytes, encode_time = result
+                add_call_stats(response_bytes, encode_time)
+
+            def on_send_fail(failure):
+                try:
+                    failure.raiseException()
+                except Exception:
+                    send_error()
+                add_call_stats(error=True)
+
+            try:
+                d = self.send_response(request_id, result, chunk_size)
+            except Exception:
+                send_error()
+                add_call_stats(error=True)
+            else:
+                d.addCallbacks(on_sent, on_send_fail)
 
         def send_error():
             """
@@ -254,7 +634,15 @@ def send_error():
 
         if method == 'daemon.info':
             # This is a special case and used in the initial connection process
-            self.sendData((RPC_RESPONSE, request_id, deluge.common.get_version()))
+            # Newer clients advertise their highest supported protocol version
+            # here, older clients send no arguments.
+            try:
+                if 'protocol_version' in kwargs:
+                    self.set_client_protocol_version(kwargs['protocol_version'])
+            except Exception:
+                send_error()
+            else:
+                self.sendData((RPC_RESPONSE, request_id, deluge.common.get_version()))
             return
         elif method == 'daemon.login':
             # This is a special case and used in the initial connection process
@@ -264,6 +652,9 @@ def send_error():
                 client_version = kwargs.pop('client_version', None)
                 if client_version is None:
                     raise IncompatibleClient(deluge.common.get_version())
+                protocol_version = kwargs.pop('protocol_version', None)
+                if protocol_version is not None:
+                    self.set_client_protocol_version(protocol_version)
                 ret = component.get('AuthManager').authorize(*args, **kwargs)
                 if ret:
                     self.factory.authorized_sessions[
@@ -299,6 +690,39 @@ def send_error():
                 self.sendData((RPC_RESPONSE, request_id, (True)))
             return
 
+        if method == 'daemon.batch':
+            log.debug('RPC dispatch daemon.batch')
+            # This special case allows clients to send many calls in one request.
+            # The calls are checked and run individually and the response is a
+            # list with the result or error of each call.
+            try:
+                calls = [tuple(call) for call in args[0]]
+                for call in calls:
+                    if len(call) != 3:
+                        raise ValueError(
+                            'Invalid batch call: number of items in call is %s'
+                            % len(call)
+                        )
+                d = self._dispatch_batch(calls, kwargs.get('concurrent', False))
+            except Exception:
+                send_error()
+                add_call_stats(error=True)
+            else:
+                d.addCallback(send_result)
+            return
+
+        if method == 'daemon.stream':
+            # This special case runs the call in the args and sends a large
+            # result in chunks so the client can use it as it arrives.
+            try:
+                chunk_size = max(1, int(kwargs.get('chunk_size', STREAM_CHUNK_SIZE)))
+                method, args, kwargs = args
+                log.debug('RPC dispatch daemon.stream %s', method)
+            except Exception:
+                send_error()
+                add_call_stats(error=True)
+                return
+
         if method not in self.factory.methods:
             try:
                 # Raise exception to be sent back to client
@@ -309,23 +733,10 @@ def send_error():
 
         log.debug('RPC dispatch %s', method)
         try:
-            method_auth_requirement = self.factory.methods[method]._rpcserver_auth_level
-            auth_level = self.factory.authorized_sessions[
-                self.transport.sessionno
-            ].auth_level
-            if auth_level < method_auth_requirement:
-                # This session is not allowed to call this method
-                log.debug(
-                    'Session %s is attempting an unauthorized method call!',
-                    self.transport.sessionno,
-                )
-                raise NotAuthorizedError(auth_level, method_auth_requirement)
-            # Set the session_id in the factory so that methods can know
-            # which session is calling it.
-            self.factory.session_id = self.transport.sessionno
-            ret = self.factory.methods[method](*args, **kwargs)
+            ret = self._call_method(method, args, kwargs)
         except Exception as ex:
             send_error()
+            add_call_stats(error=True)
             # Don't bother printing out DelugeErrors, because they are just
             # for the client
             if not isinstance(ex, DelugeError):
@@ -336,10 +747,7 @@ def send_error():
             if isinstance(ret, defer.Deferred):
 
                 def on_success(result):
-                    try:
-                        self.sendData((RPC_RESPONSE, request_id, result))
-                    except Exception:
-                        send_error()
+                    send_result(result)
                     return result
 
                 def on_fail(failure):
@@ -347,11 +755,132 @@ def on_fail(failure):
                         failure.raiseException()
                     except Exception:
                         send_error()
+                    add_call_stats(error=True)
                     return failure
 
                 ret.addCallbacks(on_success, on_fail)
             else:
-                self.sendData((RPC_RESPONSE, request_id, ret))
+                send_result(ret)
+
+    def _call_method(self, method, args, kwargs):
+        """
+        Calls a registered method after checking the auth level of the session.
+
+        :param method: the local method to call.
+        :type method: str
+        :param args: the arguments to pass to `method`
+        :type args: list
+        :param kwargs: the keyword-arguments to pass to `method`
+        :type kwargs: dict
+
+        :returns: the return value of `method`
+
+        :raises NotAuthorizedError: if the session auth level is too low
+
+        """
+        method_auth_requirement = self.factory.methods[method]._rpcserver_auth_level
+        auth_level = self.factory.authorized_sessions[
+            self.transport.sessionno
+        ].auth_level
+        if auth_level < method_auth_requirement:
+            # This session is not allowed to call this method
+            log.debug(
+                'Session %s is attempting an unauthorized method call!',
+                self.transport.sessionno,
+            )
+            raise NotAuthorizedError(auth_level, method_auth_requirement)
+        # Set the session_id in the factory so that methods can know
+        # which session is calling it.
+        self.factory.session_id = self.transport.sessionno
+        return self.factory.methods[method](*args, **kwargs)
+
+    def _get_error_info(self):
+        """
+        Returns the exception that is being handled in the form sent in a RPC_ERROR.
+
+        :returns: (exception name, args, kwargs, formatted traceback)
+        :rtype: tuple
+
+        """
+        exc_type, exc_value, dummy_exc_trace = sys.exc_info()
+        formated_tb = traceback.format_exc()
+        if hasattr(exc_value, '_args') and hasattr(exc_value, '_kwargs'):
+            return exc_type.__name__, exc_value._args, exc_value._kwargs, formated_tb
+        # This is not a deluge exception so wrap it
+        try:
+            raise WrappedException(str(exc_value), exc_type.__name__, formated_tb)
+        except WrappedException:
+            return self._get_error_info()
+
+    def _dispatch_batch_call(self, method, args, kwargs):
+        """
+        Runs a single call of a batch request.
+
+        :returns: a Deferred that fires with either (RPC_RESPONSE, result)
+            or (RPC_ERROR, exception name, args, kwargs, traceback).
+        :rtype: twisted.internet.defer.Deferred
+
+        """
+
+        started = timer()
+
+        def add_call_stats(error=False):
+            self.factory.rpc_stats.add_call(
+                method, self.get_client_name(), timer() - started, error=error
+            )
+
+        def on_success(result):
+            add_call_stats()
+            return (RPC_RESPONSE, result)
+
+        def on_fail(failure):
+            add_call_stats(error=True)
+            try:
+                failure.raiseException()
+            except Exception:
+                return (RPC_ERROR,) + self._get_error_info()
+
+        try:
+            if method not in self.factory.methods:
+                raise AttributeError('RPC call on invalid function: %s' % method)
+            log.debug('RPC dispatch %s (batch)', method)
+            ret = self._call_method(method, args, kwargs)
+        except Exception as ex:
+            if not isinstance(ex, (DelugeError, AttributeError)):
+                log.exception('Exception calling RPC request: %s', ex)
+            add_call_stats(error=True)
+            return defer.succeed((RPC_ERROR,) + self._get_error_info())
+
+        if isinstance(ret, defer.Deferred):
+            return ret.addCallbacks(on_success, on_fail)
+        return defer.succeed(on_success(ret))
+
+    @defer.inlineCallbacks
+    def _dispatch_batch(self, calls, concurrent=False):
+        """
+        Runs the calls of a batch request.
+
+        :param calls: the calls as (method, args, kwargs) tuples.
+        :type calls: list
+        :param concurrent: if True, all the calls are started without waiting
+            for the Deferred returned by the previous call to fire.
+        :type concurrent: bool
+
+        :returns: a Deferred that fires with the list of call results in the
+            same order as `calls`.
+        :rtype: twisted.internet.defer.Deferred
+
+        """
+        if concurrent:
+            results = yield defer.gatherResults(
+                [self._dispatch_batch_call(*call) for call in calls]
+            )
+        else:
+            results = []
+            for call in calls:
+                result = yield self._dispatch_batch_call(*call)
+                results.append(result)
+        defer.returnValue(results)
 
 
 class RPCServer(component.Component):
@@ -368,10 +897,35 @@ class RPCServer(component.Component):
     :type allow_remote: bool
     :param listen: if False, will not start listening.. This is only useful in Classic Mode
     :type listen: bool
+    :param send_buffer_size: the maximum size in bytes of the events held back
+        for a session that is not reading.
+    :type send_buffer_size: int
+    :param stuck_timeout: the time in seconds after which a session that is not
+        reading is disconnected.
+    :type stuck_timeout: float
+    :param encode_threads: the number of threads used to compress large messages.
+    :type encode_threads: int
+    :param unix_socket: the path of a Unix domain socket to also listen on for
+        local clients, without TLS.
+    :type unix_socket: str
     """
 
-    def __init__(self, port=58846, interface='', allow_remote=False, listen=True):
-        component.Component.__init__(self, 'RPCServer')
+    #: Encoded messages of at least this size (in bytes) are compressed in the
+    #: encode thread pool instead of the reactor thread.
+    encode_thread_min_size = 256 * 1024
+
+    def __init__(
+        self,
+        port=58846,
+        interface='',
+        allow_remote=False,
+        listen=True,
+        send_buffer_size=4 * 1024 * 1024,
+        stuck_timeout=60,
+        encode_threads=2,
+        unix_socket=None,
+    ):
+        component.Component.__init__(self, 'RPCServer', interval=5)
 
         self.factory = Factory()
         self.factory.protocol = DelugeRPCProtocol
@@ -386,6 +940,16 @@ def __init__(self, port=58846, interface='', allow_remote=False, listen=True):
         self.factory.session_protocols = {}
         # Holds the interested event list for the sessions
         self.factory.interested_events = {}
+        # Holds the per-method and per-client RPC counters
+        self.factory.rpc_stats = RPCStats()
+        # The slow client limits
+        self.factory.send_buffer_size = send_buffer_size
+        self.factory.stuck_timeout = stuck_timeout
+        # The thread pool for compressing large messages, created on start.
+        self.encode_threads = encode_threads
+        self.factory.encode_pool = None
+        self.factory.encode_thread_min_size = self.encode_thread_min_size
+        self.unix_port = None
 
         self.listen = listen
         if not listen:
@@ -415,6 +979,30 @@ def __init__(self, port=58846, interface='', allow_remote=False, listen=True):
             log.debug('Daemon already running or port not available.: %s', ex)
             raise
 
+        if unix_socket:
+            self.listen_unix(unix_socket)
+
+    def listen_unix(self, path):
+        """
+        Listens for local clients on a Unix domain socket.
+
+        The connections use the same RPC protocol without TLS, as they never
+        leave the host. The socket is only accessible by the daemon user.
+
+        :param path: the path of the socket file
+        :type path: str
+
+        """
+        if not hasattr(reactor, 'listenUNIX'):
+            log.warning('Unix domain sockets are not supported on this platform')
+            return
+
+        log.info('Starting DelugeRPC server on Unix socket %s', path)
+        # With wantPID a stale socket file left by a crashed daemon is replaced.
+        self.unix_port = reactor.listenUNIX(
+            path, self.factory, mode=0o600, wantPID=True
+        )
+
     def register_object(self, obj, name=None):
         """
         Registers an object to export it's rpc methods.  These methods should
@@ -469,6 +1057,22 @@ def get_method_list(self):
         """
         return list(self.factory.methods)
 
+    def get_rpc_stats(self, reset=False):
+        """
+        Returns the RPC counters per method and per client.
+
+        :param reset: if True, the counters are reset after being returned.
+        :type reset: bool
+
+        :returns: the RPC stats, see :meth:`deluge.core.rpcstats.RPCStats.get_stats`
+        :rtype: dict
+
+        """
+        stats = self.factory.rpc_stats.get_stats()
+        if reset:
+            self.factory.rpc_stats.reset()
+        return stats
+
     def get_session_id(self):
         """
         Returns the session id of the current RPC.
@@ -538,13 +1142,28 @@ def emit_event(self, event):
         """
         log.debug('intevents: %s', self.factory.interested_events)
         # Find sessions interested in this event
-        for session_id, interest in self.factory.interested_events.items():
-            if event.name in interest:
-                log.debug('Emit Event: %s %s', event.name, event.args)
-                # This session is interested so send a RPC_EVENT
-                self.factory.session_protocols[session_id].sendData(
-                    (RPC_EVENT, event.name, event.args)
-                )
+        protocols = [
+            self.factory.session_protocols[session_id]
+            for session_id, interest in self.factory.interested_events.items()
+            if event.name in interest
+        ]
+        if not protocols:
+            return
+
+        log.debug('Emit Event: %s %s', event.name, event.args)
+        # The event is serialized once and the encoded message is shared by
+        # all the sessions using the same message encoding.
+        payload = rencode.dumps((RPC_EVENT, event.name, event.args))
+        messages = {}
+        coalesce_key = None
+        if event.name in COALESCED_EVENTS:
+            coalesce_key = (event.name, event.args[0])
+        for protocol in protocols:
+            key = protocol.get_encoding_key()
+            if key not in messages:
+                messages[key] = protocol.encode_payload(payload)
+            # This session is interested so send a RPC_EVENT
+            protocol.queue_message(messages[key], coalesce_key)
 
     def emit_event_for_session_id(self, session_id, event):
         """
@@ -586,8 +1205,56 @@ def emit_event_for_session_id(self, session_id, event):
             (RPC_EVENT, event.name, event.args)
         )
 
+    def set_send_buffer_size(self, size):
+        """
+        Sets the maximum size of the events held back for a session that is
+        not reading. Events above this size are dropped.
+
+        :param size: the size in bytes
+        :type size: int
+
+        """
+        self.factory.send_buffer_size = size
+
+    def set_stuck_timeout(self, timeout):
+        """
+        Sets the time after which a session that is not reading is disconnected.
+
+        :param timeout: the time in seconds
+        :type timeout: float
+
+        """
+        self.factory.stuck_timeout = timeout
+
+    def update(self):
+        # Disconnect the sessions that have stopped reading.
+        for session_id, protocol in list(self.factory.session_protocols.items()):
+            if not protocol.is_stuck(self.factory.stuck_timeout):
+                continue
+            log.warning(
+                'Disconnecting session %s (%s) not reading for over %s seconds',
+                session_id,
+                protocol.get_client_name(),
+                self.factory.stuck_timeout,
+            )
+            self.factory.rpc_stats.add_count(protocol.get_client_name(), 'disconnected')
+            protocol.transport.abortConnection()
+
+    def start(self):
+        if self.encode_threads:
+            self.factory.encode_pool = ThreadPool(
+                0, self.encode_threads, 'RPCServerEncoder'
+            )
+            self.factory.encode_pool.start()
+
     def stop(self):
         self.factory.state = 'stopping'
+        if self.factory.encode_pool is not None:
+            self.factory.encode_pool.stop()
+            self.factory.encode_pool = None
+        if self.unix_port is not None:
+            unix_port, self.unix_port = self.unix_port, None
+            return unix_port.stopListening()
 
 
 def check_ssl_keys():
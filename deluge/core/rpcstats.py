@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Per-method and per-client RPC statistics."""
+
+from __future__ import division, unicode_literals
+
+import time
+from collections import deque
+
+
+def percentile(sorted_values, percent):
+    """Returns the nearest-rank percentile of a sorted list.
+
+    Args:
+        sorted_values (list): The values in ascending order.
+        percent (int): The percentile to return, from 0 to 100.
+
+    Returns:
+        float: The percentile value or 0 if there are no values.
+
+    """
+    if not sorted_values:
+        return 0
+    index = int(round(percent / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class CallStats(object):
+    """The counters of an RPC method or a client."""
+
+    def __init__(self, max_samples):
+        self.calls = 0
+        self.errors = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.encode_time = 0.0
+        # Only the most recent latencies are kept for the percentiles.
+        self.latencies = deque(maxlen=max_samples)
+
+    def add(self, latency, request_bytes, response_bytes, encode_time, error):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        self.encode_time += encode_time
+        self.latencies.append(latency)
+
+    def to_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'latency_p50': percentile(latencies, 50),
+            'latency_p95': percentile(latencies, 95),
+            'latency_p99': percentile(latencies, 99),
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'encode_time': self.encode_time,
+        }
+
+
+class RPCStats(object):
+    """Keeps the counters of the RPC calls handled by the RPCServer.
+
+    The calls are counted both per method and per client, the client being
+    the username and host of the session, to find out which methods are
+    expensive and which client is calling them.
+
+    Latencies and encode times are in seconds.
+
+    """
+
+    #: The number of recent latencies kept per method for the percentiles.
+    max_samples = 1024
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Resets all the counters."""
+        self.methods = {}
+        self.clients = {}
+        self.counts = {}
+        self.since = time.time()
+
+    def add_call(
+        self,
+        method,
+        client,
+        latency,
+        request_bytes=0,
+        response_bytes=0,
+        encode_time=0.0,
+        error=False,
+    ):
+        """Adds a handled RPC call to the counters.
+
+        Args:
+            method (str): The RPC method name.
+            client (str): The client making the call, e.g. ``user@host``.
+            latency (float): The time from dispatch until the response was sent.
+            request_bytes (int): The size of the request on the wire.
+            response_bytes (int): The size of the response on the wire.
+            encode_time (float): The time spent encoding the response.
+            error (bool): True if the call failed.
+
+        """
+        for stats, key in ((self.methods, method), (self.clients, client)):
+            if key not in stats:
+                stats[key] = CallStats(self.max_samples)
+            stats[key].add(latency, request_bytes, response_bytes, encode_time, error)
+
+    def add_count(self, client, key, value=1):
+        """Adds to a counter of a client not related to a call.
+
+        Args:
+            client (str): The client, e.g. ``user@host``.
+            key (str): The counter, e.g. ``events_dropped``.
+            value (int): The value to add.
+
+        """
+        counts = self.counts.setdefault(client, {})
+        counts[key] = counts.get(key, 0) + value
+
+    def get_stats(self):
+        """Returns the counters.
+
+        Returns:
+            dict: The counters per method and per client, the other client
+                counters and the time since they were started, in the form::
+
+                    {'since': float,
+                     'methods': {method: {key: value}},
+                     'clients': {client: {key: value}},
+                     'counts': {client: {key: value}}}
+
+        """
+        return {
+            'since': self.since,
+            'methods': {key: value.to_dict() for key, value in self.methods.items()},
+            'clients': {key: value.to_dict() for key, value in self.clients.items()},
+            'counts': {key: dict(value) for key, value in self.counts.items()},
+        }
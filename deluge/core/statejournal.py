@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Incremental storage of the torrents.state file with an append-only journal."""
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import struct
+import uuid
+import zlib
+
+import six.moves.cPickle as pickle  # noqa: N813
+
+from deluge.common import PY2
+
+log = logging.getLogger(__name__)
+
+#: The record header, the payload length and CRC32.
+RECORD_HEADER = struct.Struct('>II')
+
+
+def fsync_dir(path):
+    """Syncs the rename operations in a directory."""
+    if hasattr(os, 'O_DIRECTORY'):
+        dirfd = os.open(path, os.O_DIRECTORY)
+        try:
+            os.fsync(dirfd)
+        finally:
+            os.close(dirfd)
+
+
+def load_pickle(data):
+    if PY2:
+        return pickle.loads(data)
+    return pickle.loads(data, encoding='utf8')
+
+
+class StateJournal(object):
+    """The torrents.state snapshot with a journal of the changes since.
+
+    The snapshot is the pickled TorrentManagerState, as read by previous
+    versions. Saving a state appends only the changed and removed torrent
+    states to the torrents.state.journal file, in a record with a CRC32 that
+    is synced to disk. A torn record at the end from a crash is ignored on load.
+
+    The journal is compacted into a new snapshot once it is larger than the
+    snapshot. The snapshot and the journal share an id, so an old journal is
+    never replayed over a newer snapshot if the daemon stops in between.
+
+    Args:
+        state_dir (str): The directory of the state files.
+
+    """
+
+    def __init__(self, state_dir):
+        self.filepath = os.path.join(state_dir, 'torrents.state')
+        self.journal_filepath = self.filepath + '.journal'
+        self.journal_id = None
+        self.snapshot_size = 0
+        self.journal_size = 0
+
+    def replay(self, state):
+        """Applies the journal of the snapshot to a loaded state.
+
+        Args:
+            state (TorrentManagerState): The state loaded from the snapshot.
+
+        Returns:
+            bool: True if the journal belongs to the snapshot, so new changes
+                can be appended to it.
+
+        """
+        journal_id = getattr(state, 'journal_id', None)
+        try:
+            with open(self.journal_filepath, 'rb') as _file:
+                records = self.read_records(_file)
+                header = next(records, None)
+                if journal_id is None or header != journal_id:
+                    log.info('Ignoring the journal of an older torrents.state')
+                    return False
+                torrents = {t_state.torrent_id: t_state for t_state in state.torrents}
+                count = 0
+                for changed, removed in records:
+                    for t_state in changed:
+                        torrents[t_state.torrent_id] = t_state
+                    for torrent_id in removed:
+                        torrents.pop(torrent_id, None)
+                    count += 1
+                self.journal_size = _file.tell()
+        except IOError:
+            return False
+
+        state.torrents = list(torrents.values())
+        self.journal_id = journal_id
+        try:
+            self.snapshot_size = os.path.getsize(self.filepath)
+        except OSError:
+            self.snapshot_size = 0
+        log.info('Replayed %d torrents.state journal records', count)
+        return True
+
+    @staticmethod
+    def read_records(_file):
+        """Yields the records of a journal file, up to the first invalid one."""
+        while True:
+            header = _file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            length, crc = RECORD_HEADER.unpack(header)
+            data = _file.read(length)
+            if len(data) < length or zlib.crc32(data) & 0xFFFFFFFF != crc:
+                log.warning('Ignoring a torn record at the end of the journal')
+                _file.seek(-len(header) - len(data), os.SEEK_CUR)
+                break
+            try:
+                yield load_pickle(data)
+            except (EOFError, pickle.UnpicklingError) as ex:
+                log.warning('Ignoring an invalid journal record: %s', ex)
+                _file.seek(-len(header) - len(data), os.SEEK_CUR)
+                break
+
+    @staticmethod
+    def encode_record(record):
+        data = pickle.dumps(record, protocol=2)
+        return RECORD_HEADER.pack(len(data), zlib.crc32(data) & 0xFFFFFFFF) + data
+
+    def needs_compaction(self):
+        """Checks if the next save should write a new snapshot."""
+        return self.journal_id is None or self.journal_size > self.snapshot_size
+
+    def append(self, changed, removed):
+        """Appends the changed and removed torrents to the journal.
+
+        Args:
+            changed (list of TorrentState): The new or changed torrent states.
+            removed (list of str): The torrent_ids of the removed torrents.
+
+        Returns:
+            bool: True if the changes were written.
+
+        """
+        data = self.encode_record((changed, removed))
+        try:
+            with open(self.journal_filepath, 'ab', 0) as _file:
+                # Drop any torn record so the new one follows a valid one.
+                _file.truncate(self.journal_size)
+                _file.write(data)
+                _file.flush()
+                os.fsync(_file.fileno())
+        except (IOError, OSError) as ex:
+            log.error('Unable to append to %s: %s', self.journal_filepath, ex)
+            return False
+        self.journal_size += len(data)
+        return True
+
+    def compact(self, state):
+        """Writes the state as a new snapshot and starts an empty journal.
+
+        Args:
+            state (TorrentManagerState): The state of all the torrents.
+
+        Returns:
+            bool: True if the snapshot was written.
+
+        """
+        journal_id = uuid.uuid4().hex
+        state.journal_id = journal_id
+        filename = os.path.basename(self.filepath)
+        filepath_bak = self.filepath + '.bak'
+        filepath_tmp = self.filepath + '.tmp'
+
+        try:
+            log.debug('Creating the temporary file: %s', filepath_tmp)
+            with open(filepath_tmp, 'wb', 0) as _file:
+                pickle.dump(state, _file, protocol=2)
+                _file.flush()
+                os.fsync(_file.fileno())
+                snapshot_size = _file.tell()
+        except (OSError, pickle.PicklingError) as ex:
+            log.error('Unable to save %s: %s', filename, ex)
+            return False
+
+        try:
+            log.debug('Creating backup of %s at: %s', filename, filepath_bak)
+            if os.path.isfile(filepath_bak):
+                os.remove(filepath_bak)
+            if os.path.isfile(self.filepath):
+                os.rename(self.filepath, filepath_bak)
+        except OSError as ex:
+            log.error('Unable to backup %s to %s: %s', self.filepath, filepath_bak, ex)
+            return False
+
+        try:
+            log.debug('Saving %s to: %s', filename, self.filepath)
+            os.rename(filepath_tmp, self.filepath)
+        except OSError as ex:
+            log.error('Failed to set new state file %s: %s', self.filepath, ex)
+            if os.path.isfile(filepath_bak):
+                log.info('Restoring backup of state from: %s', filepath_bak)
+                os.rename(filepath_bak, self.filepath)
+            return False
+
+        # The old journal is ignored from now on as its id does not match.
+        self.journal_id = None
+        self.snapshot_size = snapshot_size
+        journal_tmp = self.journal_filepath + '.tmp'
+        header = self.encode_record(journal_id)
+        try:
+            with open(journal_tmp, 'wb', 0) as _file:
+                _file.write(header)
+                _file.flush()
+                os.fsync(_file.fileno())
+            os.rename(journal_tmp, self.journal_filepath)
+            fsync_dir(os.path.dirname(self.filepath))
+        except (IOError, OSError) as ex:
+            log.error('Unable to create %s: %s', self.journal_filepath, ex)
+        else:
+            self.journal_id = journal_id
+            self.journal_size = len(header)
+        return True
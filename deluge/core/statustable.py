@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Columnar snapshot of the frequently requested torrent status keys."""
+
+from __future__ import division, unicode_literals
+
+import logging
+from array import array
+
+log = logging.getLogger(__name__)
+
+try:
+    INT_TYPECODE = 'q'
+    array(INT_TYPECODE)
+except ValueError:
+    # Python 2 has no long long arrays.
+    INT_TYPECODE = 'l'
+
+#: The columns copied from the libtorrent torrent_status with their array type.
+COLUMNS = {
+    'download_payload_rate': INT_TYPECODE,
+    'upload_payload_rate': INT_TYPECODE,
+    'progress': 'd',
+    'num_peers': INT_TYPECODE,
+    'num_seeds': INT_TYPECODE,
+    'total_done': INT_TYPECODE,
+    'all_time_upload': INT_TYPECODE,
+    'all_time_download': INT_TYPECODE,
+    'total_wanted': INT_TYPECODE,
+    'total_wanted_done': INT_TYPECODE,
+    'queue_position': INT_TYPECODE,
+}
+
+#: The status keys that are a column of the table.
+COLUMN_KEYS = {
+    'all_time_download': 'all_time_download',
+    'download_payload_rate': 'download_payload_rate',
+    'num_peers': 'num_peers',
+    'num_seeds': 'num_seeds',
+    'queue': 'queue_position',
+    'state': 'state',
+    'total_done': 'total_done',
+    'total_uploaded': 'all_time_upload',
+    'total_wanted': 'total_wanted',
+    'upload_payload_rate': 'upload_payload_rate',
+}
+
+#: The status keys served from the table.
+STATUS_KEYS = (
+    'all_time_download',
+    'download_payload_rate',
+    'eta',
+    'num_peers',
+    'num_seeds',
+    'progress',
+    'queue',
+    'ratio',
+    'state',
+    'total_done',
+    'total_remaining',
+    'total_uploaded',
+    'total_wanted',
+    'upload_payload_rate',
+)
+
+
+class TorrentStatusTable(object):
+    """A columnar snapshot of the scalar torrent status keys.
+
+    Each torrent has a slot (row) in array backed columns that is written from
+    its libtorrent torrent_status when the TorrentManager handles a
+    state_update_alert. Status requests, filters and the filter tree read a key
+    of many torrents from a column at once, instead of calling the status
+    function of each Torrent that reads the libtorrent status object.
+
+    The values are those of the last status update, as for the cached status
+    of the Torrent objects.
+
+    """
+
+    def __init__(self):
+        self.slots = {}
+        self.free_slots = []
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self.states = []
+
+    def __contains__(self, torrent_id):
+        return torrent_id in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, torrent):
+        """Adds a torrent to the table.
+
+        Args:
+            torrent (Torrent): The torrent to add.
+
+        """
+        if torrent.torrent_id not in self.slots:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot = len(self.states)
+                for column in self.columns.values():
+                    column.append(0)
+                self.states.append(None)
+            self.slots[torrent.torrent_id] = slot
+        self.update(torrent)
+
+    def remove(self, torrent_id):
+        """Removes a torrent from the table, its slot is reused.
+
+        Args:
+            torrent_id (str): The torrent to remove.
+
+        """
+        slot = self.slots.pop(torrent_id, None)
+        if slot is not None:
+            self.states[slot] = None
+            self.free_slots.append(slot)
+
+    def update(self, torrent):
+        """Writes the cached status of a torrent to its slot.
+
+        Args:
+            torrent (Torrent): The torrent to update.
+
+        """
+        slot = self.slots.get(torrent.torrent_id)
+        if slot is None:
+            return
+        status = torrent.status
+        columns = self.columns
+        columns['download_payload_rate'][slot] = status.download_payload_rate
+        columns['upload_payload_rate'][slot] = status.upload_payload_rate
+        columns['progress'][slot] = status.progress
+        num_seeds = status.num_seeds
+        columns['num_peers'][slot] = status.num_peers - num_seeds
+        columns['num_seeds'][slot] = num_seeds
+        columns['total_done'][slot] = status.total_done
+        columns['all_time_upload'][slot] = status.all_time_upload
+        columns['all_time_download'][slot] = status.all_time_download
+        columns['total_wanted'][slot] = status.total_wanted
+        columns['total_wanted_done'][slot] = status.total_wanted_done
+        columns['queue_position'][slot] = status.queue_position
+        self.states[slot] = torrent.state
+
+    def set_state(self, torrent_id, state):
+        """Sets the state of a torrent.
+
+        Args:
+            torrent_id (str): The torrent.
+            state (str): The new state.
+
+        """
+        slot = self.slots.get(torrent_id)
+        if slot is not None:
+            self.states[slot] = state
+
+    def get_column(self, name, torrent_ids):
+        """Returns the values of a column for the torrents.
+
+        Args:
+            name (str): The column, or 'state'.
+            torrent_ids (list of str): The torrents in the table.
+
+        Returns:
+            list: The values in the order of torrent_ids.
+
+        """
+        column = self.states if name == 'state' else self.columns[name]
+        slots = self.slots
+        return [column[slots[torrent_id]] for torrent_id in torrent_ids]
+
+    def get_key(self, key, torrent_ids, torrents):
+        """Returns the values of a status key for the torrents.
+
+        Args:
+            key (str): The status key, one of STATUS_KEYS.
+            torrent_ids (list of str): The torrents in the table.
+            torrents (dict): The Torrent objects by torrent_id, for the keys
+                that also depend on the torrent options.
+
+        Returns:
+            list: The values in the order of torrent_ids.
+
+        """
+        get_column = self.get_column
+        if key in COLUMN_KEYS:
+            return get_column(COLUMN_KEYS[key], torrent_ids)
+        if key == 'total_remaining':
+            return [
+                wanted - done
+                for wanted, done in zip(
+                    get_column('total_wanted', torrent_ids),
+                    get_column('total_wanted_done', torrent_ids),
+                )
+            ]
+        if key == 'ratio':
+            return [
+                upload / done if done > 0 else -1.0
+                for upload, done in zip(
+                    get_column('all_time_upload', torrent_ids),
+                    get_column('total_done', torrent_ids),
+                )
+            ]
+        if key == 'progress':
+            return [
+                100.0
+                if state == 'Error'
+                else torrents[torrent_id].get_progress()
+                if state == 'Moving'
+                else progress * 100
+                for torrent_id, state, progress in zip(
+                    torrent_ids,
+                    get_column('state', torrent_ids),
+                    get_column('progress', torrent_ids),
+                )
+            ]
+        if key == 'eta':
+            return self.get_eta(torrent_ids, torrents)
+        raise KeyError(key)
+
+    def get_eta(self, torrent_ids, torrents):
+        """Returns the ETA of the torrents, as calculated by Torrent.get_eta."""
+        get_column = self.get_column
+        etas = []
+        for torrent_id, down_rate, up_rate, download, upload, wanted, done in zip(
+            torrent_ids,
+            get_column('download_payload_rate', torrent_ids),
+            get_column('upload_payload_rate', torrent_ids),
+            get_column('all_time_download', torrent_ids),
+            get_column('all_time_upload', torrent_ids),
+            get_column('total_wanted', torrent_ids),
+            get_column('total_wanted_done', torrent_ids),
+        ):
+            eta = 0
+            torrent = torrents[torrent_id]
+            if torrent.is_finished and torrent.options['stop_at_ratio'] and up_rate:
+                # We're a seed, so calculate the time to the 'stop_share_ratio'
+                eta = (
+                    int(download * torrent.options['stop_ratio']) - upload
+                ) // up_rate
+            elif down_rate and wanted > done:
+                eta = (wanted - done) // down_rate
+            # Limit to 1 year, avoid excessive values and prevent GTK int overflow.
+            etas.append(eta if eta < 31557600 else -1)
+        return etas
+
+    def get_status(self, torrent_ids, keys, torrents):
+        """Returns the status of the torrents for the keys in the table.
+
+        Args:
+            torrent_ids (list of str): The torrents in the table.
+            keys (list of str): The status keys, those not in STATUS_KEYS are
+                ignored.
+            torrents (dict): The Torrent objects by torrent_id.
+
+        Returns:
+            dict: The status of the torrents keyed by torrent_id.
+
+        """
+        status = {torrent_id: {} for torrent_id in torrent_ids}
+        for key in keys:
+            if key not in STATUS_KEYS:
+                continue
+            for torrent_id, value in zip(
+                torrent_ids, self.get_key(key, torrent_ids, torrents)
+            ):
+                status[torrent_id][key] = value
+        return status
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+"""Pushes torrent status changes to subscribed client sessions."""
+
+from __future__ import unicode_literals
+
+import logging
+import time
+
+from six import string_types
+
+import deluge.component as component
+from deluge.core.authmanager import AUTH_LEVEL_ADMIN
+from deluge.core.statustable import STATUS_KEYS
+from deluge.core.torrent import TIME_STATUS_KEYS, Torrent
+from deluge.event import TorrentsStatusChangedEvent
+
+log = logging.getLogger(__name__)
+
+
+class StatusSubscription(object):
+    """The status subscription of a client session.
+
+    Args:
+        session_id (int): The session the status changes are sent to.
+        username (str): The user of the session.
+        auth_level (int): The auth level of the user.
+        filter_dict (dict): The filter the torrents must match.
+        keys (list of str): The status keys to send.
+        interval (float): The minimum time in seconds between status updates.
+
+    """
+
+    def __init__(self, session_id, username, auth_level, filter_dict, keys, interval):
+        self.session_id = session_id
+        self.username = username
+        self.auth_level = auth_level
+        self.filter_dict = filter_dict
+        self.keys = keys
+        self.interval = interval
+        self.last_update = time.time()
+        # The last status sent to the session for each matching torrent.
+        self.prev_status = {}
+        # Torrents that have changed since the last update was sent.
+        self.changed = set()
+
+    def is_due(self, now):
+        return now - self.last_update >= self.interval
+
+    def is_visible(self, torrent):
+        """Checks if the user owns the torrent or the torrent is shared."""
+        return (
+            self.auth_level == AUTH_LEVEL_ADMIN
+            or torrent.options['owner'] == self.username
+            or torrent.options['shared']
+        )
+
+
+class SubscriptionManager(component.Component):
+    """Sends the changed torrent status keys to subscribed sessions.
+
+    Instead of clients polling `core.get_torrents_status`, a session subscribes
+    with a filter and a set of keys and is sent a `TorrentsStatusChangedEvent`
+    containing only the values that changed since the last update. The
+    torrents to check are taken from the libtorrent state_update_alert so
+    unchanged torrents are never looked at.
+
+    """
+
+    def __init__(self, core):
+        component.Component.__init__(
+            self,
+            'SubscriptionManager',
+            interval=0.5,
+            depend=['TorrentManager', 'FilterManager'],
+        )
+        self.core = core
+        self.subscriptions = {}
+        self.update_pending = False
+
+        self.alerts = component.get('AlertManager')
+        self.alerts.register_handler('state_update_alert', self.on_alert_state_update)
+
+        self.eventmanager = component.get('EventManager')
+        self.eventmanager.register_event_handler(
+            'TorrentAddedEvent', self.on_torrent_added
+        )
+        self.eventmanager.register_event_handler(
+            'TorrentRemovedEvent', self.on_torrent_removed
+        )
+        self.eventmanager.register_event_handler(
+            'ClientDisconnectedEvent', self.on_client_disconnected
+        )
+        # Status changes not reported by a libtorrent state update.
+        for event in (
+            'TorrentOptionsChangedEvent',
+            'TorrentTrackerStatusEvent',
+            'TorrentFileRenamedEvent',
+            'TorrentFolderRenamedEvent',
+        ):
+            self.eventmanager.register_event_handler(event, self.on_torrent_changed)
+
+    def stop(self):
+        self.subscriptions = {}
+        self.update_pending = False
+
+    def update(self):
+        if not self.subscriptions:
+            return
+
+        rpcserver = component.get('RPCServer')
+        for session_id in list(self.subscriptions):
+            if not rpcserver.is_session_valid(session_id):
+                self.unsubscribe(session_id)
+
+        now = time.time()
+        if self.update_pending or not any(
+            sub.is_due(now) for sub in self.subscriptions.values()
+        ):
+            return
+
+        # The status changes are sent from the resulting state_update_alert.
+        self.update_pending = True
+        self.core.torrentmanager.post_torrent_updates()
+
+    def subscribe(
+        self, session_id, username, auth_level, filter_dict, keys, interval, status
+    ):
+        """Adds or replaces the status subscription of a session.
+
+        Args:
+            session_id (int): The session to send the status changes to.
+            username (str): The user of the session.
+            auth_level (int): The auth level of the user, only admins are sent
+                the torrents of other users that are not shared.
+            filter_dict (dict): The filter the torrents must match.
+            keys (list of str): The status keys to send.
+            interval (float): The minimum time in seconds between updates.
+            status (dict): The current status of the matching torrents, as
+                already sent to the session.
+
+        """
+        subscription = StatusSubscription(
+            session_id, username, auth_level, filter_dict, keys, interval
+        )
+        subscription.prev_status = {
+            torrent_id: dict(torrent_status)
+            for torrent_id, torrent_status in status.items()
+        }
+        self.subscriptions[session_id] = subscription
+        log.debug('Session %s subscribed to status keys: %s', session_id, keys)
+
+    def unsubscribe(self, session_id):
+        """Removes the status subscription of a session.
+
+        Args:
+            session_id (int): The session to unsubscribe.
+
+        """
+        if self.subscriptions.pop(session_id, None):
+            log.debug('Session %s unsubscribed from status', session_id)
+
+    def mark_changed(self, torrent_ids):
+        """Marks torrents to be checked for changes on the next update.
+
+        Used when status keys change without libtorrent reporting a state
+        update, e.g. when torrent options are changed.
+
+        Args:
+            torrent_ids (list of str): The changed torrents.
+
+        """
+        for subscription in self.subscriptions.values():
+            subscription.changed.update(torrent_ids)
+
+    def get_pushed_keys(self, keys):
+        """Returns the status keys the changes of are pushed to sessions.
+
+        The plugin status fields are only pushed if the plugin reports their
+        changes, see CorePluginManager.status_changed. The keys derived from
+        the time are not pushed as an idle torrent is not reported by
+        libtorrent, see TIME_STATUS_KEYS.
+
+        Args:
+            keys (list of str): The status keys.
+
+        Returns:
+            list: The keys of which the changes are pushed.
+
+        """
+        pushed_fields = self.core.pluginmanager.pushed_status_fields
+        return [
+            key
+            for key in keys
+            if (key in Torrent.status_funcs and key not in TIME_STATUS_KEYS)
+            or key in pushed_fields
+        ]
+
+    def on_alert_state_update(self, alert):
+        self.update_pending = False
+        if not self.subscriptions:
+            return
+
+        changed = set()
+        for t_status in alert.status:
+            try:
+                changed.add(str(t_status.info_hash))
+            except RuntimeError:
+                continue
+
+        now = time.time()
+        for subscription in list(self.subscriptions.values()):
+            subscription.changed.update(changed)
+            if subscription.is_due(now):
+                self.send_status_changes(subscription)
+                subscription.last_update = now
+
+    def send_status_changes(self, subscription):
+        """Sends the changed status of the changed torrents to the session.
+
+        Args:
+            subscription (StatusSubscription): The subscription to update.
+
+        """
+        if not subscription.changed:
+            return
+
+        changed = subscription.changed
+        subscription.changed = set()
+
+        # The filter is not run in the session of the subscriber, so the
+        # torrents of other users are dropped first.
+        torrents = self.core.torrentmanager.torrents
+        torrent_ids = [
+            t_id
+            for t_id in changed
+            if t_id in torrents and subscription.is_visible(torrents[t_id])
+        ]
+        filter_dict = dict(subscription.filter_dict)
+        if 'id' in filter_dict:
+            ids = filter_dict['id']
+            ids = [ids] if isinstance(ids, string_types) else ids
+            torrent_ids = [t_id for t_id in torrent_ids if t_id in ids]
+        filter_dict['id'] = torrent_ids
+        matched = (
+            self.core.filtermanager.filter_torrent_ids(filter_dict)
+            if torrent_ids
+            else []
+        )
+
+        status_changes = {}
+        for torrent_id, torrent_status in self.get_status(
+            matched, subscription.keys
+        ).items():
+            prev_status = subscription.prev_status.get(torrent_id, {})
+            diff = {
+                key: value
+                for key, value in torrent_status.items()
+                if key not in prev_status or prev_status[key] != value
+            }
+            if diff:
+                status_changes[torrent_id] = diff
+            subscription.prev_status[torrent_id] = torrent_status
+
+        # Torrents that no longer match the filter.
+        for torrent_id in changed.difference(matched):
+            if subscription.prev_status.pop(torrent_id, None) is not None:
+                status_changes[torrent_id] = None
+
+        if status_changes:
+            component.get('RPCServer').emit_event_for_session_id(
+                subscription.session_id, TorrentsStatusChangedEvent(status_changes)
+            )
+
+    def get_status(self, torrent_ids, keys):
+        """Returns the torrent and plugin status keys of the torrents.
+
+        Args:
+            torrent_ids (list of str): The torrents to get the status of.
+            keys (list of str): The status keys.
+
+        Returns:
+            dict: The status of the torrents keyed by torrent_id.
+
+        """
+        torrentmanager = self.core.torrentmanager
+        torrent_keys, plugin_keys = torrentmanager.separate_keys(keys, torrent_ids)
+        table_status = torrentmanager.get_table_status(
+            torrent_ids, torrent_keys if keys else STATUS_KEYS
+        )
+        status_dict = {}
+        for torrent_id in torrent_ids:
+            torrent_status = torrentmanager[torrent_id].get_status(
+                torrent_keys, all_keys=not keys, values=table_status[torrent_id]
+            )
+            if plugin_keys:
+                torrent_status.update(
+                    self.core.pluginmanager.get_status(torrent_id, plugin_keys)
+                )
+            status_dict[torrent_id] = torrent_status
+        return status_dict
+
+    def on_torrent_added(self, torrent_id, from_state):
+        self.mark_changed([torrent_id])
+
+    def on_torrent_changed(self, torrent_id, *args):
+        self.mark_changed([torrent_id])
+
+    def on_torrent_removed(self, torrent_id):
+        for subscription in self.subscriptions.values():
+            subscription.prev_status.pop(torrent_id, None)
+            subscription.changed.discard(torrent_id)
+
+    def on_client_disconnected(self, session_id):
+        self.unsubscribe(session_id)
@@ -19,6 +19,7 @@
 import logging
 import os
 import socket
+import time
 
 from twisted.internet.defer import Deferred, DeferredList
 
@@ -26,10 +27,12 @@
 from deluge._libtorrent import lt
 from deluge.common import decode_bytes
 from deluge.configmanager import ConfigManager, get_config_dir
+from deluge.core import piecemap
 from deluge.core.authmanager import AUTH_LEVEL_ADMIN
 from deluge.decorators import deprecated
 from deluge.event import (
     TorrentFolderRenamedEvent,
+    TorrentOptionsChangedEvent,
     TorrentStateChangedEvent,
     TorrentTrackerStatusEvent,
 )
@@ -59,6 +62,31 @@
     'checking_resume_data': 'Checking',
 }
 
+#: The expensive status keys cached per torrent, with the seconds they are kept.
+#: The cached values are also invalidated by the TorrentManager alert handlers.
+CACHED_STATUS_KEYS = {
+    'file_progress': 2,
+    'files': 60,
+    'orig_files': 60,
+    'peers': 2,
+    'pieces': 2,
+    'pieces_rle': 2,
+}
+
+#: The status keys derived from the time, which change without libtorrent
+#: reporting the torrent in a state_update_alert, e.g. of an idle torrent.
+TIME_STATUS_KEYS = (
+    'active_time',
+    'seeding_time',
+    'finished_time',
+    'seed_rank',
+    'next_announce',
+    'last_seen_complete',
+    'time_since_download',
+    'time_since_upload',
+    'time_since_transfer',
+)
+
 
 def sanitize_filepath(filepath, folder=False):
     """Returns a sanitized filepath to pass to libtorrent rename_file().
@@ -90,6 +118,24 @@ def clean_filename(filename):
     return newfilepath
 
 
+def cached_status_func(key, func):
+    """Returns a status function that caches the value of func.
+
+    Args:
+        key (str): The status key, one of CACHED_STATUS_KEYS.
+        func (function): The status function, called with the torrent.
+
+    Returns:
+        function: Called with the torrent, see Torrent.get_cached_status.
+
+    """
+
+    def get_cached_status(torrent):
+        return torrent.get_cached_status(key, func)
+
+    return get_cached_status
+
+
 def convert_lt_files(files):
     """Indexes and decodes files from libtorrent get_files().
 
@@ -215,10 +261,12 @@ class Torrent(object):
         status: Holds status info so that we don"t need to keep getting it from libtorrent.
         torrent_info: store the torrent info.
         has_metadata (bool): True if the metadata for the torrent is available, False otherwise.
-        status_funcs (dict): The function mappings to get torrent status
-        prev_status (dict): Previous status dicts returned for this torrent. We use this to return
-            dicts that only contain changes from the previous.
-            {session_id: status_dict, ...}
+        status_funcs (dict): The functions to get the torrent status, shared by
+            all the torrents and called with the torrent
+        generation (int): Increased when the status of the torrent changes.
+        prev_status (dict): The generation and the keys of the last status returned to a
+            session, to skip unchanged torrents in diff status requests.
+            {session_id: (generation, keys), ...}
         waiting_on_folder_rename (list of dict): A list of Deferreds for file indexes we're waiting for file_rename
             alerts on. This is so we can send one folder_renamed signal instead of multiple file_renamed signals.
             [{index: Deferred, ...}, ...]
@@ -248,6 +296,7 @@ def __init__(self, handle, options, state=None, filename=None, magnet=None):
         self.handle = handle
 
         self.magnet = magnet
+        self.generation = 0
         self.status = self.handle.status()
 
         self.torrent_info = self.handle.get_torrent_info()
@@ -277,12 +326,11 @@ def __init__(self, handle, options, state=None, filename=None, magnet=None):
         self.tracker_host = None
         self.forcing_recheck = False
         self.forcing_recheck_paused = False
-        self.status_funcs = None
         self.prev_status = {}
+        self.status_cache = {}
         self.waiting_on_folder_rename = []
 
         self.update_status(self.handle.status())
-        self._create_status_funcs()
         self.set_options(self.options)
         self.update_state()
 
@@ -293,6 +341,7 @@ def on_metadata_received(self):
         """Process the metadata received alert for this torrent"""
         self.has_metadata = True
         self.torrent_info = self.handle.get_torrent_info()
+        self.invalidate_status_cache()
         if self.options['prioritize_first_last_pieces']:
             self.set_prioritize_first_last_pieces(True)
         self.write_torrentfile()
@@ -319,6 +368,13 @@ def set_options(self, options):
                 else:
                     # Update config options that do not have funcs
                     self.options[key] = value
+        self.bump_generation()
+
+        # A new torrent is not in the session until the TorrentAddedEvent.
+        if self.torrent_id in component.get('TorrentManager').torrents:
+            component.get('EventManager').emit(
+                TorrentOptionsChangedEvent(self.torrent_id, list(options))
+            )
 
     def get_options(self):
         """Get the torrent options.
@@ -346,6 +402,7 @@ def set_max_connections(self, max_connections):
 
         self.options['max_connections'] = max_connections
         self.handle.set_max_connections(max_connections)
+        self.bump_generation()
 
     def set_max_upload_slots(self, max_slots):
         """Sets maximum number of upload slots for this torrent.
@@ -355,6 +412,7 @@ def set_max_upload_slots(self, max_slots):
         """
         self.options['max_upload_slots'] = max_slots
         self.handle.set_max_uploads(max_slots)
+        self.bump_generation()
 
     def set_max_upload_speed(self, m_up_speed):
         """Sets maximum upload speed for this torrent.
@@ -363,6 +421,7 @@ def set_max_upload_speed(self, m_up_speed):
             m_up_speed (float): Maximum upload speed in KiB/s.
         """
         self.options['max_upload_speed'] = m_up_speed
+        self.bump_generation()
         if m_up_speed < 0:
             value = -1
         else:
@@ -376,6 +435,7 @@ def set_max_download_speed(self, m_down_speed):
             m_up_speed (float): Maximum download speed in KiB/s.
         """
         self.options['max_download_speed'] = m_down_speed
+        self.bump_generation()
         if m_down_speed < 0:
             value = -1
         else:
@@ -467,6 +527,7 @@ def set_stop_ratio(self, stop_ratio):
             stop_ratio (float): The seeding ratio.
         """
         self.options['stop_ratio'] = stop_ratio
+        self.update_stop_ratio_index()
 
     def set_stop_at_ratio(self, stop_at_ratio):
         """Stop the torrent when it has reached stop_ratio.
@@ -475,6 +536,7 @@ def set_stop_at_ratio(self, stop_at_ratio):
             stop_at_ratio (bool): Stop the torrent.
         """
         self.options['stop_at_ratio'] = stop_at_ratio
+        self.update_stop_ratio_index()
 
     def set_remove_at_ratio(self, remove_at_ratio):
         """Remove the torrent when it has reached the stop_ratio.
@@ -483,6 +545,16 @@ def set_remove_at_ratio(self, remove_at_ratio):
             remove_at_ratio (bool): Remove the torrent.
         """
         self.options['remove_at_ratio'] = remove_at_ratio
+        self.update_stop_ratio_index()
+
+    def update_stop_ratio_index(self):
+        """Updates the TorrentManager index of the torrents to stop at ratio.
+
+        A new torrent is indexed when it is added to the TorrentManager.
+        """
+        torrentmanager = component.get('TorrentManager')
+        if self.torrent_id in torrentmanager.torrents:
+            torrentmanager.update_stop_ratio_index(self)
 
     def set_move_completed(self, move_completed):
         """Set whether to move the torrent when downloading has finished.
@@ -492,6 +564,7 @@ def set_move_completed(self, move_completed):
 
         """
         self.options['move_completed'] = move_completed
+        self.bump_generation()
 
     def set_move_completed_path(self, move_completed_path):
         """Set the path to move torrent to when downloading has finished.
@@ -536,6 +609,7 @@ def set_file_priorities(self, file_priorities):
         # Set the first/last priorities if needed.
         if self.options['prioritize_first_last_pieces']:
             self.set_prioritize_first_last_pieces(True)
+        self.bump_generation()
 
     @deprecated
     def set_save_path(self, download_location):
@@ -545,6 +619,7 @@ def set_save_path(self, download_location):
     def set_download_location(self, download_location):
         """The location for downloading torrent data."""
         self.options['download_location'] = download_location
+        self.bump_generation()
 
     def set_owner(self, account):
         """Sets the owner of this torrent.
@@ -559,6 +634,7 @@ def set_owner(self, account):
 
         if self.rpcserver.get_session_auth_level() == AUTH_LEVEL_ADMIN:
             self.options['owner'] = account
+            self.bump_generation()
 
     # End Options methods #
 
@@ -568,6 +644,8 @@ def set_trackers(self, trackers=None):
         Args:
             trackers (list of dicts): A list of trackers.
         """
+        self.bump_generation()
+
         if trackers is None:
             self.trackers = [tracker for tracker in self.handle.trackers()]
             self.tracker_host = None
@@ -611,6 +689,7 @@ def set_tracker_status(self, status):
 
         if self.tracker_status != status:
             self.tracker_status = status
+            self.bump_generation()
             component.get('EventManager').emit(
                 TorrentTrackerStatusEvent(self.torrent_id, self.tracker_status)
             )
@@ -687,7 +766,9 @@ def set_status_message(self, message=None):
         """
         if not message:
             message = 'OK'
-        self.statusmsg = message
+        if message != self.statusmsg:
+            self.statusmsg = message
+            self.bump_generation()
 
     def force_error_state(self, message, restart_to_resume=True):
         """Forces the torrent into an error state.
@@ -805,12 +886,15 @@ def get_peers(self):
                     "up_speed": int
                 }
         """
-        ret = []
-        peers = self.handle.get_peer_info()
+        skip_flags = lt.peer_info.connecting | lt.peer_info.handshake
+        seed_flag = lt.peer_info.seed
+        country_code = component.get('Core').geoip_cache.country_code
 
-        for peer in peers:
+        ret = []
+        for peer in self.handle.get_peer_info():
             # We do not want to report peers that are half-connected
-            if peer.flags & peer.connecting or peer.flags & peer.handshake:
+            flags = peer.flags
+            if flags & skip_flags:
                 continue
 
             try:
@@ -819,28 +903,15 @@ def get_peers(self):
                 # libtorrent on Py3 can raise UnicodeDecodeError for peer_info.client
                 client = 'unknown'
 
-            try:
-                country = component.get('Core').geoip_instance.country_code_by_addr(
-                    peer.ip[0]
-                )
-            except AttributeError:
-                country = ''
-            else:
-                try:
-                    country = ''.join(
-                        [char if char.isalpha() else ' ' for char in country]
-                    )
-                except TypeError:
-                    country = ''
-
+            ip, port = peer.ip
             ret.append(
                 {
                     'client': client,
-                    'country': country,
+                    'country': country_code(ip),
                     'down_speed': peer.payload_down_speed,
-                    'ip': '%s:%s' % (peer.ip[0], peer.ip[1]),
+                    'ip': '%s:%s' % (ip, port),
                     'progress': peer.progress,
-                    'seed': peer.flags & peer.seed,
+                    'seed': flags & seed_flag,
                     'up_speed': peer.payload_up_speed,
                 }
             )
@@ -985,51 +1056,106 @@ def get_time_since_transfer(self):
         except ValueError:
             return -1
 
-    def get_status(self, keys, diff=False, update=False, all_keys=False):
+    def get_status(
+        self,
+        keys,
+        diff=False,
+        update=False,
+        all_keys=False,
+        values=None,
+        session_id=None,
+    ):
         """Returns the status of the torrent based on the keys provided
 
         Args:
             keys (list of str): the keys to get the status on
-            diff (bool): Will return a diff of the changes since the last
-                call to get_status based on the session_id
+            diff (bool): Will return an empty dict if the status has not
+                changed since the last call to get_status of the session_id,
+                except for the TIME_STATUS_KEYS which are always returned
             update (bool): If True the status will be updated from libtorrent
                 if False, the cached values will be returned
             all_keys (bool): If True return all keys while ignoring the keys param
                 if False, return only the requested keys
+            values (dict): Status values already read, e.g. from the
+                TorrentManager status table, these keys are not read again
+            session_id (int): The session of the diff, defaults to the
+                session of the current RPC
 
         Returns:
             dict: a dictionary of the status keys and their values
         """
         if update:
             self.update_status(self.handle.status())
+            self.bump_generation()
+            component.get('TorrentManager').status_table.update(self)
 
-        if all_keys:
-            keys = list(self.status_funcs)
+        keys = tuple(self.status_funcs if all_keys else keys)
 
-        status_dict = {}
+        if diff:
+            if session_id is None:
+                session_id = self.rpcserver.get_session_id()
+            if self.is_status_seen(session_id, keys):
+                # The keys derived from the time change without a new generation.
+                keys = tuple(key for key in keys if key in TIME_STATUS_KEYS)
+                if not keys:
+                    return {}
+                values = None
+            else:
+                self.prev_status[session_id] = (self.generation, keys)
 
-        for key in keys:
-            status_dict[key] = self.status_funcs[key]()
+        if values:
+            status_dict = self.get_status_getter(
+                tuple(key for key in keys if key not in values)
+            )(self)
+            status_dict.update(values)
+            return status_dict
 
-        if diff:
-            session_id = self.rpcserver.get_session_id()
-            if session_id in self.prev_status:
-                # We have a previous status dict, so lets make a diff
-                status_diff = {}
-                for key, value in status_dict.items():
-                    if key in self.prev_status[session_id]:
-                        if value != self.prev_status[session_id][key]:
-                            status_diff[key] = value
-                    else:
-                        status_diff[key] = value
+        return self.get_status_getter(keys)(self)
 
-                self.prev_status[session_id] = status_dict
-                return status_diff
+    def is_status_seen(self, session_id, keys):
+        """Checks if the session was returned the status keys at this generation.
 
-            self.prev_status[session_id] = status_dict
-            return status_dict
+        Args:
+            session_id (int): The session.
+            keys (tuple of str): The status keys.
+
+        Returns:
+            bool: True if the status keys have not changed for the session.
+
+        """
+        return self.prev_status.get(session_id) == (self.generation, keys)
+
+    @classmethod
+    def get_status_getter(cls, keys):
+        """Returns a function to get the status keys of a torrent.
+
+        The getter of the same keys is reused as clients request the same keys
+        for all the torrents.
+
+        Args:
+            keys (tuple of str): The status keys.
+
+        Returns:
+            function: Called with the torrent, returns the status dict.
 
-        return status_dict
+        Raises:
+            KeyError: If a key is not a torrent status key.
+
+        """
+        try:
+            return cls._status_getters[keys]
+        except KeyError:
+            pass
+
+        funcs = [(key, cls.status_funcs[key]) for key in keys]
+
+        def get_status(torrent):
+            return {key: func(torrent) for key, func in funcs}
+
+        if len(cls._status_getters) >= cls.max_status_getters:
+            cls._status_getters.clear()
+        cls._status_getters[keys] = get_status
+        return get_status
 
     def update_status(self, status):
         """Updates the cached status.
@@ -1037,119 +1163,83 @@ def update_status(self, status):
         Args:
             status (libtorrent.torrent_status): a libtorrent torrent status
         """
+        if self.status_cache and status.total_done != self.status.total_done:
+            # A piece was completed or a recheck changed the pieces.
+            self.invalidate_status_cache('file_progress', 'pieces', 'pieces_rle')
         self.status = status
 
-    def _create_status_funcs(self):
-        """Creates the functions for getting torrent status"""
-        self.status_funcs = {
-            'active_time': lambda: self.status.active_time,
-            'seeding_time': lambda: self.status.seeding_time,
-            'finished_time': lambda: self.status.finished_time,
-            'all_time_download': lambda: self.status.all_time_download,
-            'storage_mode': lambda: self.status.storage_mode.name.split('_')[
-                2
-            ],  # sparse or allocate
-            'distributed_copies': lambda: max(0.0, self.status.distributed_copies),
-            'download_payload_rate': lambda: self.status.download_payload_rate,
-            'file_priorities': self.get_file_priorities,
-            'hash': lambda: self.torrent_id,
-            'auto_managed': lambda: self.options['auto_managed'],
-            'is_auto_managed': lambda: self.options['auto_managed'],
-            'is_finished': lambda: self.is_finished,
-            'max_connections': lambda: self.options['max_connections'],
-            'max_download_speed': lambda: self.options['max_download_speed'],
-            'max_upload_slots': lambda: self.options['max_upload_slots'],
-            'max_upload_speed': lambda: self.options['max_upload_speed'],
-            'message': lambda: self.statusmsg,
-            'move_on_completed_path': lambda: self.options[
-                'move_completed_path'
-            ],  # Deprecated: move_completed_path
-            'move_on_completed': lambda: self.options[
-                'move_completed'
-            ],  # Deprecated: Use move_completed
-            'move_completed_path': lambda: self.options['move_completed_path'],
-            'move_completed': lambda: self.options['move_completed'],
-            'next_announce': lambda: self.status.next_announce.seconds,
-            'num_peers': lambda: self.status.num_peers - self.status.num_seeds,
-            'num_seeds': lambda: self.status.num_seeds,
-            'owner': lambda: self.options['owner'],
-            'paused': lambda: self.status.paused,
-            'prioritize_first_last': lambda: self.options[
-                'prioritize_first_last_pieces'
-            ],
-            # Deprecated: Use prioritize_first_last_pieces
-            'prioritize_first_last_pieces': lambda: self.options[
-                'prioritize_first_last_pieces'
-            ],
-            'sequential_download': lambda: self.options['sequential_download'],
-            'progress': self.get_progress,
-            'shared': lambda: self.options['shared'],
-            'remove_at_ratio': lambda: self.options['remove_at_ratio'],
-            'save_path': lambda: self.options[
-                'download_location'
-            ],  # Deprecated: Use download_location
-            'download_location': lambda: self.options['download_location'],
-            'seeds_peers_ratio': lambda: -1.0
-            if self.status.num_incomplete == 0
-            else (  # Use -1.0 to signify infinity
-                self.status.num_complete / self.status.num_incomplete
-            ),
-            'seed_rank': lambda: self.status.seed_rank,
-            'state': lambda: self.state,
-            'stop_at_ratio': lambda: self.options['stop_at_ratio'],
-            'stop_ratio': lambda: self.options['stop_ratio'],
-            'time_added': lambda: self.status.added_time,
-            'total_done': lambda: self.status.total_done,
-            'total_payload_download': lambda: self.status.total_payload_download,
-            'total_payload_upload': lambda: self.status.total_payload_upload,
-            'total_peers': lambda: self.status.num_incomplete,
-            'total_seeds': lambda: self.status.num_complete,
-            'total_uploaded': lambda: self.status.all_time_upload,
-            'total_wanted': lambda: self.status.total_wanted,
-            'total_remaining': lambda: self.status.total_wanted
-            - self.status.total_wanted_done,
-            'tracker': lambda: self.status.current_tracker,
-            'tracker_host': self.get_tracker_host,
-            'trackers': lambda: self.trackers,
-            'tracker_status': lambda: self.tracker_status,
-            'upload_payload_rate': lambda: self.status.upload_payload_rate,
-            'comment': lambda: decode_bytes(self.torrent_info.comment())
-            if self.has_metadata
-            else '',
-            'creator': lambda: decode_bytes(self.torrent_info.creator())
-            if self.has_metadata
-            else '',
-            'num_files': lambda: self.torrent_info.num_files()
-            if self.has_metadata
-            else 0,
-            'num_pieces': lambda: self.torrent_info.num_pieces()
-            if self.has_metadata
-            else 0,
-            'piece_length': lambda: self.torrent_info.piece_length()
-            if self.has_metadata
-            else 0,
-            'private': lambda: self.torrent_info.priv() if self.has_metadata else False,
-            'total_size': lambda: self.torrent_info.total_size()
-            if self.has_metadata
-            else 0,
-            'eta': self.get_eta,
-            'file_progress': self.get_file_progress,
-            'files': self.get_files,
-            'orig_files': self.get_orig_files,
-            'is_seed': lambda: self.status.is_seeding,
-            'peers': self.get_peers,
-            'queue': lambda: self.status.queue_position,
-            'ratio': self.get_ratio,
-            'completed_time': lambda: self.status.completed_time,
-            'last_seen_complete': lambda: self.status.last_seen_complete,
-            'name': self.get_name,
-            'pieces': self._get_pieces_info,
-            'seed_mode': lambda: self.status.seed_mode,
-            'super_seeding': lambda: self.status.super_seeding,
-            'time_since_download': lambda: self.status.time_since_download,
-            'time_since_upload': lambda: self.status.time_since_upload,
-            'time_since_transfer': self.get_time_since_transfer,
+    def get_cached_status(self, key, func):
+        """Returns the cached value of an expensive status key.
+
+        The value is read with func when not cached or older than the seconds
+        in CACHED_STATUS_KEYS.
+
+        Args:
+            key (str): The status key, one of CACHED_STATUS_KEYS.
+            func (function): The status function, called with the torrent.
+
+        Returns:
+            The status value.
+
+        """
+        now = time.time()
+        try:
+            expires, value = self.status_cache[key]
+        except KeyError:
+            pass
+        else:
+            if now < expires:
+                self.status_cache_stats[key]['hits'] += 1
+                return value
+
+        self.status_cache_stats[key]['misses'] += 1
+        value = func(self)
+        self.status_cache[key] = (now + CACHED_STATUS_KEYS[key], value)
+        return value
+
+    def invalidate_status_cache(self, *keys):
+        """Drops cached status values so they are read again.
+
+        The generation is bumped as the status values have changed.
+
+        Args:
+            *keys (str): The status keys, all the cached keys if none.
+
+        """
+        if not keys:
+            self.status_cache.clear()
+        for key in keys:
+            self.status_cache.pop(key, None)
+        self.bump_generation()
+
+    @classmethod
+    def get_status_cache_stats(cls, reset=False):
+        """Returns the hit and miss counters of the cached status keys.
+
+        Args:
+            reset (bool): Reset the counters after returning them.
+
+        Returns:
+            dict: The counters in the form ``{key: {'hits': int, 'misses': int}}``.
+
+        """
+        stats = {
+            key: dict(counters) for key, counters in cls.status_cache_stats.items()
         }
+        if reset:
+            for counters in cls.status_cache_stats.values():
+                counters['hits'] = counters['misses'] = 0
+        return stats
+
+    def bump_generation(self):
+        """Marks the torrent status as changed.
+
+        The generation is increased when libtorrent reports a status change in
+        a state_update_alert, the status is updated or the torrent options,
+        state or files change, so a diff status request can skip a torrent
+        which the session has already seen at this generation.
+        """
+        self.generation += 1
 
     def pause(self):
         """Pause this torrent.
@@ -1481,30 +1571,157 @@ def cleanup_prev_status(self):
             if not self.rpcserver.is_session_valid(key):
                 del self.prev_status[key]
 
+    def _get_downloading_pieces(self):
+        """Get the indexes of the pieces being downloaded from peers."""
+        return [
+            peer_info.downloading_piece_index
+            for peer_info in self.handle.get_peer_info()
+            if peer_info.downloading_piece_index >= 0
+        ]
+
     def _get_pieces_info(self):
         """Get the pieces for this torrent."""
         if not self.has_metadata or self.status.is_seeding:
-            pieces = None
-        else:
-            pieces = []
-            for piece, avail_piece in zip(
-                self.status.pieces, self.handle.piece_availability()
-            ):
-                if piece:
-                    pieces.append(3)  # Completed.
-                elif avail_piece:
-                    pieces.append(
-                        1
-                    )  # Available, just not downloaded nor being downloaded.
-                else:
-                    pieces.append(
-                        0
-                    )  # Missing, no known peer with piece, or not asked for yet.
+            return None
+        return piecemap.get_pieces(
+            self.status.pieces,
+            self.handle.piece_availability(),
+            self._get_downloading_pieces(),
+        )
+
+    def get_pieces_rle(self):
+        """Get the pieces for this torrent run-length encoded.
 
-            for peer_info in self.handle.get_peer_info():
-                if peer_info.downloading_piece_index >= 0:
-                    pieces[
-                        peer_info.downloading_piece_index
-                    ] = 2  # Being downloaded from peer.
+        Returns:
+            list of int: The runs as flat pairs of piece state and count, see
+                deluge.common.decode_pieces_rle, or None if seeding.
+
+        """
+        if not self.has_metadata or self.status.is_seeding:
+            return None
+        return piecemap.get_pieces_rle(
+            self.status.pieces,
+            self.handle.piece_availability(),
+            self._get_downloading_pieces(),
+        )
 
-        return pieces
+    #: The functions to get the torrent status keys, called with the torrent.
+    status_funcs = {
+        'active_time': lambda self: self.status.active_time,
+        'seeding_time': lambda self: self.status.seeding_time,
+        'finished_time': lambda self: self.status.finished_time,
+        'all_time_download': lambda self: self.status.all_time_download,
+        'storage_mode': lambda self: self.status.storage_mode.name.split('_')[
+            2
+        ],  # sparse or allocate
+        'distributed_copies': lambda self: max(0.0, self.status.distributed_copies),
+        'download_payload_rate': lambda self: self.status.download_payload_rate,
+        'file_priorities': get_file_priorities,
+        'hash': lambda self: self.torrent_id,
+        'auto_managed': lambda self: self.options['auto_managed'],
+        'is_auto_managed': lambda self: self.options['auto_managed'],
+        'is_finished': lambda self: self.is_finished,
+        'max_connections': lambda self: self.options['max_connections'],
+        'max_download_speed': lambda self: self.options['max_download_speed'],
+        'max_upload_slots': lambda self: self.options['max_upload_slots'],
+        'max_upload_speed': lambda self: self.options['max_upload_speed'],
+        'message': lambda self: self.statusmsg,
+        'move_on_completed_path': lambda self: self.options[
+            'move_completed_path'
+        ],  # Deprecated: move_completed_path
+        'move_on_completed': lambda self: self.options[
+            'move_completed'
+        ],  # Deprecated: Use move_completed
+        'move_completed_path': lambda self: self.options['move_completed_path'],
+        'move_completed': lambda self: self.options['move_completed'],
+        'next_announce': lambda self: self.status.next_announce.seconds,
+        'num_peers': lambda self: self.status.num_peers - self.status.num_seeds,
+        'num_seeds': lambda self: self.status.num_seeds,
+        'owner': lambda self: self.options['owner'],
+        'paused': lambda self: self.status.paused,
+        'prioritize_first_last': lambda self: self.options[
+            'prioritize_first_last_pieces'
+        ],
+        # Deprecated: Use prioritize_first_last_pieces
+        'prioritize_first_last_pieces': lambda self: self.options[
+            'prioritize_first_last_pieces'
+        ],
+        'sequential_download': lambda self: self.options['sequential_download'],
+        'progress': get_progress,
+        'shared': lambda self: self.options['shared'],
+        'remove_at_ratio': lambda self: self.options['remove_at_ratio'],
+        'save_path': lambda self: self.options[
+            'download_location'
+        ],  # Deprecated: Use download_location
+        'download_location': lambda self: self.options['download_location'],
+        'seeds_peers_ratio': lambda self: -1.0
+        if self.status.num_incomplete == 0
+        else (  # Use -1.0 to signify infinity
+            self.status.num_complete / self.status.num_incomplete
+        ),
+        'seed_rank': lambda self: self.status.seed_rank,
+        'state': lambda self: self.state,
+        'stop_at_ratio': lambda self: self.options['stop_at_ratio'],
+        'stop_ratio': lambda self: self.options['stop_ratio'],
+        'time_added': lambda self: self.status.added_time,
+        'total_done': lambda self: self.status.total_done,
+        'total_payload_download': lambda self: self.status.total_payload_download,
+        'total_payload_upload': lambda self: self.status.total_payload_upload,
+        'total_peers': lambda self: self.status.num_incomplete,
+        'total_seeds': lambda self: self.status.num_complete,
+        'total_uploaded': lambda self: self.status.all_time_upload,
+        'total_wanted': lambda self: self.status.total_wanted,
+        'total_remaining': lambda self: self.status.total_wanted
+        - self.status.total_wanted_done,
+        'tracker': lambda self: self.status.current_tracker,
+        'tracker_host': get_tracker_host,
+        'trackers': lambda self: self.trackers,
+        'tracker_status': lambda self: self.tracker_status,
+        'upload_payload_rate': lambda self: self.status.upload_payload_rate,
+        'comment': lambda self: decode_bytes(self.torrent_info.comment())
+        if self.has_metadata
+        else '',
+        'creator': lambda self: decode_bytes(self.torrent_info.creator())
+        if self.has_metadata
+        else '',
+        'num_files': lambda self: self.torrent_info.num_files()
+        if self.has_metadata
+        else 0,
+        'num_pieces': lambda self: self.torrent_info.num_pieces()
+        if self.has_metadata
+        else 0,
+        'piece_length': lambda self: self.torrent_info.piece_length()
+        if self.has_metadata
+        else 0,
+        'private': lambda self: self.torrent_info.priv()
+        if self.has_metadata
+        else False,
+        'total_size': lambda self: self.torrent_info.total_size()
+        if self.has_metadata
+        else 0,
+        'eta': get_eta,
+        'file_progress': cached_status_func('file_progress', get_file_progress),
+        'files': cached_status_func('files', get_files),
+        'orig_files': cached_status_func('orig_files', get_orig_files),
+        'is_seed': lambda self: self.status.is_seeding,
+        'peers': cached_status_func('peers', get_peers),
+        'queue': lambda self: self.status.queue_position,
+        'ratio': get_ratio,
+        'completed_time': lambda self: self.status.completed_time,
+        'last_seen_complete': lambda self: self.status.last_seen_complete,
+        'name': get_name,
+        'pieces': cached_status_func('pieces', _get_pieces_info),
+        'pieces_rle': cached_status_func('pieces_rle', get_pieces_rle),
+        'seed_mode': lambda self: self.status.seed_mode,
+        'super_seeding': lambda self: self.status.super_seeding,
+        'time_since_download': lambda self: self.status.time_since_download,
+        'time_since_upload': lambda self: self.status.time_since_upload,
+        'time_since_transfer': get_time_since_transfer,
+    }
+
+    #: The status getters by requested keys, see get_status_getter.
+    _status_getters = {}
+    max_status_getters = 256
+
+    #: The hit and miss counters of the cached status keys of all the torrents.
+    status_cache_stats = {key: {'hits': 0, 'misses': 0} for key in CACHED_STATUS_KEYS}
@@ -35,6 +35,9 @@
 )
 from deluge.configmanager import ConfigManager, get_config_dir
 from deluge.core.authmanager import AUTH_LEVEL_ADMIN
+from deluge.core.resumestore import ResumeDataStore
+from deluge.core.statejournal import StateJournal
+from deluge.core.statustable import STATUS_KEYS, TorrentStatusTable
 from deluge.core.torrent import Torrent, TorrentOptions, sanitize_filepath
 from deluge.error import AddTorrentError, InvalidTorrentError
 from deluge.event import (
@@ -161,6 +164,11 @@ def __init__(self):
 
         # Create the torrents dict { torrent_id: Torrent }
         self.torrents = {}
+        # The columnar snapshot of the frequently requested status keys.
+        self.status_table = TorrentStatusTable()
+        # The torrents with the stop_at_ratio option and those to check at the next update.
+        self.stop_ratio_torrents = set()
+        self.stop_ratio_pending = set()
         self.queued_torrents = set()
         self.is_saving_state = False
         self.save_resume_data_file_lock = defer.DeferredLock()
@@ -174,14 +182,27 @@ def __init__(self):
         # Keep track of torrents finished but moving storage
         self.waiting_on_finish_moving = []
 
-        # Keeps track of resume data
+        # Keeps track of resume data, with the torrents to write to or remove
+        # from the resume data store on the next save.
         self.resume_data = {}
+        self.resume_store = ResumeDataStore(self.state_dir)
+        self.resume_data_changed = set()
+        self.resume_data_removed = set()
+        # The torrents.fastresume file is removed once migrated to the store.
+        self.resume_data_migrated = False
 
+        # The status requests waiting for the next state_update_alert.
         self.torrents_status_requests = []
         self.status_dict = {}
         self.last_state_update_alert_ts = 0
-
-        # Keep the previous saved state
+        self.last_state_update_post_ts = 0
+        # The oldest status in seconds a status request is answered from,
+        # unless the request has its own max_age.
+        self.status_max_age = 1.5
+
+        # The torrents.state file, with the journal of the changes since, and
+        # the previous saved TorrentState of each torrent.
+        self.state_journal = StateJournal(self.state_dir)
         self.prev_saved_state = None
 
         # Register set functions
@@ -228,6 +249,10 @@ def __init__(self):
             )
             self.alerts.register_handler(alert_handle, on_alert_func)
 
+        component.get('EventManager').register_event_handler(
+            'TorrentStateChangedEvent', self.status_table.set_state
+        )
+
         # Define timers
         self.save_state_timer = LoopingCall(self.save_state)
         self.save_resume_data_timer = LoopingCall(self.save_resume_data)
@@ -273,28 +298,52 @@ def stop(self):
             os.remove(self.temp_file)
 
     def update(self):
-        for torrent_id, torrent in self.torrents.items():
+        """Stops or removes the torrents that have reached their stop ratio.
+
+        Only the torrents with the stop_at_ratio option that had a status or
+        ratio option change since the last update are checked, using the status
+        from the last state_update_alert.
+        """
+        pending, self.stop_ratio_pending = self.stop_ratio_pending, set()
+        for torrent_id in pending:
+            try:
+                torrent = self.torrents[torrent_id]
+            except KeyError:
+                self.stop_ratio_torrents.discard(torrent_id)
+                continue
             # XXX: Should the state check be those that _can_ be stopped at ratio
-            if torrent.options['stop_at_ratio'] and torrent.state not in (
+            # A torrent skipped here is checked again on its next status change.
+            if not torrent.options['stop_at_ratio'] or torrent.state in (
                 'Checking',
                 'Allocating',
                 'Paused',
                 'Queued',
             ):
-                # If the global setting is set, but the per-torrent isn't...
-                # Just skip to the next torrent.
-                # This is so that a user can turn-off the stop at ratio option on a per-torrent basis
-                if not torrent.options['stop_at_ratio']:
-                    continue
-                if (
-                    torrent.get_ratio() >= torrent.options['stop_ratio']
-                    and torrent.is_finished
-                ):
-                    if torrent.options['remove_at_ratio']:
-                        self.remove(torrent_id)
-                        break
-                    if not torrent.handle.status().paused:
-                        torrent.pause()
+                continue
+            if torrent.is_finished and (
+                torrent.get_ratio() >= torrent.options['stop_ratio']
+            ):
+                if torrent.options['remove_at_ratio']:
+                    self.remove(torrent_id)
+                elif not torrent.status.paused:
+                    torrent.pause()
+
+    def update_stop_ratio_index(self, torrent):
+        """Updates the index of the torrents to stop at ratio.
+
+        Called when the stop at ratio options of a torrent change, the torrent
+        is checked at the next update.
+
+        Args:
+            torrent (Torrent): The torrent.
+
+        """
+        if torrent.options['stop_at_ratio']:
+            self.stop_ratio_torrents.add(torrent.torrent_id)
+            self.stop_ratio_pending.add(torrent.torrent_id)
+        else:
+            self.stop_ratio_torrents.discard(torrent.torrent_id)
+            self.stop_ratio_pending.discard(torrent.torrent_id)
 
     def __getitem__(self, torrent_id):
         """Return the Torrent with torrent_id.
@@ -645,6 +694,8 @@ def _add_torrent_obj(
         # Create a Torrent object and add to the dictionary.
         torrent = Torrent(handle, options, state, filename, magnet)
         self.torrents[torrent.torrent_id] = torrent
+        self.status_table.add(torrent)
+        self.update_stop_ratio_index(torrent)
 
         # Resume AlertManager if paused for adding torrent to libtorrent.
         component.resume('AlertManager')
@@ -652,6 +703,8 @@ def _add_torrent_obj(
         # Store the orignal resume_data, in case of errors.
         if resume_data:
             self.resume_data[torrent.torrent_id] = resume_data
+        # A torrent removed and added again keeps its resume data file.
+        self.resume_data_removed.discard(torrent.torrent_id)
 
         # Add to queued torrents set.
         self.queued_torrents.add(torrent.torrent_id)
@@ -744,6 +797,8 @@ def remove(self, torrent_id, remove_data=False, save_state=True):
 
         # Remove fastresume data if it is exists
         self.resume_data.pop(torrent_id, None)
+        self.resume_data_changed.discard(torrent_id)
+        self.resume_data_removed.add(torrent_id)
 
         # Remove the .torrent file in the state and copy location, if user requested.
         delete_copies = (
@@ -763,6 +818,9 @@ def remove(self, torrent_id, remove_data=False, save_state=True):
 
         # Remove the torrent from deluge's session
         del self.torrents[torrent_id]
+        self.status_table.remove(torrent_id)
+        self.stop_ratio_torrents.discard(torrent_id)
+        self.stop_ratio_pending.discard(torrent_id)
 
         if save_state:
             self.save_state()
@@ -827,6 +885,11 @@ def open_state(self):
                     self.archive_state(message)
             else:
                 log.info('Successfully loaded %s', filepath)
+                if not filepath.endswith('.bak') and self.state_journal.replay(state):
+                    # The next save appends only the changes since.
+                    self.prev_saved_state = {
+                        t_state.torrent_id: t_state for t_state in state.torrents
+                    }
                 break
 
         return state if state else TorrentManagerState()
@@ -846,7 +909,9 @@ def load_state(self):
         state.torrents.sort(
             key=operator.attrgetter('queue'), reverse=self.config['queue_new_to_top']
         )
-        resume_data = self.load_resume_data_file()
+        resume_data = self.load_resume_data_file(
+            [t_state.torrent_id for t_state in state.torrents]
+        )
 
         deferreds = []
         for t_state in state.torrents:
@@ -969,47 +1034,35 @@ def on_state_saved(arg):
         return d
 
     def _save_state(self):
-        """Save the state of the TorrentManager to the torrents.state file."""
-        state = self.create_state()
-
-        # If the state hasn't changed, no need to save it
-        if self.prev_saved_state == state:
-            return
+        """Save the state of the TorrentManager to the torrents.state file.
 
-        filename = 'torrents.state'
-        filepath = os.path.join(self.state_dir, filename)
-        filepath_bak = filepath + '.bak'
-        filepath_tmp = filepath + '.tmp'
+        Only the changed and removed torrents are appended to the journal, the
+        whole state is written when the journal is compacted.
+        """
+        state = self.create_state()
+        t_states = {t_state.torrent_id: t_state for t_state in state.torrents}
 
-        try:
-            log.debug('Creating the temporary file: %s', filepath_tmp)
-            with open(filepath_tmp, 'wb', 0) as _file:
-                pickle.dump(state, _file, protocol=2)
-                _file.flush()
-                os.fsync(_file.fileno())
-        except (OSError, pickle.PicklingError) as ex:
-            log.error('Unable to save %s: %s', filename, ex)
+        if self.prev_saved_state is None or self.state_journal.needs_compaction():
+            if self.prev_saved_state == t_states:
+                return
+            if self.state_journal.compact(state):
+                self.prev_saved_state = t_states
             return
 
-        try:
-            log.debug('Creating backup of %s at: %s', filename, filepath_bak)
-            if os.path.isfile(filepath_bak):
-                os.remove(filepath_bak)
-            if os.path.isfile(filepath):
-                os.rename(filepath, filepath_bak)
-        except OSError as ex:
-            log.error('Unable to backup %s to %s: %s', filepath, filepath_bak, ex)
+        prev_saved_state = self.prev_saved_state
+        changed = [
+            t_state
+            for torrent_id, t_state in t_states.items()
+            if prev_saved_state.get(torrent_id) != t_state
+        ]
+        removed = [
+            torrent_id for torrent_id in prev_saved_state if torrent_id not in t_states
+        ]
+        # If the state hasn't changed, no need to save it
+        if not changed and not removed:
             return
-
-        try:
-            log.debug('Saving %s to: %s', filename, filepath)
-            os.rename(filepath_tmp, filepath)
-            self.prev_saved_state = state
-        except OSError as ex:
-            log.error('Failed to set new state file %s: %s', filepath, ex)
-            if os.path.isfile(filepath_bak):
-                log.info('Restoring backup of state from: %s', filepath_bak)
-                os.rename(filepath_bak, filepath)
+        if self.state_journal.append(changed, removed):
+            self.prev_saved_state = t_states
 
     def save_resume_data(self, torrent_ids=None, flush_disk_cache=False):
         """Saves torrents resume data.
@@ -1060,8 +1113,39 @@ def on_all_resume_data_finished(dummy_result):
 
         return DeferredList(deferreds).addBoth(on_all_resume_data_finished)
 
-    def load_resume_data_file(self):
-        """Load the resume data from file for all torrents.
+    def load_resume_data_file(self, torrent_ids):
+        """Load the resume data of the torrents from the resume data store.
+
+        The resume data not yet in the store is read from the torrents.fastresume
+        file of previous versions, and written to the store on the next save.
+
+        Args:
+            torrent_ids (list of str): The torrents to load the resume data for.
+
+        Returns:
+            dict: A dict of torrents and their resume_data.
+
+        """
+        start = datetime.datetime.now()
+        resume_data = self.resume_store.load(torrent_ids)
+        log.info(
+            'Loaded the resume data of %d torrents in %s',
+            len(resume_data),
+            str(datetime.datetime.now() - start),
+        )
+
+        missing = [t_id for t_id in torrent_ids if t_id not in resume_data]
+        if missing:
+            old_resume_data = self.load_old_resume_data_file()
+            for torrent_id in missing:
+                if torrent_id in old_resume_data:
+                    resume_data[torrent_id] = old_resume_data[torrent_id]
+                    self.resume_data_changed.add(torrent_id)
+            self.resume_data_migrated = bool(old_resume_data)
+        return resume_data
+
+    def load_old_resume_data_file(self):
+        """Load the resume data of all the torrents from the torrents.fastresume file.
 
         Returns:
             dict: A dict of torrents and their resume_data.
@@ -1073,30 +1157,31 @@ def load_resume_data_file(self):
         old_data_filepath = os.path.join(get_config_dir(), filename)
 
         for _filepath in (filepath, filepath_bak, old_data_filepath):
+            if not os.path.isfile(_filepath):
+                continue
             log.info('Opening %s for load: %s', filename, _filepath)
             try:
                 with open(_filepath, 'rb') as _file:
                     resume_data = lt.bdecode(_file.read())
             except (IOError, EOFError, RuntimeError) as ex:
-                if self.torrents:
-                    log.warning('Unable to load %s: %s', _filepath, ex)
+                log.warning('Unable to load %s: %s', _filepath, ex)
                 resume_data = None
             else:
+                if resume_data is None:
+                    continue
                 # lt.bdecode returns the dict keys as bytes so decode them.
                 resume_data = {k.decode(): v for k, v in resume_data.items()}
                 log.info('Successfully loaded %s: %s', filename, _filepath)
-                break
+                return resume_data
 
-        # If the libtorrent bdecode doesn't happen properly, it will return None
-        # so we need to make sure we return a {}
-        if resume_data is None:
-            return {}
-        else:
-            return resume_data
+        return {}
 
     def save_resume_data_file(self, queue_task=False):
         """Save resume data to file in a separate thread to avoid blocking main thread.
 
+        Only the resume data of the torrents with new resume data since the
+        last save is written.
+
         Args:
             queue_task (bool): If True and a save task is already running then queue
                 this save task to run next. Default is to not queue save tasks.
@@ -1110,9 +1195,22 @@ def save_resume_data_file(self, queue_task=False):
             return defer.succeed(None)
 
         def on_lock_aquired():
-            d = threads.deferToThread(self._save_resume_data_file)
+            changed, self.resume_data_changed = self.resume_data_changed, set()
+            removed, self.resume_data_removed = self.resume_data_removed, set()
+            resume_data = {
+                torrent_id: self.resume_data[torrent_id]
+                for torrent_id in changed
+                if torrent_id in self.resume_data
+            }
+            d = threads.deferToThread(self._save_resume_data_file, resume_data, removed)
 
             def on_resume_data_file_saved(arg):
+                if arg is not True:
+                    # Try again on the next save.
+                    self.resume_data_changed.update(
+                        t_id for t_id in resume_data if t_id in self.resume_data
+                    )
+                    self.resume_data_removed.update(removed)
                 if self.save_resume_data_timer.running:
                     self.save_resume_data_timer.reset()
                 return arg
@@ -1122,51 +1220,30 @@ def on_resume_data_file_saved(arg):
 
         return self.save_resume_data_file_lock.run(on_lock_aquired)
 
-    def _save_resume_data_file(self):
-        """Saves the resume data file with the contents of self.resume_data"""
-        if not self.resume_data:
-            return True
+    def _save_resume_data_file(self, resume_data, removed):
+        """Saves the changed resume data to the resume data store.
 
-        filename = 'torrents.fastresume'
-        filepath = os.path.join(self.state_dir, filename)
-        filepath_bak = filepath + '.bak'
-        filepath_tmp = filepath + '.tmp'
+        Args:
+            resume_data (dict): The resume data of the changed torrents.
+            removed (set): The removed torrents.
 
-        try:
-            log.debug('Creating the temporary file: %s', filepath_tmp)
-            with open(filepath_tmp, 'wb', 0) as _file:
-                _file.write(lt.bencode(self.resume_data))
-                _file.flush()
-                os.fsync(_file.fileno())
-        except (OSError, EOFError) as ex:
-            log.error('Unable to save %s: %s', filename, ex)
-            return False
+        Returns:
+            bool: True if the resume data was saved.
 
-        try:
-            log.debug('Creating backup of %s at: %s', filename, filepath_bak)
-            if os.path.isfile(filepath_bak):
-                os.remove(filepath_bak)
-            if os.path.isfile(filepath):
-                os.rename(filepath, filepath_bak)
-        except OSError as ex:
-            log.error('Unable to backup %s to %s: %s', filepath, filepath_bak, ex)
+        """
+        # Remove before writing, a torrent added again is not removed.
+        self.resume_store.remove(removed.difference(resume_data))
+        if not self.resume_store.write(resume_data):
             return False
 
-        try:
-            log.debug('Saving %s to: %s', filename, filepath)
-            os.rename(filepath_tmp, filepath)
-        except OSError as ex:
-            log.error('Failed to set new file %s: %s', filepath, ex)
-            if os.path.isfile(filepath_bak):
-                log.info('Restoring backup from: %s', filepath_bak)
-                os.rename(filepath_bak, filepath)
-        else:
-            # Sync the rename operations for the directory
-            if hasattr(os, 'O_DIRECTORY'):
-                dirfd = os.open(os.path.dirname(filepath), os.O_DIRECTORY)
-                os.fsync(dirfd)
-                os.close(dirfd)
-            return True
+        if self.resume_data_migrated:
+            self.resume_data_migrated = False
+            filepath = os.path.join(self.state_dir, 'torrents.fastresume')
+            log.info('Migrated %s to: %s', filepath, self.resume_store.dirpath)
+            for _filepath in (filepath, filepath + '.bak'):
+                if os.path.isfile(_filepath):
+                    os.remove(_filepath)
+        return True
 
     def archive_state(self, message):
         log.warning(message)
@@ -1174,6 +1251,7 @@ def archive_state(self, message):
         for filename in ('torrents.fastresume', 'torrents.state'):
             filepath = os.path.join(self.state_dir, filename)
             arc_filepaths.extend([filepath, filepath + '.bak'])
+        arc_filepaths.append(self.state_journal.journal_filepath)
 
         archive_files('state', arc_filepaths, message=message)
 
@@ -1489,6 +1567,8 @@ def on_alert_save_resume_data(self, alert):
         if torrent_id in self.torrents:
             # libtorrent add_torrent expects bencoded resume_data.
             self.resume_data[torrent_id] = lt.bencode(alert.resume_data)
+            self.resume_data_changed.add(torrent_id)
+            self.resume_data_removed.discard(torrent_id)
 
         if torrent_id in self.waiting_on_resume_data:
             self.waiting_on_resume_data[torrent_id].callback(None)
@@ -1539,6 +1619,7 @@ def on_alert_file_renamed(self, alert):
         except (RuntimeError, KeyError):
             return
 
+        torrent.invalidate_status_cache('files')
         new_name = decode_bytes(alert.new_name())
         log.debug('index: %s name: %s', alert.index, new_name)
 
@@ -1597,6 +1678,9 @@ def on_alert_file_completed(self, alert):
         except RuntimeError:
             return
         if torrent_id in self.torrents:
+            self.torrents[torrent_id].invalidate_status_cache(
+                'file_progress', 'pieces', 'pieces_rle'
+            )
             component.get('EventManager').emit(
                 TorrentFileCompletedEvent(torrent_id, alert.index)
             )
@@ -1616,9 +1700,20 @@ def on_alert_state_update(self, alert):
             except RuntimeError:
                 continue
             if torrent_id in self.torrents:
-                self.torrents[torrent_id].update_status(t_status)
-
-        self.handle_torrents_status_callback(self.torrents_status_requests.pop())
+                torrent = self.torrents[torrent_id]
+                torrent.update_status(t_status)
+                torrent.bump_generation()
+                self.status_table.update(torrent)
+                if torrent_id in self.stop_ratio_torrents:
+                    self.stop_ratio_pending.add(torrent_id)
+
+        # Answer all the status requests waiting for this update at once.
+        status_requests, self.torrents_status_requests = (
+            self.torrents_status_requests,
+            [],
+        )
+        for status_request in status_requests:
+            self.handle_torrents_status_callback(status_request)
 
     def on_alert_external_ip(self, alert):
         """Alert handler for libtorrent external_ip_alert
@@ -1668,57 +1763,108 @@ def separate_keys(self, keys, torrent_ids):
         if self.torrents:
             for torrent_id in torrent_ids:
                 if torrent_id in self.torrents:
-                    status_keys = list(self.torrents[torrent_id].status_funcs)
-                    leftover_keys = list(set(keys) - set(status_keys))
-                    torrent_keys = list(set(keys) - set(leftover_keys))
+                    # Keep the requested order so the same keys give the same
+                    # status getter and generation check in Torrent.get_status.
+                    status_funcs = Torrent.status_funcs
+                    torrent_keys = [key for key in keys if key in status_funcs]
+                    leftover_keys = [key for key in keys if key not in status_funcs]
                     return torrent_keys, leftover_keys
         return [], []
 
+    def get_table_status(self, torrent_ids, keys):
+        """Returns the status keys served by the status table of the torrents.
+
+        Args:
+            torrent_ids (list of str): The torrents in the session.
+            keys (list of str): The status keys, those not in the table are
+                ignored.
+
+        Returns:
+            dict: The status of the torrents for the keys in the table.
+
+        """
+        return self.status_table.get_status(torrent_ids, keys, self.torrents)
+
     def handle_torrents_status_callback(self, status_request):
         """Build the status dictionary with torrent values"""
-        d, torrent_ids, keys, diff = status_request
-        status_dict = {}.fromkeys(torrent_ids)
+        d, torrent_ids, keys, diff, session_id = status_request
+        # The torrent_id may not exist in the session, could be the clients
+        # cache (sessionproxy) isn't up to speed.
+        torrent_ids = [t_id for t_id in torrent_ids if t_id in self.torrents]
         torrent_keys, plugin_keys = self.separate_keys(keys, torrent_ids)
-
-        # Get the torrent status for each torrent_id
+        status_dict = {torrent_id: {} for torrent_id in torrent_ids}
+
+        if diff:
+            # Skip the torrents that have not changed since the session last
+            # got their status.
+            status_keys = tuple(torrent_keys if keys else Torrent.status_funcs)
+            torrent_ids = [
+                torrent_id
+                for torrent_id in torrent_ids
+                if not self.torrents[torrent_id].is_status_seen(session_id, status_keys)
+            ]
+
+        # Read the keys in the status table for all the torrents at once.
+        table_status = self.get_table_status(
+            torrent_ids, torrent_keys if keys else STATUS_KEYS
+        )
         for torrent_id in torrent_ids:
-            if torrent_id not in self.torrents:
-                # The torrent_id does not exist in the dict.
-                # Could be the clients cache (sessionproxy) isn't up to speed.
-                del status_dict[torrent_id]
-            else:
-                status_dict[torrent_id] = self.torrents[torrent_id].get_status(
-                    torrent_keys, diff, all_keys=not keys
-                )
+            status_dict[torrent_id] = self.torrents[torrent_id].get_status(
+                torrent_keys,
+                diff,
+                all_keys=not keys,
+                values=table_status[torrent_id],
+                session_id=session_id,
+            )
         self.status_dict = status_dict
         d.callback((status_dict, plugin_keys))
 
-    def torrents_status_update(self, torrent_ids, keys, diff=False):
+    def torrents_status_update(self, torrent_ids, keys, diff=False, max_age=None):
         """Returns status dict for the supplied torrent_ids async.
 
         Note:
             If torrent states was updated recently post_torrent_updates is not called and
-            instead cached state is used.
+            instead cached state is used. The requests waiting for an update
+            share a single post_torrent_updates call and are all answered from
+            the resulting state_update_alert.
 
         Args:
             torrent_ids (list of str): The torrent IDs to get the status of.
             keys (list of str): The keys to get the status on.
             diff (bool, optional): If True, will return a diff of the changes since the
                 last call to get_status based on the session_id, defaults to False.
+            max_age (float, optional): The oldest cached status in seconds
+                accepted, defaults to status_max_age.
 
         Returns:
             dict: A status dictionary for the requested torrents.
 
         """
         d = Deferred()
-        now = time.time()
+        # The session is kept as the request may be answered after other RPCs.
+        session_id = component.get('RPCServer').get_session_id()
+        status_request = (d, torrent_ids, keys, diff, session_id)
+        if max_age is None:
+            max_age = self.status_max_age
         # If last update was recent, use cached data instead of request updates from libtorrent
-        if (now - self.last_state_update_alert_ts) < 1.5:
-            reactor.callLater(
-                0, self.handle_torrents_status_callback, (d, torrent_ids, keys, diff)
-            )
+        if (time.time() - self.last_state_update_alert_ts) < max_age:
+            reactor.callLater(0, self.handle_torrents_status_callback, status_request)
         else:
-            # Ask libtorrent for status update
-            self.torrents_status_requests.insert(0, (d, torrent_ids, keys, diff))
-            self.session.post_torrent_updates()
+            self.torrents_status_requests.append(status_request)
+            self.post_torrent_updates()
         return d
+
+    def post_torrent_updates(self):
+        """Asks libtorrent for a state_update_alert.
+
+        The call is skipped if an update was already asked for and not yet
+        received, unless it was asked a while ago and the alert may be lost.
+        """
+        now = time.time()
+        if (
+            self.last_state_update_post_ts > self.last_state_update_alert_ts
+            and now - self.last_state_update_post_ts < 5
+        ):
+            return
+        self.last_state_update_post_ts = now
+        self.session.post_torrent_updates()
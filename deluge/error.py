@@ -43,6 +43,10 @@ class InvalidPathError(DelugeError):
     pass
 
 
+class InvalidFilterError(DelugeError):
+    pass
+
+
 class WrappedException(DelugeError):
     def __init__(self, message, exception_type, traceback):
         super(WrappedException, self).__init__(message)
@@ -111,6 +111,37 @@ def __init__(self, torrent_id, state):
         self._args = [torrent_id, state]
 
 
+class TorrentOptionsChangedEvent(DelugeEvent):
+    """
+    Emitted when the options of a torrent in the session are set.
+    """
+
+    def __init__(self, torrent_id, keys):
+        """
+        :param torrent_id: the torrent_id
+        :type torrent_id: string
+        :param keys: the option keys that were set
+        :type keys: list
+        """
+        self._args = [torrent_id, keys]
+
+
+class TorrentsStatusChangedEvent(DelugeEvent):
+    """
+    Emitted to a session subscribed with `core.subscribe_status` when the status
+    of the subscribed torrents has changed.
+    """
+
+    def __init__(self, status):
+        """
+        Args:
+            status (dict): The changed status keys of the torrents in the form
+                {torrent_id: {key: value}}. A status of None means the torrent
+                no longer matches the subscription filter.
+        """
+        self._args = [status]
+
+
 class TorrentTrackerStatusEvent(DelugeEvent):
     """
     Emitted when a torrents tracker status changes.
@@ -77,7 +77,9 @@ class Core(CorePluginBase):
     def enable(self):
         log.info('*** Start Label plugin ***')
         self.plugin = component.get('CorePluginManager')
-        self.plugin.register_status_field('label', self._status_get_label)
+        self.plugin.register_status_field(
+            'label', self._status_get_label, push_changes=True
+        )
 
         # __init__
         core = component.get('Core')
@@ -102,12 +104,14 @@ def enable(self):
         component.get('FilterManager').register_tree_field(
             'label', self.init_filter_dict
         )
+        component.get('FilterManager').register_index('label', self._status_get_label)
 
         log.debug('Label plugin enabled..')
 
     def disable(self):
         self.plugin.deregister_status_field('label')
         component.get('FilterManager').deregister_tree_field('label')
+        component.get('FilterManager').deregister_index('label')
         component.get('EventManager').deregister_event_handler(
             'TorrentAddedEvent', self.post_torrent_add
         )
@@ -148,6 +152,8 @@ def clean_config(self):
             if (label_id not in self.labels) or (torrent_id not in self.torrents):
                 log.debug('label: rm %s:%s', torrent_id, label_id)
                 del self.torrent_labels[torrent_id]
+                component.get('FilterManager').update_index('label', torrent_id)
+                self.plugin.status_changed([torrent_id])
 
     def clean_initial_config(self):
         """
@@ -188,6 +194,7 @@ def add(self, label_id):
 
         self.labels[label_id] = dict(OPTIONS_DEFAULTS)
         self.config.save()
+        component.get('FilterManager').bump_tree_version()
 
     @export
     def remove(self, label_id):
@@ -196,6 +203,7 @@ def remove(self, label_id):
         del self.labels[label_id]
         self.clean_config()
         self.config.save()
+        component.get('FilterManager').bump_tree_version()
 
     def _set_torrent_options(self, torrent_id, label_id):
         options = self.labels[label_id]
@@ -327,6 +335,8 @@ def set_torrent(self, torrent_id, label_id):
         if label_id:
             self.torrent_labels[torrent_id] = label_id
             self._set_torrent_options(torrent_id, label_id)
+        component.get('FilterManager').update_index('label', torrent_id)
+        self.plugin.status_changed([torrent_id])
 
         self.config.save()
 
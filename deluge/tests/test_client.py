@@ -13,6 +13,7 @@
 from deluge import error
 from deluge.common import AUTH_LEVEL_NORMAL, get_localhost_auth, windows_check
 from deluge.core.authmanager import AUTH_LEVEL_ADMIN
+from deluge.transfer import PROTOCOL_VERSION
 from deluge.ui.client import Client, DaemonSSLProxy, client
 
 from .basetest import BaseTestCase
@@ -119,6 +120,102 @@ def on_connect(result):
         d.addCallbacks(on_connect, self.fail)
         return d
 
+    def test_connect_protocol_version(self):
+        username, password = get_localhost_auth()
+        d = client.connect(
+            'localhost', self.listen_port, username=username, password=password
+        )
+
+        def on_connect(result):
+            self.assertEqual(
+                client._daemon_proxy.protocol.get_peer_protocol_version(),
+                PROTOCOL_VERSION,
+            )
+            self.addCleanup(client.disconnect)
+            return result
+
+        d.addCallbacks(on_connect, self.fail)
+        return d
+
+    @defer.inlineCallbacks
+    def test_batch(self):
+        username, password = get_localhost_auth()
+        yield client.connect(
+            'localhost', self.listen_port, username=username, password=password
+        )
+        self.addCleanup(client.disconnect)
+
+        bytes_sent = client.get_bytes_sent()
+        with client.batch():
+            d1 = client.core.get_config_value('max_connections_global')
+            d2 = client.core.get_auth_levels_mappings()
+            d3 = client.core.invalid_method()
+            # Nothing is sent until the batch is closed.
+            self.assertEqual(bytes_sent, client.get_bytes_sent())
+        self.assertTrue(client.get_bytes_sent() > bytes_sent)
+
+        result = yield d1
+        self.assertEqual(200, result)
+        result = yield d2
+        self.assertEqual(2, len(result))
+        try:
+            yield d3
+        except error.WrappedException as ex:
+            self.assertEqual('AttributeError', ex.type)
+        else:
+            self.fail('Expected an exception for the invalid method')
+
+    def test_batch_fallback(self):
+        def fake_call(method, *args, **kwargs):
+            if method == 'daemon.batch':
+                return defer.fail(
+                    error.WrappedException(
+                        'RPC call on invalid function: %s' % invalid_method,
+                        'AttributeError',
+                        '',
+                    )
+                )
+            return defer.succeed(method)
+
+        # Only an older daemon without daemon.batch sends the calls one by one.
+        for invalid_method, expected in (
+            ('daemon.batch', 'core.get_session_state'),
+            ('core.get_session_state', None),
+        ):
+            proxy = DaemonSSLProxy()
+            proxy.start_batch()
+            d = proxy.call('core.get_session_state')
+            self.patch(proxy, 'call', fake_call)
+            proxy.send_batch()
+            results = []
+            d.addCallbacks(results.append, lambda failure: results.append(None))
+            self.assertEqual([expected], results)
+
+    @defer.inlineCallbacks
+    def test_stream_call(self):
+        username, password = get_localhost_auth()
+        yield client.connect(
+            'localhost', self.listen_port, username=username, password=password
+        )
+        self.addCleanup(client.disconnect)
+
+        method_list = yield client.daemon.get_method_list()
+        result = yield client.stream_call('daemon.get_method_list', chunk_size=10)
+        self.assertEqual(method_list, result)
+
+        chunks = []
+        result = yield client.stream_call(
+            'daemon.get_method_list', chunk_size=10, on_chunk=chunks.append
+        )
+        self.assertIsNone(result)
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(list(method_list), [m for chunk in chunks for m in chunk])
+
+        result = yield client.stream_call(
+            'core.get_config_value', ['max_connections_global']
+        )
+        self.assertEqual(200, result)
+
     def test_connect_bad_password(self):
         username, password = get_localhost_auth()
         d = client.connect(
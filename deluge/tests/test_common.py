@@ -15,6 +15,8 @@
 from deluge.common import (
     VersionSplit,
     archive_files,
+    decode_pieces_rle,
+    encode_pieces_rle,
     fdate,
     fpcnt,
     fpeer,
@@ -160,6 +162,14 @@ def test_parse_human_size(self):
                 parsed, byte_size, 'Mismatch when converting: %s' % human_size
             )
 
+    def test_pieces_rle(self):
+        pieces = [3, 3, 3, 1, 1, 2, 0, 0, 0, 3]
+        runs = encode_pieces_rle(pieces)
+        self.assertEqual([3, 3, 1, 2, 2, 1, 0, 3, 3, 1], runs)
+        self.assertEqual(pieces, decode_pieces_rle(runs))
+        self.assertEqual([], encode_pieces_rle([]))
+        self.assertEqual([], decode_pieces_rle([]))
+
     def test_archive_files(self):
         arc_filelist = [
             get_test_data_file('test.torrent'),
@@ -24,9 +24,15 @@
 import deluge.component as component
 import deluge.core.torrent
 from deluge._libtorrent import lt
+from deluge.common import AUTH_LEVEL_NORMAL
 from deluge.core.core import Core
 from deluge.core.rpcserver import RPCServer
-from deluge.error import AddTorrentError, InvalidTorrentError
+from deluge.error import (
+    AddTorrentError,
+    DelugeError,
+    InvalidFilterError,
+    InvalidTorrentError,
+)
 
 from . import common
 from .basetest import BaseTestCase
@@ -352,6 +358,189 @@ def test_remove_torrent_invalid(self):
             True,
         )
 
+    @defer.inlineCallbacks
+    def test_filter_index(self):
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = b64encode(_file.read())
+        torrent_id = yield self.core.add_torrent_file_async(filename, filedump, {})
+        torrent = self.core.torrentmanager[torrent_id]
+        filtermanager = self.core.filtermanager
+        self.assertEqual(
+            [torrent_id], filtermanager.filter_torrent_ids({'state': torrent.state})
+        )
+
+        torrent.set_options({'owner': 'user1'})
+        self.assertEqual(
+            [torrent_id], filtermanager.filter_torrent_ids({'owner': ['user1', 'x']})
+        )
+        self.assertEqual([], filtermanager.filter_torrent_ids({'owner': 'x'}))
+        self.assertIn(('user1', 1), self.core.get_filter_tree()['owner'])
+
+        # A plugin field.
+        labels = {torrent_id: 'linux'}
+        filtermanager.register_index('label', labels.get)
+        self.assertEqual(
+            [torrent_id], filtermanager.filter_torrent_ids({'label': 'linux'})
+        )
+        labels[torrent_id] = 'bsd'
+        filtermanager.update_index('label', torrent_id)
+        self.assertEqual([], filtermanager.filter_torrent_ids({'label': 'linux'}))
+        filtermanager.deregister_index('label')
+
+        self.core.remove_torrent(torrent_id, True)
+        self.assertEqual({}, filtermanager.indexes['state'].values)
+        self.assertEqual({}, filtermanager.indexes['owner'].torrent_ids)
+
+    @defer.inlineCallbacks
+    def test_filter_by_name(self):
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = b64encode(_file.read())
+        torrent_id = yield self.core.add_torrent_file_async(filename, filedump, {})
+        filtermanager = self.core.filtermanager
+
+        for search in ['az', 'cvsupdater', 'UPDATER_2.6', 'r_2.6.2.jar']:
+            self.assertEqual(
+                [torrent_id], filtermanager.filter_torrent_ids({'name': search})
+            )
+        self.assertEqual([], filtermanager.filter_torrent_ids({'name': 'updaterx'}))
+        self.assertEqual(
+            [], filtermanager.filter_torrent_ids({'name': 'UPDATER::match'})
+        )
+        self.assertEqual({torrent_id}, filtermanager.name_index.search('az', True))
+        self.assertEqual(set(), filtermanager.name_index.search('cvs', True))
+        self.assertEqual(
+            [torrent_id], filtermanager.filter_torrent_ids({'keyword': 'Updater'})
+        )
+
+        self.core.set_torrent_options([torrent_id], {'name': 'Renamed'})
+        self.assertEqual([], filtermanager.filter_torrent_ids({'name': 'updater'}))
+        self.assertEqual(
+            [torrent_id], filtermanager.filter_torrent_ids({'name': 'named'})
+        )
+
+        self.core.remove_torrent(torrent_id, True)
+        self.assertEqual({}, filtermanager.name_index.trigrams)
+        self.assertEqual(0, len(filtermanager.keyword_index))
+
+    @defer.inlineCallbacks
+    def test_filter_expression(self):
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = b64encode(_file.read())
+        torrent_id = yield self.core.add_torrent_file_async(filename, filedump, {})
+        filtermanager = self.core.filtermanager
+
+        for expression, expected in [
+            ('total_size < 1 MiB', [torrent_id]),
+            ('total_size > 300KiB and ratio < 0', [torrent_id]),
+            ('seeding_time > 30d or not num_peers == 0', []),
+            ("name == 'azcvsupdater_2.6.2.jar'", [torrent_id]),
+            ('state == Error or (paused == false and ratio > 1.5)', []),
+            ('max_download_speed == -1 and ratio > -1.5', [torrent_id]),
+            ('max_download_speed != -1', []),
+        ]:
+            self.assertEqual(
+                expected,
+                filtermanager.filter_torrent_ids({'expression': expression}),
+                expression,
+            )
+        status = yield self.core.get_torrents_status(
+            {'expression': 'total_size < 1 MiB'}, ['name']
+        )
+        self.assertEqual([torrent_id], list(status))
+
+        for expression in ['ratio >', 'ratio > 2 GiBs', 'unknown_key == 1']:
+            self.assertRaises(
+                InvalidFilterError,
+                filtermanager.filter_torrent_ids,
+                {'expression': expression},
+            )
+
+    @defer.inlineCallbacks
+    def test_get_torrents_status_page(self):
+        torrent_ids = []
+        for name in [
+            'test.torrent',
+            'unicode_filenames.torrent',
+            'dir_with_6_files.torrent',
+        ]:
+            filename = common.get_test_data_file(name)
+            with open(filename, 'rb') as _file:
+                filedump = b64encode(_file.read())
+            torrent_id = yield self.core.add_torrent_file_async(filename, filedump, {})
+            torrent_ids.append(torrent_id)
+        by_size = sorted(
+            torrent_ids,
+            key=lambda t_id: self.core.torrentmanager[t_id].get_status(['total_size'])[
+                'total_size'
+            ],
+        )
+
+        total, page = yield self.core.get_torrents_status_page(
+            {}, ['total_size'], sort_key='total_size', offset=1, limit=1
+        )
+        self.assertEqual(3, total)
+        self.assertEqual([by_size[1]], [t_id for t_id, status in page])
+        self.assertEqual(['total_size'], list(page[0][1]))
+
+        total, page = yield self.core.get_torrents_status_page(
+            {'id': torrent_ids[:2]}, ['name'], sort_key='total_size', reverse=True
+        )
+        self.assertEqual(2, total)
+        self.assertEqual(
+            [t_id for t_id in reversed(by_size) if t_id in torrent_ids[:2]],
+            [t_id for t_id, status in page],
+        )
+
+        total, page = yield self.core.get_torrents_status_page(
+            {}, ['name'], sort_key='queue', offset=2
+        )
+        self.assertEqual([torrent_ids[2]], [t_id for t_id, status in page])
+        self.assertRaises(
+            DelugeError, self.core.get_torrents_status_page, {}, [], 'bad_key'
+        )
+
+        # Without a sort key the torrents are in the session order.
+        session_ids = self.core.torrentmanager.get_torrent_list()
+        total, page = yield self.core.get_torrents_status_page(
+            {'id': list(reversed(torrent_ids))}, ['name'], limit=2
+        )
+        self.assertEqual(3, total)
+        self.assertEqual(session_ids[:2], [t_id for t_id, status in page])
+        self.assertRaises(
+            DelugeError, self.core.get_torrents_status_page, {}, [], offset=-1
+        )
+        self.assertRaises(
+            DelugeError, self.core.get_torrents_status_page, {}, [], limit=-1
+        )
+
+    @defer.inlineCallbacks
+    def test_filter_tree_update(self):
+        version, tree = self.core.get_filter_tree_update(-1)
+        self.assertEqual(self.core.get_filter_tree(), tree)
+        self.assertEqual((version, None), self.core.get_filter_tree_update(version))
+
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = b64encode(_file.read())
+        torrent_id = yield self.core.add_torrent_file_async(filename, filedump, {})
+        version, tree = self.core.get_filter_tree_update(version)
+        self.assertIn(('All', 1), tree['state'])
+        self.assertEqual((version, None), self.core.get_filter_tree_update(version))
+
+        torrent = self.core.torrentmanager[torrent_id]
+        torrent.set_options({'owner': 'user1'})
+        version, tree = self.core.get_filter_tree_update(version)
+        self.assertIn(('user1', 1), tree['owner'])
+        torrent.force_error_state('Test error')
+        version, tree = self.core.get_filter_tree_update(version)
+        self.assertIn(('Error', 1), tree['state'])
+
+        self.core.remove_torrent(torrent_id, True)
+        self.assertIsNotNone(self.core.get_filter_tree_update(version)[1])
+
     @defer.inlineCallbacks
     def test_remove_torrents(self):
         options = {}
@@ -399,6 +588,107 @@ def test_remove_torrents_invalid(self):
             val[1], ('invalidid2', 'torrent_id invalidid2 not in session.')
         )
 
+    @defer.inlineCallbacks
+    def test_subscribe_status(self):
+        torrent_id = self.add_torrent('test.torrent', paused=True)
+        events = []
+        self.patch(
+            self.rpcserver,
+            'emit_event_for_session_id',
+            lambda session_id, event: events.append(event.args[0]),
+        )
+        status = yield self.core.subscribe_status({}, ['state', 'max_connections'])
+        self.assertEqual(
+            {torrent_id: {'state': 'Paused', 'max_connections': -1}}, status
+        )
+
+        subscriptionmanager = self.core.subscriptionmanager
+        subscription = subscriptionmanager.subscriptions[
+            self.rpcserver.get_session_id()
+        ]
+        self.core.set_torrent_options([torrent_id], {'max_connections': 10})
+        subscriptionmanager.send_status_changes(subscription)
+        self.assertEqual([{torrent_id: {'max_connections': 10}}], events)
+
+        # Unchanged status is not sent.
+        subscriptionmanager.mark_changed([torrent_id])
+        subscriptionmanager.send_status_changes(subscription)
+        self.assertEqual(1, len(events))
+
+        # Changes without a libtorrent state update are sent too.
+        self.core.torrentmanager[torrent_id].set_tracker_status('Error: test')
+        self.assertEqual({torrent_id}, subscription.changed)
+        subscription.changed.clear()
+        self.core.pluginmanager.status_changed([torrent_id])
+        self.assertEqual({torrent_id}, subscription.changed)
+
+        # Plugin keys are only pushed if the plugin reports the changes.
+        self.core.pluginmanager.register_status_field('test_field', len)
+        self.assertEqual(
+            ['state'], self.core.get_pushed_status_keys(['state', 'test_field'])
+        )
+        self.core.pluginmanager.register_status_field(
+            'test_field', len, push_changes=True
+        )
+        self.assertEqual(
+            ['state', 'test_field'],
+            self.core.get_pushed_status_keys(['state', 'test_field']),
+        )
+        self.core.pluginmanager.deregister_status_field('test_field')
+
+        # The torrent no longer matches the filter.
+        subscription.filter_dict = {'state': 'Seeding'}
+        subscriptionmanager.mark_changed([torrent_id])
+        subscriptionmanager.send_status_changes(subscription)
+        self.assertEqual({torrent_id: None}, events[-1])
+
+        self.core.unsubscribe_status()
+        self.assertEqual({}, subscriptionmanager.subscriptions)
+
+    def test_subscribe_status_owner(self):
+        torrent_ids = {}
+        for owner, filename in (
+            ('user1', 'test.torrent'),
+            ('user2', 'unicode_filenames.torrent'),
+        ):
+            torrent_ids[owner] = self.add_torrent(filename, paused=True)
+            self.core.torrentmanager[torrent_ids[owner]].set_options({'owner': owner})
+        events = []
+        self.patch(
+            self.rpcserver,
+            'emit_event_for_session_id',
+            lambda session_id, event: events.append((session_id, event.args[0])),
+        )
+
+        # The sessions are only sent their own torrents.
+        subscriptionmanager = self.core.subscriptionmanager
+        for session_id, username in ((1, 'user1'), (2, 'user2')):
+            subscriptionmanager.subscribe(
+                session_id, username, AUTH_LEVEL_NORMAL, {}, ['name'], 1, {}
+            )
+        subscriptionmanager.mark_changed(list(torrent_ids.values()))
+        for subscription in subscriptionmanager.subscriptions.values():
+            subscriptionmanager.send_status_changes(subscription)
+        self.assertEqual(
+            {1: [torrent_ids['user1']], 2: [torrent_ids['user2']]},
+            {session_id: list(status) for session_id, status in events},
+        )
+
+        # A shared torrent is sent to the other users.
+        del events[:]
+        self.core.set_torrent_options([torrent_ids['user2']], {'shared': True})
+        for subscription in subscriptionmanager.subscriptions.values():
+            subscriptionmanager.send_status_changes(subscription)
+        self.assertEqual(
+            [(1, [torrent_ids['user2']])],
+            [(session_id, list(status)) for session_id, status in events],
+        )
+
+    def test_get_pushed_status_keys(self):
+        keys = ['state', 'progress'] + list(deluge.core.torrent.TIME_STATUS_KEYS)
+        # The keys derived from the time are polled, not pushed.
+        self.assertEqual(['state', 'progress'], self.core.get_pushed_status_keys(keys))
+
     def test_get_session_status(self):
         status = self.core.get_session_status(
             ['net.recv_tracker_bytes', 'net.sent_tracker_bytes']
@@ -430,6 +720,38 @@ def test_get_session_status_ratio(self):
         self.assertEqual(status['write_hit_ratio'], 0.0)
         self.assertEqual(status['read_hit_ratio'], 0.0)
 
+    def test_geoip_cache(self):
+        class GeoIP(object):
+            def __init__(self):
+                self.lookups = []
+
+            def country_code_by_addr(self, ip):
+                self.lookups.append(ip)
+                return {'10.0.0.1': 'SE', '10.0.0.2': 'A1'}.get(ip)
+
+        geoip = GeoIP()
+        cache = self.core.geoip_cache
+        cache.reset(geoip)
+        cache.max_size = 2
+        self.assertEqual('SE', cache.country_code('10.0.0.1'))
+        self.assertEqual('SE', cache.country_code('10.0.0.1'))
+        self.assertEqual('A ', cache.country_code('10.0.0.2'))
+        self.assertEqual('', cache.country_code('10.0.0.3'))
+        # The least recently used IP was dropped.
+        self.assertEqual('SE', cache.country_code('10.0.0.1'))
+        self.assertEqual(
+            ['10.0.0.1', '10.0.0.2', '10.0.0.3', '10.0.0.1'], geoip.lookups
+        )
+        self.assertEqual(
+            {'hits': 1, 'misses': 4, 'size': 2, 'max_size': 2},
+            self.core.get_geoip_cache_stats(),
+        )
+
+        self.core.preferencesmanager._on_set_geoip_db_location(
+            'geoip_db_location', 'missing.dat'
+        )
+        self.assertEqual(0, len(cache))
+
     def test_get_free_space(self):
         space = self.core.get_free_space('.')
         # get_free_space returns long on Python 2 (32-bit).
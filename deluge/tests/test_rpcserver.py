@@ -9,13 +9,32 @@
 
 from __future__ import unicode_literals
 
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+import pytest
+from twisted.internet import defer, reactor
+from twisted.internet.task import Clock, LoopingCall, deferLater
+
 import deluge.component as component
+import deluge.configmanager
 import deluge.error
-from deluge.common import get_localhost_auth
+from deluge import transfer
+from deluge.common import get_localhost_auth, windows_check
 from deluge.core import rpcserver
-from deluge.core.authmanager import AuthManager
-from deluge.core.rpcserver import DelugeRPCProtocol, RPCServer
+from deluge.core.authmanager import (
+    AUTH_LEVEL_NORMAL,
+    AUTH_LEVELS_MAPPING,
+    AUTH_LEVELS_MAPPING_REVERSE,
+    AuthManager,
+)
+from deluge.core.eventmanager import EventManager
+from deluge.core.rpcserver import DelugeRPCProtocol, RPCServer, export
 from deluge.log import setup_logger
+from deluge.ui.client import Client
 
 from .basetest import BaseTestCase
 
@@ -30,6 +49,57 @@ def transfer_message(self, data):
         self.messages.append(data)
 
 
+class FakeTransport(object):
+    def __init__(self, sessionno, host='10.0.0.1'):
+        self.sessionno = sessionno
+        self.host = host
+        self.written = []
+        self.aborted = False
+
+    def getPeer(self):  # NOQA: N802
+        return self
+
+    def write(self, data):
+        self.written.append(data)
+
+    def abortConnection(self):  # NOQA: N802
+        self.aborted = True
+
+
+class BatchTestObject(object):
+    @export
+    def add(self, a, b=0):
+        return a + b
+
+    @export
+    def deferred_add(self, a, b=0):
+        return defer.succeed(a + b)
+
+    @export(rpcserver.AUTH_LEVEL_ADMIN)
+    def admin_only(self):
+        return True
+
+    @export
+    def fail(self):
+        raise deluge.error.InvalidTorrentError('Invalid torrent')
+
+    @export
+    def items(self, count):
+        return {'%02d' % i: i for i in range(count)}
+
+    @export
+    def data(self, size):
+        return b'x' * size
+
+
+class CoreTestObject(object):
+    """The core methods called by a Client when it logs in."""
+
+    @export
+    def get_auth_levels_mappings(self):
+        return (AUTH_LEVELS_MAPPING, AUTH_LEVELS_MAPPING_REVERSE)
+
+
 class RPCServerTestCase(BaseTestCase):
     def set_up(self):
         self.rpcserver = RPCServer(listen=False)
@@ -111,3 +181,533 @@ def test_daemon_info(self):
         self.assertEqual(msg[0], rpcserver.RPC_RESPONSE, str(msg))
         self.assertEqual(msg[1], self.request_id, str(msg))
         self.assertEqual(msg[2], deluge.common.get_version(), str(msg))
+
+    def test_daemon_info_protocol_version(self):
+        self.assertEqual(1, self.protocol.get_peer_protocol_version())
+        self.protocol.dispatch(
+            self.request_id, 'daemon.info', [], {'protocol_version': 2}
+        )
+        msg = self.protocol.messages.pop()
+        self.assertEqual(msg[0], rpcserver.RPC_RESPONSE, str(msg))
+        self.assertEqual(msg[2], deluge.common.get_version(), str(msg))
+        self.assertEqual(2, self.protocol.get_peer_protocol_version())
+
+    def test_daemon_info_newer_protocol_version(self):
+        self.protocol.dispatch(
+            self.request_id, 'daemon.info', [], {'protocol_version': 99}
+        )
+        self.assertEqual(
+            transfer.PROTOCOL_VERSION, self.protocol.get_peer_protocol_version()
+        )
+
+    def test_daemon_info_invalid_protocol_version(self):
+        self.protocol.dispatch(
+            self.request_id, 'daemon.info', [], {'protocol_version': '2'}
+        )
+        msg = self.protocol.messages.pop()
+        self.assertEqual(msg[0], rpcserver.RPC_ERROR)
+        self.assertEqual(msg[1], self.request_id)
+        self.assertEqual(msg[2], 'WrappedException')
+        self.assertEqual(msg[3][1], 'TypeError')
+        self.assertEqual(1, self.protocol.get_peer_protocol_version())
+
+    def test_daemon_login_invalid_protocol_version(self):
+        self.protocol.dispatch(
+            self.request_id,
+            'daemon.login',
+            list(get_localhost_auth()),
+            {'client_version': deluge.common.get_version(), 'protocol_version': 2.0},
+        )
+        msg = self.protocol.messages.pop()
+        self.assertEqual(msg[0], rpcserver.RPC_ERROR)
+        self.assertEqual(msg[1], self.request_id)
+        self.assertEqual(msg[2], 'WrappedException')
+        self.assertEqual(msg[3][1], 'TypeError')
+        self.assertEqual(1, self.protocol.get_peer_protocol_version())
+        self.assertIsNone(self.factory.authorized_sessions[self.session_id])
+
+    def test_daemon_batch(self):
+        self.rpcserver.register_object(BatchTestObject(), 'batchtest')
+        self.factory.authorized_sessions[self.session_id] = self.protocol.AuthLevel(
+            AUTH_LEVEL_NORMAL, 'user'
+        )
+        calls = [
+            ('batchtest.add', [1], {'b': 2}),
+            ('batchtest.deferred_add', [3, 4], {}),
+            ('batchtest.admin_only', [], {}),
+            ('batchtest.fail', [], {}),
+            ('batchtest.invalid', [], {}),
+        ]
+        for concurrent in (False, True):
+            self.protocol.dispatch(
+                self.request_id, 'daemon.batch', [calls], {'concurrent': concurrent}
+            )
+            msg = self.protocol.messages.pop()
+            self.assertEqual(msg[0], rpcserver.RPC_RESPONSE, str(msg))
+            self.assertEqual(msg[1], self.request_id, str(msg))
+            results = msg[2]
+            self.assertEqual(results[0], (rpcserver.RPC_RESPONSE, 3))
+            self.assertEqual(results[1], (rpcserver.RPC_RESPONSE, 7))
+            self.assertEqual(
+                results[2][:2], (rpcserver.RPC_ERROR, 'NotAuthorizedError')
+            )
+            self.assertEqual(
+                results[3][:3],
+                (rpcserver.RPC_ERROR, 'InvalidTorrentError', ('Invalid torrent',)),
+            )
+            self.assertEqual(results[4][:2], (rpcserver.RPC_ERROR, 'WrappedException'))
+            self.assertEqual(results[4][2][1], 'AttributeError')
+
+    def test_daemon_batch_invalid_call(self):
+        self.factory.authorized_sessions[self.session_id] = self.protocol.AuthLevel(
+            AUTH_LEVEL_NORMAL, 'user'
+        )
+        self.protocol.dispatch(
+            self.request_id, 'daemon.batch', [[('batchtest.add', [1])]], {}
+        )
+        msg = self.protocol.messages.pop()
+        self.assertEqual(msg[0], rpcserver.RPC_ERROR)
+        self.assertEqual(msg[1], self.request_id)
+
+    def test_emit_event_encoded_once(self):
+        from deluge.event import TorrentFolderRenamedEvent
+
+        del self.factory.interested_events[self.session_id]
+        protocols = []
+        for session_id, host in (('1', '10.0.0.1'), ('2', '10.0.0.2'), ('3', '::1')):
+            protocol = DelugeRPCProtocol()
+            protocol.factory = self.factory
+            protocol.transport = FakeTransport(session_id, host)
+            protocol.set_peer_protocol_version(2)
+            self.factory.session_protocols[session_id] = protocol
+            self.factory.interested_events[session_id] = ['TorrentFolderRenamedEvent']
+            protocols.append(protocol)
+
+        encoded = []
+        encode_payload = DelugeRPCProtocol.encode_payload
+
+        def counting_encode_payload(protocol, payload):
+            encoded.append(protocol)
+            return encode_payload(protocol, payload)
+
+        self.patch(DelugeRPCProtocol, 'encode_payload', counting_encode_payload)
+
+        for name in ('name1', 'name2'):
+            self.rpcserver.emit_event(TorrentFolderRenamedEvent('12', name, 'old'))
+        # One encoding per event for the remote sessions and one for the local.
+        self.assertEqual(4, len(encoded))
+
+        for protocol in protocols:
+            # Nothing is written until the next reactor iteration.
+            self.assertEqual([], protocol.transport.written)
+            protocol.flush_messages()
+            self.assertEqual(1, len(protocol.transport.written))
+            receiver = DelugeRPCProtocolTester()
+            messages = []
+            receiver.message_received = messages.append
+            receiver.dataReceived(protocol.transport.written[0])
+            self.assertEqual(
+                [
+                    (
+                        rpcserver.RPC_EVENT,
+                        'TorrentFolderRenamedEvent',
+                        ('12', name, 'old'),
+                    )
+                    for name in ('name1', 'name2')
+                ],
+                messages,
+            )
+        self.assertEqual(protocols[0].transport.written, protocols[1].transport.written)
+
+    def test_send_data_after_queued_messages(self):
+        protocol = DelugeRPCProtocol()
+        protocol.factory = self.factory
+        protocol.transport = FakeTransport('1')
+        protocol.queue_message(protocol.encode_message((rpcserver.RPC_EVENT, 'Ev', [])))
+        protocol.sendData((rpcserver.RPC_RESPONSE, 1, True))
+        self.assertEqual(2, len(protocol.transport.written))
+        self.assertEqual(None, protocol._write_call)
+        receiver = DelugeRPCProtocolTester()
+        messages = []
+        receiver.message_received = messages.append
+        receiver.dataReceived(b''.join(protocol.transport.written))
+        self.assertEqual(
+            [(rpcserver.RPC_EVENT, 'Ev', ()), (rpcserver.RPC_RESPONSE, 1, True)],
+            messages,
+        )
+
+    def test_rpc_stats(self):
+        self.rpcserver.register_object(BatchTestObject(), 'batchtest')
+        self.factory.authorized_sessions[self.session_id] = self.protocol.AuthLevel(
+            AUTH_LEVEL_NORMAL, 'user'
+        )
+        self.protocol.dispatch(1, 'batchtest.add', [1], {'b': 2})
+        self.protocol.dispatch(2, 'batchtest.deferred_add', [1], {})
+        self.protocol.dispatch(3, 'batchtest.fail', [], {})
+        self.protocol.dispatch(
+            4,
+            'daemon.batch',
+            [[('batchtest.add', [1], {}), ('batchtest.fail', [], {})]],
+            {},
+        )
+
+        stats = self.rpcserver.get_rpc_stats(reset=True)
+        methods = stats['methods']
+        self.assertEqual(
+            [
+                'batchtest.add',
+                'batchtest.deferred_add',
+                'batchtest.fail',
+                'daemon.batch',
+            ],
+            sorted(methods),
+        )
+        self.assertEqual(2, methods['batchtest.add']['calls'])
+        self.assertEqual(0, methods['batchtest.add']['errors'])
+        self.assertEqual(2, methods['batchtest.fail']['errors'])
+        self.assertEqual(1, methods['daemon.batch']['calls'])
+        self.assertEqual(['unknown'], list(stats['clients']))
+        self.assertEqual(6, stats['clients']['unknown']['calls'])
+        self.assertEqual({}, self.rpcserver.get_rpc_stats()['methods'])
+
+    def test_rpc_stats_bytes(self):
+        clock = Clock()
+        self.patch(rpcserver, 'reactor', clock)
+        self.rpcserver.register_object(BatchTestObject(), 'batchtest')
+        protocol = DelugeRPCProtocol()
+        protocol.factory = self.factory
+        protocol.transport = FakeTransport('1')
+        self.factory.authorized_sessions['1'] = protocol.AuthLevel(
+            AUTH_LEVEL_NORMAL, 'user'
+        )
+
+        request = protocol.encode_message(((1, 'batchtest.add', [1, 2], {}),))
+        protocol.dataReceived(request)
+        clock.advance(0)
+
+        self.assertEqual(1, len(protocol.transport.written))
+        stats = self.rpcserver.get_rpc_stats()['methods']['batchtest.add']
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(
+            len(request) - transfer.MESSAGE_HEADER_SIZE, stats['request_bytes']
+        )
+        self.assertEqual(len(protocol.transport.written[0]), stats['response_bytes'])
+        self.assertGreater(stats['encode_time'], 0)
+        self.assertLessEqual(stats['latency_p50'], stats['latency_p99'])
+        self.assertIn('user@10.0.0.1', self.rpcserver.get_rpc_stats()['clients'])
+
+    def add_session(self, session_id, events):
+        protocol = DelugeRPCProtocol()
+        protocol.factory = self.factory
+        protocol.transport = FakeTransport(session_id)
+        self.factory.authorized_sessions[session_id] = protocol.AuthLevel(
+            AUTH_LEVEL_NORMAL, 'user'
+        )
+        self.factory.session_protocols[session_id] = protocol
+        self.factory.interested_events[session_id] = events
+        return protocol
+
+    def test_paused_session_events(self):
+        from deluge.event import TorrentFolderRenamedEvent, TorrentStateChangedEvent
+
+        del self.factory.interested_events[self.session_id]
+        protocol = self.add_session(
+            '1', ['TorrentStateChangedEvent', 'TorrentFolderRenamedEvent']
+        )
+        protocol.pauseProducing()
+        for torrent_id, state in (
+            ('a', 'Checking'),
+            ('b', 'Checking'),
+            ('a', 'Seeding'),
+        ):
+            self.rpcserver.emit_event(TorrentStateChangedEvent(torrent_id, state))
+
+        # Above the send buffer size only the state changes are kept.
+        self.rpcserver.set_send_buffer_size(protocol._write_queue_size)
+        self.rpcserver.emit_event(TorrentFolderRenamedEvent('a', 'new', 'old'))
+        self.rpcserver.emit_event(TorrentStateChangedEvent('b', 'Paused'))
+        protocol.flush_messages()
+        self.assertEqual([], protocol.transport.written)
+
+        protocol.resumeProducing()
+        self.assertEqual(1, len(protocol.transport.written))
+        receiver = DelugeRPCProtocolTester()
+        messages = []
+        receiver.message_received = messages.append
+        receiver.dataReceived(protocol.transport.written[0])
+        self.assertEqual(
+            [
+                (rpcserver.RPC_EVENT, 'TorrentStateChangedEvent', ('a', 'Seeding')),
+                (rpcserver.RPC_EVENT, 'TorrentStateChangedEvent', ('b', 'Paused')),
+            ],
+            messages,
+        )
+        self.assertEqual(
+            {'paused': 1, 'events_coalesced': 2, 'events_dropped': 1},
+            self.rpcserver.get_rpc_stats()['counts']['user@10.0.0.1'],
+        )
+
+    def test_paused_session_response_order(self):
+        from deluge.event import TorrentStateChangedEvent
+
+        del self.factory.interested_events[self.session_id]
+        protocol = self.add_session('1', ['TorrentStateChangedEvent'])
+        protocol.pauseProducing()
+        self.rpcserver.emit_event(TorrentStateChangedEvent('a', 'Seeding'))
+        protocol.sendData((rpcserver.RPC_RESPONSE, 1, 'result'))
+
+        # The held back event is written before the response.
+        receiver = DelugeRPCProtocolTester()
+        messages = []
+        receiver.message_received = messages.append
+        for data in protocol.transport.written:
+            receiver.dataReceived(data)
+        self.assertEqual(
+            [
+                (rpcserver.RPC_EVENT, 'TorrentStateChangedEvent', ('a', 'Seeding')),
+                (rpcserver.RPC_RESPONSE, 1, 'result'),
+            ],
+            messages,
+        )
+
+    def test_stuck_session_disconnected(self):
+        protocol = self.add_session('1', [])
+        self.rpcserver.set_stuck_timeout(60)
+        protocol.pauseProducing()
+        self.rpcserver.update()
+        self.assertFalse(protocol.transport.aborted)
+
+        protocol._paused_since -= 61
+        self.rpcserver.update()
+        self.assertTrue(protocol.transport.aborted)
+        self.assertEqual(
+            1,
+            self.rpcserver.get_rpc_stats()['counts']['user@10.0.0.1']['disconnected'],
+        )
+
+    def receive_messages(self, protocol):
+        receiver = DelugeRPCProtocolTester()
+        messages = []
+        receiver.message_received = messages.append
+        receiver.dataReceived(b''.join(protocol.transport.written))
+        return messages
+
+    @defer.inlineCallbacks
+    def test_large_response_encoded_in_thread(self):
+        protocol = self.add_session('1', [])
+        protocol.set_peer_protocol_version(2)
+        self.factory.encode_thread_min_size = 1000
+        result = [str(i) for i in range(1000)]
+
+        d = protocol.send_response(1, result)
+        # Messages sent while encoding are written after the response.
+        protocol.sendData((rpcserver.RPC_EVENT, 'Ev', []))
+        self.assertEqual([], protocol.transport.written)
+
+        response_bytes, encode_time = yield d
+        self.assertEqual(len(protocol.transport.written[0]), response_bytes)
+        self.assertEqual(
+            protocol.get_bytes_sent(),
+            response_bytes + len(protocol.transport.written[1]),
+        )
+        self.assertEqual(
+            [
+                (rpcserver.RPC_RESPONSE, 1, tuple(result)),
+                (rpcserver.RPC_EVENT, 'Ev', ()),
+            ],
+            self.receive_messages(protocol),
+        )
+
+    @pytest.mark.slow
+    @defer.inlineCallbacks
+    def test_benchmark_large_response_reactor_stall(self):
+        """
+        Benchmark of the longest time the reactor is blocked while sending a
+        large get_torrents_status like response, with and without the encode
+        thread pool.
+
+        Run with: pytest -s -m slow deluge/tests/test_rpcserver.py
+
+        """
+        result = {
+            '%040x'
+            % i: {
+                'name': 'torrent name %d' % i,
+                'state': 'Downloading',
+                'progress': i / 7,
+                'files': [
+                    {'path': 'dir/file %d' % f, 'size': f * i} for f in range(20)
+                ],
+                'peers': [{'ip': '10.0.%d.%d:6881' % (i % 255, p)} for p in range(10)],
+            }
+            for i in range(10000)
+        }
+        encode_pool = self.factory.encode_pool
+        for pool in (None, encode_pool):
+            self.factory.encode_pool = pool
+            protocol = self.add_session('1', [])
+            protocol.set_peer_protocol_version(2)
+
+            ticks = []
+            loop = LoopingCall(lambda: ticks.append(time.time()))
+            loop.start(0.001)
+            started = time.time()
+            response_bytes, encode_time = yield protocol.send_response(1, result)
+            # Let the reactor tick after the response is written.
+            yield deferLater(reactor, 0.01, lambda: None)
+            elapsed = time.time() - started
+            loop.stop()
+
+            stall = max(b - a for a, b in zip(ticks, ticks[1:]))
+            print(
+                '\n%s: %.1f MiB response in %.3fs, encode %.3fs, max reactor stall %.3fs'
+                % (
+                    'thread pool' if pool else 'reactor',
+                    response_bytes / 1024 / 1024,
+                    elapsed,
+                    encode_time,
+                    stall,
+                )
+            )
+
+    def test_daemon_stream(self):
+        clock = Clock()
+        self.patch(rpcserver, 'reactor', clock)
+        self.rpcserver.register_object(BatchTestObject(), 'batchtest')
+        self.factory.authorized_sessions[self.session_id] = self.protocol.AuthLevel(
+            AUTH_LEVEL_NORMAL, 'user'
+        )
+        self.protocol.messages[:] = []
+        self.protocol.dispatch(
+            self.request_id,
+            'daemon.stream',
+            ['batchtest.items', [5], {}],
+            {'chunk_size': 2},
+        )
+        # One chunk is sent per reactor iteration.
+        self.assertEqual(1, len(self.protocol.messages))
+        clock.advance(0)
+        clock.advance(0)
+        messages = self.protocol.messages
+        self.assertEqual(
+            [
+                rpcserver.RPC_RESPONSE_CHUNK,
+                rpcserver.RPC_RESPONSE_CHUNK,
+                rpcserver.RPC_RESPONSE,
+            ],
+            [msg[0] for msg in messages],
+        )
+        self.assertEqual({self.request_id}, {msg[1] for msg in messages})
+        result = {}
+        for msg in messages:
+            self.assertLessEqual(len(msg[2]), 2)
+            result.update(msg[2])
+        self.assertEqual(BatchTestObject().items(5), result)
+        self.assertEqual(
+            1, self.rpcserver.get_rpc_stats()['methods']['batchtest.items']['calls']
+        )
+
+        # A small result is sent in a single response.
+        self.protocol.dispatch(
+            self.request_id, 'daemon.stream', ['batchtest.add', [1, 2], {}], {}
+        )
+        self.assertEqual((rpcserver.RPC_RESPONSE, self.request_id, 3), messages[-1])
+
+    @defer.inlineCallbacks
+    def start_unix_listener(self):
+        """Listens on a Unix domain socket and returns its path."""
+        self.factory.protocol = DelugeRPCProtocol
+        self.rpcserver.register_object(BatchTestObject(), 'batchtest')
+        self.rpcserver.register_object(CoreTestObject(), 'core')
+        self.authmanager = AuthManager()
+        self.eventmanager = EventManager()
+        yield component.start(['AuthManager', 'EventManager'])
+
+        socket_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, socket_dir)
+        path = os.path.join(socket_dir, 'deluged.sock')
+        self.rpcserver.listen_unix(path)
+        self.addCleanup(self.rpcserver.stop)
+        defer.returnValue(path)
+
+    @pytest.mark.skipif(windows_check(), reason='No Unix domain sockets on Windows')
+    @defer.inlineCallbacks
+    def test_unix_socket(self):
+        path = yield self.start_unix_listener()
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+
+        client = Client()
+        yield client.connect('unix:' + path, 0, *get_localhost_auth())
+        self.assertTrue(client.is_localhost())
+        self.assertEqual('unix:' + path, client.connection_info()[0])
+        result = yield client.batchtest.add(1, 2)
+        self.assertEqual(3, result)
+        # Local peers are not sent compressed messages.
+        protocol = [
+            protocol
+            for protocol in self.factory.session_protocols.values()
+            if protocol is not self.protocol
+        ][0]
+        self.assertTrue(protocol.is_peer_local())
+        yield client.disconnect()
+
+    @pytest.mark.skipif(windows_check(), reason='No Unix domain sockets on Windows')
+    @defer.inlineCallbacks
+    def test_stop_unix_socket(self):
+        yield self.start_unix_listener()
+        port = self.rpcserver.unix_port
+        yield self.rpcserver.stop()
+        self.assertIsNone(self.rpcserver.unix_port)
+        self.assertFalse(port.connected)
+
+    @pytest.mark.slow
+    @pytest.mark.skipif(windows_check(), reason='No Unix domain sockets on Windows')
+    @defer.inlineCallbacks
+    def test_benchmark_unix_socket_throughput(self):
+        """
+        Benchmark of the RPC throughput over the Unix domain socket compared to
+        TLS over loopback TCP, for small calls and for large responses.
+
+        Run with: pytest -s -m slow deluge/tests/test_rpcserver.py
+
+        """
+        from deluge.crypto_utils import get_context_factory
+
+        path = yield self.start_unix_listener()
+        rpcserver.check_ssl_keys()
+        ssl_dir = deluge.configmanager.get_config_dir('ssl')
+        port = reactor.listenSSL(
+            0,
+            self.factory,
+            get_context_factory(
+                os.path.join(ssl_dir, 'daemon.cert'),
+                os.path.join(ssl_dir, 'daemon.pkey'),
+            ),
+            interface='127.0.0.1',
+        )
+        self.addCleanup(port.stopListening)
+
+        hosts = [('TLS', '127.0.0.1', port.getHost().port), ('Unix', 'unix:' + path, 0)]
+        for name, host, port_number in hosts:
+            client = Client()
+            yield client.connect(host, port_number, *get_localhost_auth())
+
+            started = time.time()
+            calls = 2000
+            yield defer.gatherResults(
+                [client.batchtest.add(i, 1) for i in range(calls)]
+            )
+            calls_elapsed = time.time() - started
+
+            started = time.time()
+            size = 1024 * 1024
+            responses = 100
+            for dummy in range(responses):
+                yield client.batchtest.data(size)
+            data_elapsed = time.time() - started
+
+            print(
+                '\n%s: %d calls/s, %.1f MiB/s of 1 MiB responses'
+                % (name, calls / calls_elapsed, responses / data_elapsed)
+            )
+            yield client.disconnect()
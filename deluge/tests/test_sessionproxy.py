@@ -9,7 +9,7 @@
 
 from __future__ import unicode_literals
 
-from twisted.internet.defer import maybeDeferred, succeed
+from twisted.internet.defer import fail, maybeDeferred, succeed
 from twisted.internet.task import Clock
 
 import deluge.component as component
@@ -19,15 +19,19 @@
 
 
 class Core(object):
+
+    subscriptions_supported = False
+
     def __init__(self):
         self.reset()
 
     def reset(self):
         self.torrents = {}
-        self.torrents['a'] = {'key1': 1, 'key2': 2, 'key3': 3}
-        self.torrents['b'] = {'key1': 1, 'key2': 2, 'key3': 3}
-        self.torrents['c'] = {'key1': 1, 'key2': 2, 'key3': 3}
+        self.torrents['a'] = {'key1': 1, 'key2': 2, 'key3': 3, 'plugin1': 1}
+        self.torrents['b'] = {'key1': 1, 'key2': 2, 'key3': 3, 'plugin1': 1}
+        self.torrents['c'] = {'key1': 1, 'key2': 2, 'key3': 3, 'plugin1': 1}
         self.prev_status = {}
+        self.subscribed_keys = None
 
     def get_session_state(self):
         return maybeDeferred(self.torrents.keys)
@@ -90,6 +94,21 @@ def get_torrents_status(self, filter_dict, keys, diff=False):
                     self.prev_status[torrent] = dict(self.torrents[torrent])
                 return succeed(ret)
 
+    def subscribe_status(self, filter_dict, keys, interval):
+        if not self.subscriptions_supported:
+            return fail(AttributeError('subscribe_status'))
+        self.subscribed_keys = keys
+        return succeed(
+            {
+                torrent_id: {key: status[key] for key in keys}
+                for torrent_id, status in self.torrents.items()
+            }
+        )
+
+    def get_pushed_status_keys(self, keys):
+        # The plugin keys are not pushed.
+        return succeed([key for key in keys if not key.startswith('plugin')])
+
 
 class Client(object):
     def __init__(self):
@@ -162,3 +181,67 @@ def test_get_torrents_status_key_not_updated(self):
         d = self.sp.get_torrents_status({'id': ['a']}, ['key2'])
         d.addCallback(self.assertEqual, {'a': {'key2': 99}})
         return d
+
+
+class SessionProxySubscriptionTestCase(BaseTestCase):
+    def set_up(self):
+        self.clock = Clock()
+        self.patch(deluge.ui.sessionproxy, 'time', self.clock.seconds)
+        self.patch(deluge.ui.sessionproxy, 'client', client)
+        self.patch(Core, 'subscriptions_supported', True)
+        self.sp = deluge.ui.sessionproxy.SessionProxy()
+        client.core.reset()
+        d = self.sp.start()
+
+        def do_get_torrents_status(torrent_ids):
+            return self.sp.get_torrents_status({'id': torrent_ids}, ['key1'])
+
+        d.addCallback(do_get_torrents_status)
+        return d
+
+    def tear_down(self):
+        return component.deregister(self.sp)
+
+    def test_subscribed(self):
+        self.assertEqual(['key1'], client.core.subscribed_keys)
+        self.assertEqual({'key1'}, self.sp.subscribed_keys)
+
+    def test_get_torrents_status_subscribed_key(self):
+        client.core.torrents['a']['key1'] = 7
+        self.clock.advance(self.sp.cache_time + 0.1)
+        self.sp.on_torrents_status_changed({'a': {'key1': 5}, 'd': {'key1': 1}})
+        self.clock.advance(self.sp.cache_time + 0.1)
+        # The pushed value is used instead of fetching the key.
+        d = self.sp.get_torrents_status({'id': ['a', 'b']}, ['key1'])
+        d.addCallback(self.assertEqual, {'a': {'key1': 5}, 'b': {'key1': 1}})
+        return d
+
+    def test_get_torrents_status_plugin_key_expires(self):
+        d = self.sp.get_torrents_status({'id': ['a']}, ['plugin1'])
+        d.addCallback(self.assertEqual, {'a': {'plugin1': 1}})
+
+        def on_status(result):
+            self.assertIn('plugin1', self.sp.subscribed_keys)
+            self.assertNotIn('plugin1', self.sp.pushed_keys)
+            # The plugin does not push its changes, so the key is fetched.
+            client.core.torrents['a']['plugin1'] = 5
+            self.clock.advance(self.sp.cache_time + 0.1)
+            return self.sp.get_torrents_status({'id': ['a']}, ['plugin1'])
+
+        d.addCallback(on_status)
+        d.addCallback(self.assertEqual, {'a': {'plugin1': 5}})
+        return d
+
+    def test_get_torrents_status_subscribes_new_keys(self):
+        client.core.torrents['a']['key2'] = 99
+        d = self.sp.get_torrents_status({}, ['key2'])
+        d.addCallback(
+            self.assertEqual,
+            {'a': {'key2': 99}, 'b': {'key2': 2}, 'c': {'key2': 2}},
+        )
+        d.addCallback(
+            lambda result: self.assertEqual(
+                ['key1', 'key2'], client.core.subscribed_keys
+            )
+        )
+        return d
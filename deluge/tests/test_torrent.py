@@ -12,6 +12,7 @@
 from base64 import b64encode
 
 import mock
+import pytest
 from twisted.internet import reactor
 from twisted.internet.task import defer, deferLater
 from twisted.trial import unittest
@@ -20,7 +21,8 @@
 import deluge.core.torrent
 import deluge.tests.common as common
 from deluge._libtorrent import lt
-from deluge.common import utf8_encode_structure, windows_check
+from deluge.common import encode_pieces_rle, utf8_encode_structure, windows_check
+from deluge.core import piecemap
 from deluge.core.core import Core
 from deluge.core.rpcserver import RPCServer
 from deluge.core.torrent import Torrent
@@ -325,6 +327,183 @@ def test_get_eta_downloading(self):
         self.assertEqual(result, 100)
         self.assertIsInstance(result, int)
 
+    def test_get_status_getter(self):
+        atp = self.get_torrent_atp('test_torrent.file.torrent')
+        handle = self.session.add_torrent(atp)
+        self.torrent = Torrent(handle, {})
+        self.assertNotIn('status_funcs', vars(self.torrent))
+
+        status = self.torrent.get_status(['name', 'state'])
+        self.assertEqual(
+            {'name': self.torrent.get_name(), 'state': self.torrent.state}, status
+        )
+        self.assertIs(
+            Torrent.get_status_getter(('name', 'state')),
+            Torrent.get_status_getter(('name', 'state')),
+        )
+        self.assertEqual(
+            {'name': 'Known name', 'state': self.torrent.state},
+            self.torrent.get_status(['name', 'state'], values={'name': 'Known name'}),
+        )
+        self.assertRaises(KeyError, self.torrent.get_status, ['invalid_key'])
+
+    def test_get_status_diff(self):
+        atp = self.get_torrent_atp('test_torrent.file.torrent')
+        handle = self.session.add_torrent(atp)
+        self.torrent = Torrent(handle, {})
+        keys = ['name', 'max_connections']
+        status = self.torrent.get_status(keys, diff=True)
+        self.assertEqual(self.torrent.get_status(keys), status)
+        # Unchanged torrents are skipped.
+        self.assertEqual({}, self.torrent.get_status(keys, diff=True))
+        self.assertEqual(
+            {'state': self.torrent.state},
+            self.torrent.get_status(['state'], diff=True),
+        )
+
+        self.torrent.set_options({'max_connections': 100})
+        status['max_connections'] = 100
+        self.assertEqual(status, self.torrent.get_status(keys, diff=True))
+
+        generation = self.torrent.generation
+        self.torrent.set_tracker_status('Announce OK')
+        self.assertEqual(generation + 1, self.torrent.generation)
+
+        # The status is sent again after the status or files changed.
+        self.assertEqual(status, self.torrent.get_status(keys, diff=True))
+        for change in [
+            lambda: self.torrent.get_status([], update=True),
+            lambda: self.torrent.set_file_priorities([1]),
+            lambda: self.torrent.invalidate_status_cache('files'),
+        ]:
+            self.assertEqual({}, self.torrent.get_status(keys, diff=True))
+            change()
+            self.assertEqual(status, self.torrent.get_status(keys, diff=True))
+
+        # The keys derived from the time are always sent.
+        time_keys = keys + ['active_time', 'time_since_transfer']
+        self.torrent.get_status(time_keys, diff=True)
+        self.assertEqual(
+            ['active_time', 'time_since_transfer'],
+            sorted(self.torrent.get_status(time_keys, diff=True)),
+        )
+
+        # Updating the state without a new status message is no change.
+        generation = self.torrent.generation
+        self.torrent.update_state()
+        self.assertEqual(generation, self.torrent.generation)
+
+    def test_status_cache(self):
+        atp = self.get_torrent_atp('test_torrent.file.torrent')
+        handle = self.session.add_torrent(atp)
+        self.torrent = Torrent(handle, {})
+        Torrent.get_status_cache_stats(reset=True)
+
+        files = self.torrent.get_status(['files'])['files']
+        self.assertEqual(self.torrent.get_files(), files)
+        self.assertIs(files, self.torrent.get_status(['files'])['files'])
+        self.assertEqual(
+            {'hits': 1, 'misses': 1}, Torrent.get_status_cache_stats()['files']
+        )
+
+        self.torrent.invalidate_status_cache('files')
+        self.assertIsNot(files, self.torrent.get_status(['files'])['files'])
+
+        # Expired values are read again.
+        files = self.torrent.get_status(['files'])['files']
+        self.torrent.status_cache['files'] = (0, files)
+        self.assertIsNot(files, self.torrent.get_status(['files'])['files'])
+
+        stats = Torrent.get_status_cache_stats(reset=True)
+        self.assertEqual({'hits': 2, 'misses': 3}, stats['files'])
+        self.assertEqual(
+            {'hits': 0, 'misses': 0}, Torrent.get_status_cache_stats()['files']
+        )
+
+    def test_get_pieces(self):
+        finished = [True, True, False, False, False, True]
+        availability = [0, 1, 2, 0, 1, 0]
+        expected = [3, 3, 1, 0, 2, 3]
+        self.assertEqual(expected, piecemap.get_pieces(finished, availability, [4]))
+        self.assertEqual(
+            expected, piecemap._get_pieces_list(finished, availability, [4])
+        )
+        self.assertEqual(
+            encode_pieces_rle(expected),
+            piecemap.get_pieces_rle(finished, availability, [4]),
+        )
+        self.assertEqual([], piecemap.get_pieces_rle([], [], []))
+
+        atp = self.get_torrent_atp('test_torrent.file.torrent')
+        handle = self.session.add_torrent(atp)
+        self.torrent = Torrent(handle, {})
+        status = self.torrent.get_status(['pieces', 'pieces_rle', 'num_pieces'])
+        self.assertEqual([0] * status['num_pieces'], status['pieces'])
+        self.assertEqual([0, status['num_pieces']], status['pieces_rle'])
+
+    @pytest.mark.slow
+    def test_benchmark_get_status(self):
+        """
+        Benchmark of the memory used by torrents and the get_status latency
+        at 10k and 50k torrents.
+
+        Run with: pytest -s -m slow deluge/tests/test_torrent.py
+
+        """
+        import tracemalloc
+
+        keys = [
+            'name',
+            'state',
+            'progress',
+            'download_payload_rate',
+            'upload_payload_rate',
+            'eta',
+            'ratio',
+            'queue',
+            'num_peers',
+            'num_seeds',
+            'total_wanted',
+            'time_added',
+            'total_seeds',
+            'total_peers',
+            'distributed_copies',
+            'owner',
+            'tracker_host',
+            'seeds_peers_ratio',
+        ]
+        atp = self.get_torrent_atp('test_torrent.file.torrent')
+        torrent = Torrent(self.session.add_torrent(atp), {'name': 'Test'})
+        attrs = dict(vars(torrent))
+
+        for count in (10000, 50000):
+            tracemalloc.start()
+            torrents = []
+            for index in range(count):
+                # A copy of the torrent, sharing the status and options.
+                copy = Torrent.__new__(Torrent)
+                copy.__dict__.update(attrs)
+                copy.torrent_id = '%040x' % index
+                copy.prev_status = {}
+                torrents.append(copy)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            started = time.time()
+            for copy in torrents:
+                copy.get_status(keys)
+            elapsed = time.time() - started
+            print(
+                '\n%d torrents: %.1f MiB, get_status of %d keys %.3fs (%.1fus per torrent)'
+                % (
+                    count,
+                    memory / 1024 / 1024,
+                    len(keys),
+                    elapsed,
+                    elapsed / count * 1000000,
+                )
+            )
+
     def test_get_name_unicode(self):
         """Test retrieving a unicode torrent name from libtorrent."""
         atp = self.get_torrent_atp('unicode_file.torrent')
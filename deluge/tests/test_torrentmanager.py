@@ -21,6 +21,7 @@
 from deluge.common import windows_check
 from deluge.core.core import Core
 from deluge.core.rpcserver import RPCServer
+from deluge.core.statustable import STATUS_KEYS
 from deluge.error import InvalidTorrentError
 
 from . import common
@@ -133,6 +134,209 @@ def test_remove_invalid_torrent(self):
             InvalidTorrentError, self.tm.remove, 'torrentidthatdoesntexist'
         )
 
+    @defer.inlineCallbacks
+    def test_status_table(self):
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = _file.read()
+        torrent_id = yield self.core.add_torrent_file_async(
+            filename, b64encode(filedump), {}
+        )
+        torrent = self.tm[torrent_id]
+        self.assertEqual(
+            torrent.get_status(STATUS_KEYS),
+            self.tm.get_table_status([torrent_id], STATUS_KEYS)[torrent_id],
+        )
+
+        # The state is updated when it changes.
+        torrent.force_error_state('Test error')
+        status = self.tm.get_table_status([torrent_id], ['state', 'progress'])
+        self.assertEqual({'state': 'Error', 'progress': 100.0}, status[torrent_id])
+
+        # Updating the torrent status also updates its row.
+        slot = self.tm.status_table.slots[torrent_id]
+        self.tm.status_table.columns['queue_position'][slot] = 99
+        self.assertEqual(
+            torrent.get_status(['queue'], update=True),
+            self.tm.get_table_status([torrent_id], ['queue'])[torrent_id],
+        )
+
+        self.assertTrue(self.tm.remove(torrent_id, False))
+        self.assertNotIn(torrent_id, self.tm.status_table)
+        self.assertEqual([slot], self.tm.status_table.free_slots)
+
+    @defer.inlineCallbacks
+    def test_torrents_status_diff(self):
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = _file.read()
+        torrent_id = yield self.core.add_torrent_file_async(
+            filename, b64encode(filedump), {}
+        )
+
+        def get_status():
+            d = defer.Deferred()
+            self.tm.handle_torrents_status_callback(
+                (d, [torrent_id], ['name', 'state', 'progress'], True, 1)
+            )
+            return d
+
+        status, plugin_keys = yield get_status()
+        self.assertEqual({'name', 'state', 'progress'}, set(status[torrent_id]))
+        status, plugin_keys = yield get_status()
+        self.assertEqual({torrent_id: {}}, status)
+
+        self.tm[torrent_id].bump_generation()
+        status, plugin_keys = yield get_status()
+        self.assertEqual(3, len(status[torrent_id]))
+
+    @defer.inlineCallbacks
+    def test_torrents_status_update_coalesced(self):
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = _file.read()
+        torrent_id = yield self.core.add_torrent_file_async(
+            filename, b64encode(filedump), {}
+        )
+        session = mock.Mock()
+        self.patch(self.tm, 'session', session)
+        self.tm.last_state_update_alert_ts = 0
+
+        d1 = self.tm.torrents_status_update([torrent_id], ['name'])
+        d2 = self.tm.torrents_status_update([torrent_id], ['state'])
+        self.assertEqual(1, session.post_torrent_updates.call_count)
+        self.tm.on_alert_state_update(mock.Mock(status=[]))
+        status, plugin_keys = yield d1
+        self.assertEqual(['name'], list(status[torrent_id]))
+        status, plugin_keys = yield d2
+        self.assertEqual(['state'], list(status[torrent_id]))
+        self.assertEqual([], self.tm.torrents_status_requests)
+
+        # A recent update is used unless the request needs a fresher one.
+        yield self.tm.torrents_status_update([torrent_id], ['name'])
+        self.assertEqual(1, session.post_torrent_updates.call_count)
+        self.tm.torrents_status_update([torrent_id], ['name'], max_age=0)
+        self.assertEqual(2, session.post_torrent_updates.call_count)
+
+    @defer.inlineCallbacks
+    def test_stop_at_ratio(self):
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = _file.read()
+        torrent_id = yield self.core.add_torrent_file_async(
+            filename,
+            b64encode(filedump),
+            {'stop_at_ratio': True, 'stop_ratio': 1.0, 'remove_at_ratio': True},
+        )
+        self.assertEqual({torrent_id}, self.tm.stop_ratio_torrents)
+        torrent = self.tm[torrent_id]
+        torrent.is_finished = True
+        torrent.state = 'Seeding'
+        torrent.get_ratio = mock.Mock(return_value=1.5)
+        self.patch(self.tm, 'remove', mock.Mock())
+
+        self.tm.update()
+        self.assertEqual(1, self.tm.remove.call_count)
+        # Only torrents with a status or option change are checked again.
+        self.tm.update()
+        self.assertEqual(1, self.tm.remove.call_count)
+        torrent.set_options({'stop_ratio': 1.2})
+        self.tm.update()
+        self.assertEqual(2, self.tm.remove.call_count)
+
+        torrent.set_options({'stop_at_ratio': False})
+        self.assertEqual(set(), self.tm.stop_ratio_torrents)
+        self.assertEqual(set(), self.tm.stop_ratio_pending)
+
+    @defer.inlineCallbacks
+    def test_save_state_journal(self):
+        # Save in this thread only, not on adding or removing.
+        self.patch(self.tm, 'save_state', mock.Mock())
+        filename = common.get_test_data_file('test.torrent')
+        with open(filename, 'rb') as _file:
+            filedump = _file.read()
+        torrent_id = yield self.core.add_torrent_file_async(
+            filename, b64encode(filedump), {}
+        )
+        journal = self.tm.state_journal
+        # The first save writes the whole state.
+        self.tm._save_state()
+        snapshot_mtime = os.stat(journal.filepath).st_mtime
+        journal_size = os.path.getsize(journal.journal_filepath)
+
+        # A change is appended to the journal.
+        self.tm[torrent_id].set_options({'max_connections': 42})
+        self.tm._save_state()
+        self.assertEqual(snapshot_mtime, os.stat(journal.filepath).st_mtime)
+        self.assertLess(journal_size, os.path.getsize(journal.journal_filepath))
+        self.tm._save_state()
+        self.assertEqual(
+            journal.journal_size, os.path.getsize(journal.journal_filepath)
+        )
+
+        # A torn record at the end is ignored.
+        with open(journal.journal_filepath, 'ab') as _file:
+            _file.write(b'\x00\x00\x01\x00torn')
+        self.tm.prev_saved_state = None
+        state = self.tm.open_state()
+        self.assertEqual(42, state.torrents[0].max_connections)
+        self.assertEqual([torrent_id], list(self.tm.prev_saved_state))
+
+        # The journal is compacted once larger than the snapshot.
+        journal.snapshot_size = 0
+        self.tm[torrent_id].set_options({'max_connections': 43})
+        self.tm._save_state()
+        self.assertEqual(journal.snapshot_size, os.path.getsize(journal.filepath))
+        self.assertEqual(43, self.tm.open_state().torrents[0].max_connections)
+
+        # Removed torrents are journaled too.
+        self.assertTrue(self.tm.remove(torrent_id, False))
+        self.tm._save_state()
+        self.assertEqual([], self.tm.open_state().torrents)
+
+    @defer.inlineCallbacks
+    def test_resume_data_store(self):
+        from deluge._libtorrent import lt
+
+        store = self.tm.resume_store
+        torrent_id = 'ab570cdd5a17ea1b61e970bb72047de141bce173'
+        old_torrent_id = '2dc5d0e71a66fe69649a640d39cb00a259704973'
+        # The torrents.fastresume file of previous versions.
+        filepath = os.path.join(self.tm.state_dir, 'torrents.fastresume')
+        with open(filepath, 'wb') as _file:
+            _file.write(lt.bencode({old_torrent_id.encode(): {b'info-hash': b'1'}}))
+
+        resume_data = self.tm.load_resume_data_file([torrent_id, old_torrent_id])
+        self.assertEqual([old_torrent_id], list(resume_data))
+        self.assertEqual({old_torrent_id}, self.tm.resume_data_changed)
+        self.tm.resume_data.update(resume_data)
+        self.tm.resume_data[torrent_id] = lt.bencode({b'info-hash': b'2'})
+        self.tm.resume_data_changed.add(torrent_id)
+        result = yield self.tm.save_resume_data_file()
+        self.assertTrue(result)
+        self.assertFalse(os.path.isfile(filepath))
+        self.assertTrue(os.path.isfile(store.get_filepath(torrent_id)))
+
+        # Only the changed resume data is written.
+        os.remove(store.get_filepath(old_torrent_id))
+        self.tm.resume_data[torrent_id] = lt.bencode({b'info-hash': b'3'})
+        self.tm.resume_data_changed.add(torrent_id)
+        yield self.tm.save_resume_data_file()
+        self.assertEqual(
+            {torrent_id: lt.bencode({b'info-hash': b'3'})},
+            self.tm.load_resume_data_file([torrent_id, old_torrent_id]),
+        )
+
+        # A torrent removed and added again in the same save keeps its file.
+        self.tm.resume_data_removed.add(torrent_id)
+        self.tm.resume_data_changed.add(torrent_id)
+        yield self.tm.save_resume_data_file()
+        self.assertEqual([torrent_id], list(store.load([torrent_id])))
+
+        self.tm.resume_data_removed.add(torrent_id)
+        yield self.tm.save_resume_data_file()
+        self.assertEqual({}, store.load([torrent_id]))
+
     def test_open_state_from_python2(self):
         """Open a Python2 state with a UTF-8 encoded torrent filename."""
         shutil.copy(
@@ -10,16 +10,30 @@
 from __future__ import print_function, unicode_literals
 
 import base64
+import os
+import struct
+import time
 
+import pytest
 import rencode
 from twisted.trial import unittest
 
 import deluge.log
-from deluge.transfer import DelugeTransferProtocol
+from deluge.transfer import (
+    FLAG_CHUNKED,
+    FLAG_ZLIB,
+    MESSAGE_HEADER_V2_FORMAT,
+    DelugeTransferProtocol,
+)
 
 deluge.log.setup_logger('none')
 
 
+def random_text(size):
+    """Returns a poorly compressible string of roughly `size` characters."""
+    return base64.b64encode(os.urandom(size * 3 // 4)).decode('ascii')
+
+
 class TransferTestClass(DelugeTransferProtocol):
     def __init__(self):
         DelugeTransferProtocol.__init__(self)
@@ -358,6 +372,123 @@ def test_receive_middle_of_header(self):
         message2 = self.transfer.get_messages_in().pop(0)
         self.assertEqual(rencode.dumps(self.msg2), rencode.dumps(message2))
 
+    def test_receive_big_message_in_small_parts(self):
+        """
+        Receive a large message split into many small parts and verify that
+        the buffer is emptied once the message is complete.
+
+        """
+        big_msg = (1, 2, {'key_str': random_text(256 * 1024)})
+        self.transfer.transfer_message(big_msg)
+        msg_bytes = self.transfer.get_messages_out_joined()
+
+        view = memoryview(msg_bytes)
+        for offset in range(0, len(msg_bytes), 1460):
+            self.assertEqual(0, len(self.transfer.get_messages_in()))
+            self.transfer.dataReceived(view[offset : offset + 1460].tobytes())
+
+        self.assertEqual(1, len(self.transfer.get_messages_in()))
+        self.assertEqual(big_msg, self.transfer.get_messages_in().pop(0))
+        self.assertEqual(0, len(self.transfer._buffer))
+        self.assertEqual(0, self.transfer._message_length)
+
+    @pytest.mark.slow
+    def test_benchmark_receive_big_message(self):
+        """
+        Microbenchmark feeding multi-megabyte messages to dataReceived in
+        TCP sized chunks.
+
+        Run with: pytest -s -m slow deluge/tests/test_transfer.py
+
+        """
+        chunk_size = 1460
+        for size_mb in (1, 4, 16):
+            big_msg = (1, 2, {'key_str': random_text(size_mb * 1024 * 1024)})
+            transfer = TransferTestClass()
+            transfer.transfer_message(big_msg)
+            msg_bytes = transfer.get_messages_out_joined()
+            chunks = [
+                msg_bytes[i : i + chunk_size]
+                for i in range(0, len(msg_bytes), chunk_size)
+            ]
+
+            start = time.time()
+            for chunk in chunks:
+                transfer.dataReceived(chunk)
+            elapsed = time.time() - start
+
+            self.assertEqual(1, len(transfer.get_messages_in()))
+            print(
+                '\n%d MiB message in %d chunks of %d bytes: %.3fs (%.1f MiB/s)'
+                % (
+                    size_mb,
+                    len(chunks),
+                    chunk_size,
+                    elapsed,
+                    len(msg_bytes) / 1024 / 1024 / max(elapsed, 1e-6),
+                )
+            )
+
+    def test_send_v2_small_message_uncompressed(self):
+        self.transfer.set_peer_protocol_version(2)
+        self.transfer.transfer_message(self.msg1)
+        message = self.transfer.get_messages_out_joined()
+        version, flags, size = struct.unpack_from(MESSAGE_HEADER_V2_FORMAT, message)
+        self.assertEqual(2, version)
+        self.assertEqual(0, flags)
+        self.assertEqual(rencode.dumps(self.msg1), message[6:])
+        self.assertEqual(len(message) - 6, size)
+
+    def test_send_v2_big_message_compressed(self):
+        self.transfer.set_peer_protocol_version(2)
+        big_msg = (1, 2, {'key_str': 'a' * 10000})
+        self.transfer.transfer_message(big_msg)
+        message = self.transfer.get_messages_out_joined()
+        version, flags, size = struct.unpack_from(MESSAGE_HEADER_V2_FORMAT, message)
+        self.assertEqual(2, version)
+        self.assertTrue(flags & FLAG_ZLIB)
+        self.assertFalse(flags & FLAG_CHUNKED)
+        self.assertTrue(size < 10000)
+
+    def test_send_v2_local_peer_uncompressed(self):
+        self.transfer.set_peer_protocol_version(2)
+        self.transfer._peer_is_local = True
+        self.transfer.transfer_message((1, 2, {'key_str': 'a' * 10000}))
+        message = self.transfer.get_messages_out_joined()
+        version, flags, size = struct.unpack_from(MESSAGE_HEADER_V2_FORMAT, message)
+        self.assertEqual(0, flags)
+
+    def test_receive_v2_messages(self):
+        sender = TransferTestClass()
+        sender.set_peer_protocol_version(2)
+        sender.max_frame_size = 100
+        big_msg = (1, 2, {'key_str': random_text(1000)})
+        for msg in (self.msg1, big_msg, self.msg2):
+            sender.transfer_message(msg)
+        msg_bytes = sender.get_messages_out_joined()
+
+        self.assertEqual(1, self.transfer.get_peer_protocol_version())
+        for d in self.receive_parts_helper(msg_bytes, 7):
+            pass
+
+        self.assertEqual(
+            [rencode.dumps(m) for m in (self.msg1, big_msg, self.msg2)],
+            [rencode.dumps(m) for m in self.transfer.get_messages_in()],
+        )
+        self.assertEqual(2, self.transfer.get_peer_protocol_version())
+        self.assertEqual(0, len(self.transfer._buffer))
+
+    def test_receive_v1_and_v2_messages(self):
+        sender = TransferTestClass()
+        sender.transfer_message(self.msg1)
+        sender.set_peer_protocol_version(2)
+        sender.transfer_message(self.msg2)
+        self.transfer.dataReceived(sender.get_messages_out_joined())
+        self.assertEqual(
+            [rencode.dumps(self.msg1), rencode.dumps(self.msg2)],
+            [rencode.dumps(m) for m in self.transfer.get_messages_in()],
+        )
+
     # Needs file containing big data structure e.g. like thetorrent list as it is transfered by the daemon
     # def test_simulate_big_transfer(self):
     #    filename = '../deluge.torrentlist'
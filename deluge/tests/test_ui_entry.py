@@ -441,6 +441,18 @@ def test_console_command_status(self):
         self.assertTrue(std_output.startswith('Total upload: '))
         self.assertTrue(std_output.endswith(' Moving: 0\n'))
 
+    @defer.inlineCallbacks
+    def test_console_command_rpcstats(self):
+        fd = StringFileDescriptor(sys.stdout)
+        self.patch_arg_command(['rpcstats'])
+        self.patch(sys, 'stdout', fd)
+
+        yield self.exec_command()
+
+        std_output = fd.out.getvalue()
+        self.assertTrue(std_output.startswith('Methods:\n'))
+        self.assertIn('\nClients:\n', std_output)
+
     @defer.inlineCallbacks
     def test_console_command_config_set_download_location(self):
         fd = StringFileDescriptor(sys.stdout)
@@ -19,6 +19,7 @@
 from twisted.web.static import File
 
 import deluge.component as component
+from deluge import error
 from deluge.ui.client import client
 
 from . import common
@@ -60,6 +61,29 @@ def on_connect(result):
         d.addErrback(self.fail)
         return d
 
+    @defer.inlineCallbacks
+    def test_update_ui_filter_tree_fallback(self):
+        yield self.deluge_web.web_api.connect(self.host_id)
+        self.addCleanup(client.disconnect)
+        daemon_call = client._daemon_proxy.call
+
+        def call(method, *args, **kwargs):
+            if method == 'core.get_filter_tree_update':
+                # An older daemon without filter tree updates.
+                return defer.fail(
+                    error.WrappedException(
+                        'RPC call on invalid function: ' + method, 'AttributeError', ''
+                    )
+                )
+            return daemon_call(method, *args, **kwargs)
+
+        self.patch(client._daemon_proxy, 'call', call)
+        web_api = self.deluge_web.web_api
+        for dummy in range(2):
+            ui_info = yield web_api.update_ui(['name'], {})
+            self.assertIn('state', ui_info['filters'])
+        self.assertFalse(web_api.filter_tree_updates)
+
     def test_get_config(self):
         config = self.deluge_web.web_api.get_config()
         self.assertEqual(self.webserver_listen_port, config['port'])
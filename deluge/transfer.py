@@ -15,13 +15,24 @@
 import zlib
 
 import rencode
+from twisted.internet.address import UNIXAddress
 from twisted.internet.protocol import Protocol
 
 log = logging.getLogger(__name__)
 
-PROTOCOL_VERSION = 1
+PROTOCOL_VERSION = 2
 MESSAGE_HEADER_FORMAT = '!BI'
 MESSAGE_HEADER_SIZE = struct.calcsize(MESSAGE_HEADER_FORMAT)
+MESSAGE_HEADER_V2_FORMAT = '!BBI'
+MESSAGE_HEADER_V2_SIZE = struct.calcsize(MESSAGE_HEADER_V2_FORMAT)
+
+# Message flags used in the protocol version 2 header.
+FLAG_ZLIB = 0x01
+FLAG_CHUNKED = 0x02
+# The zlib compression level is stored in the high nibble of the flags.
+FLAG_LEVEL_SHIFT = 4
+
+LOCAL_HOSTS = ('127.0.0.1', '::1', 'localhost')
 
 
 class DelugeTransferProtocol(Protocol, object):
@@ -31,7 +42,7 @@ class DelugeTransferProtocol(Protocol, object):
     Data messages are transfered with a header containing a protocol version
     and the length of the data to be transfered (payload).
 
-    The format is::
+    The protocol version 1 format is::
 
             ubyte    uint4     bytestring
         |.version.|..size..|.....body.....|
@@ -39,13 +50,150 @@ class DelugeTransferProtocol(Protocol, object):
     The version is an unsigned byte that indicates the protocol version.
     The size is a unsigned 32-bit integer that is equal to the length of the body bytestring.
     The body is the compressed rencoded byte string of the data object.
+
+    The protocol version 2 format adds a flags byte::
+
+            ubyte    ubyte    uint4     bytestring
+        |.version.|.flags.|..size..|.....body.....|
+
+    The flags indicate if the body is zlib compressed (FLAG_ZLIB, with the
+    compression level in the high nibble) and if the body is a chunk of a larger
+    message that continues in the next frame (FLAG_CHUNKED).
+
+    Messages are sent with protocol version 1 until the peer is known to
+    support version 2, either from :meth:`set_peer_protocol_version` or from
+    receiving a version 2 message. Both versions are always accepted.
     """
 
+    #: Payloads smaller than this (in bytes) are sent uncompressed with version 2.
+    compress_min_size = 1024
+    #: The zlib compression level used with version 2.
+    compress_level = 6
+    #: Bodies larger than this (in bytes) are split into chunks with version 2.
+    max_frame_size = 16 * 1024 * 1024
+
     def __init__(self):
-        self._buffer = b''  # TODO: Look into using bytearray instead of byte string.
+        self._buffer = bytearray()
         self._message_length = 0
+        self._message_flags = 0
+        self._chunks = []
         self._bytes_received = 0
         self._bytes_sent = 0
+        self._peer_protocol_version = 1
+        self._peer_is_local = None
+
+    def set_peer_protocol_version(self, version):
+        """
+        Sets the protocol version used to send messages to the peer.
+
+        :param version: the highest protocol version supported by the peer.
+        :type version: int
+
+        """
+        self._peer_protocol_version = max(1, min(version, PROTOCOL_VERSION))
+
+    def get_peer_protocol_version(self):
+        """
+        Returns the protocol version used to send messages to the peer.
+
+        :returns: the protocol version
+        :rtype: int
+
+        """
+        return self._peer_protocol_version
+
+    def is_peer_local(self):
+        """
+        Checks if the peer is connected from the local host.
+
+        :returns: True if the peer is on the local host
+        :rtype: bool
+
+        """
+        if self._peer_is_local is None:
+            try:
+                self._peer_is_local = self.get_peer_host() in LOCAL_HOSTS
+            except AttributeError:
+                self._peer_is_local = False
+        return self._peer_is_local
+
+    def get_peer_host(self):
+        """
+        Returns the host of the peer.
+
+        :returns: the IP address of the peer, or 'localhost' if the peer is
+            connected through a Unix domain socket.
+        :rtype: str
+
+        """
+        peer = self.transport.getPeer()
+        if isinstance(peer, UNIXAddress):
+            return 'localhost'
+        return peer.host
+
+    def get_encoding_key(self):
+        """
+        Returns a key identifying how messages are encoded for the peer, peers
+        with the same key are sent identical messages for the same data.
+
+        :returns: the encoding key
+        :rtype: tuple
+
+        """
+        if self._peer_protocol_version < 2:
+            return (self._peer_protocol_version,)
+        return (self._peer_protocol_version, self.is_peer_local())
+
+    def encode_message(self, data):
+        """
+        Encodes the data into a message for the peer's protocol version.
+
+        :param data: data to be transfered in a data structure serializable by rencode.
+
+        :returns: the encoded message, including the header(s)
+        :rtype: bytes
+
+        """
+        return self.encode_payload(rencode.dumps(data))
+
+    def encode_payload(self, payload):
+        """
+        Encodes an already rencoded payload into a message for the peer's
+        protocol version.
+
+        :param payload: the rencoded data.
+        :type payload: bytes
+
+        :returns: the encoded message, including the header(s)
+        :rtype: bytes
+
+        """
+        if self._peer_protocol_version < 2:
+            body = zlib.compress(payload)
+            return struct.pack(MESSAGE_HEADER_FORMAT, 1, len(body)) + body
+
+        flags = 0
+        if len(payload) >= self.compress_min_size and not self.is_peer_local():
+            payload = zlib.compress(payload, self.compress_level)
+            flags = FLAG_ZLIB | self.compress_level << FLAG_LEVEL_SHIFT
+
+        payload_len = len(payload)
+        if payload_len <= self.max_frame_size:
+            return (
+                struct.pack(MESSAGE_HEADER_V2_FORMAT, 2, flags, payload_len) + payload
+            )
+
+        frames = []
+        for offset in range(0, payload_len, self.max_frame_size):
+            chunk = payload[offset : offset + self.max_frame_size]
+            chunk_flags = flags
+            if offset + self.max_frame_size < payload_len:
+                chunk_flags |= FLAG_CHUNKED
+            frames.append(
+                struct.pack(MESSAGE_HEADER_V2_FORMAT, 2, chunk_flags, len(chunk))
+            )
+            frames.append(chunk)
+        return b''.join(frames)
 
     def transfer_message(self, data):
         """
@@ -53,14 +201,7 @@ def transfer_message(self, data):
 
         :param data: data to be transfered in a data structure serializable by rencode.
         """
-        body = zlib.compress(rencode.dumps(data))
-        body_len = len(body)
-        message = struct.pack(
-            '{}{}s'.format(MESSAGE_HEADER_FORMAT, body_len),
-            PROTOCOL_VERSION,
-            body_len,
-            body,
-        )
+        message = self.encode_message(data)
         self._bytes_sent += len(message)
         self.transport.write(message)
 
@@ -68,6 +209,10 @@ def dataReceived(self, data):  # NOQA: N802
         """
         This method is called whenever data is received.
 
+        The received data is appended to a bytearray and complete messages are
+        handed on as memoryview slices of it, so the buffer is never copied
+        when a message arrives in many small chunks.
+
         :param data: a message as transfered by transfer_message, or a part of such
                      a messsage.
 
@@ -76,59 +221,119 @@ def dataReceived(self, data):  # NOQA: N802
             _message_length - the length of the payload of the current message.
 
         """
-        self._buffer += data
+        self._buffer.extend(data)
         self._bytes_received += len(data)
 
-        while len(self._buffer) >= MESSAGE_HEADER_SIZE:
+        buffer_len = len(self._buffer)
+        offset = 0
+        while True:
             if self._message_length == 0:
-                self._handle_new_message()
+                header_size = self._handle_new_message(offset)
+                if header_size == 0:
+                    # Wait for the rest of the header
+                    break
+                if header_size < 0:
+                    # Invalid header so the rest of the buffer is discarded.
+                    del self._buffer[:]
+                    return
+                offset += header_size
+
             # We have a complete packet
-            if len(self._buffer) >= self._message_length:
-                self._handle_complete_message(self._buffer[: self._message_length])
-                # Remove message data from buffer
-                self._buffer = self._buffer[self._message_length :]
-                self._message_length = 0
-            else:
+            if buffer_len - offset < self._message_length:
                 break
 
-    def _handle_new_message(self):
+            end = offset + self._message_length
+            message = memoryview(self._buffer)[offset:end]
+            try:
+                if self._message_flags & FLAG_CHUNKED:
+                    # More chunks of this message follow in the next frames.
+                    self._chunks.append(message.tobytes())
+                elif self._chunks:
+                    self._chunks.append(message.tobytes())
+                    body = b''.join(self._chunks)
+                    self._chunks = []
+                    self._handle_complete_message(body, self._message_flags)
+                else:
+                    self._handle_complete_message(message, self._message_flags)
+            finally:
+                # The view must be released before the bytearray is resized.
+                message.release()
+            offset = end
+            self._message_length = 0
+
+        # Remove the handled messages from the buffer
+        if offset:
+            del self._buffer[:offset]
+
+    def _handle_new_message(self, offset=0):
         """
         Handle the start of a new message. This method is called only when the
-        beginning of the buffer contains data from a new message (i.e. the header).
+        buffer contains the beginning of a new message (i.e. the header) at `offset`.
+
+        :param offset: the position of the header in the buffer.
+        :type offset: int
+
+        :returns: the size of the header, 0 if the header is incomplete or -1
+            if the header is invalid.
+        :rtype: int
 
         """
+        available = len(self._buffer) - offset
+        if available < MESSAGE_HEADER_SIZE:
+            return 0
+
         try:
-            # Read the first bytes of the message (MESSAGE_HEADER_SIZE bytes)
-            header = self._buffer[:MESSAGE_HEADER_SIZE]
-            # Extract the length stored as an unsigned 32-bit integer
-            version, self._message_length = struct.unpack(MESSAGE_HEADER_FORMAT, header)
-            if version != PROTOCOL_VERSION:
-                raise Exception(
-                    'Received invalid protocol version: {}. PROTOCOL_VERSION is {}.'.format(
-                        version, PROTOCOL_VERSION
-                    )
+            version = self._buffer[offset]
+            if version == 1:
+                # Extract the length stored as an unsigned 32-bit integer
+                version, self._message_length = struct.unpack_from(
+                    MESSAGE_HEADER_FORMAT, self._buffer, offset
                 )
-            # Remove the header from the buffer
-            self._buffer = self._buffer[MESSAGE_HEADER_SIZE:]
+                self._message_flags = FLAG_ZLIB
+                return MESSAGE_HEADER_SIZE
+            elif version == 2:
+                if available < MESSAGE_HEADER_V2_SIZE:
+                    return 0
+                (
+                    version,
+                    self._message_flags,
+                    self._message_length,
+                ) = struct.unpack_from(MESSAGE_HEADER_V2_FORMAT, self._buffer, offset)
+                # The peer understands version 2 so use it for sending too.
+                if self._peer_protocol_version < 2:
+                    self.set_peer_protocol_version(version)
+                return MESSAGE_HEADER_V2_SIZE
+            raise Exception(
+                'Received invalid protocol version: {}. PROTOCOL_VERSION is {}.'.format(
+                    version, PROTOCOL_VERSION
+                )
+            )
         except Exception as ex:
             log.warning('Error occurred when parsing message header: %s.', ex)
             log.warning(
                 'This version of Deluge cannot communicate with the sender of this data.'
             )
             self._message_length = 0
-            self._buffer = b''
+            self._message_flags = 0
+            self._chunks = []
+            return -1
 
-    def _handle_complete_message(self, data):
+    def _handle_complete_message(self, data, flags=FLAG_ZLIB):
         """
         Handles a complete message as it is transfered on the network.
 
-        :param data: a zlib compressed string encoded with rencode.
+        :param data: a rencoded string, zlib compressed if flags has FLAG_ZLIB.
+        :type data: bytes or memoryview
+        :param flags: the message flags from the header.
+        :type flags: int
 
         """
         try:
-            self.message_received(
-                rencode.loads(zlib.decompress(data), decode_utf8=True)
-            )
+            if flags & FLAG_ZLIB:
+                data = zlib.decompress(data)
+            elif isinstance(data, memoryview):
+                data = data.tobytes()
+            self.message_received(rencode.loads(data, decode_utf8=True))
         except Exception as ex:
             log.warning(
                 'Failed to decompress (%d bytes) and load serialized data with rencode: %s',
@@ -13,18 +13,24 @@
 import logging
 import subprocess
 import sys
+from contextlib import contextmanager
 
 from twisted.internet import defer, reactor, ssl
+from twisted.internet.address import UNIXAddress
 from twisted.internet.protocol import ClientFactory
 
 from deluge import error
 from deluge.common import get_localhost_auth, get_version
 from deluge.decorators import deprecated
-from deluge.transfer import DelugeTransferProtocol
+from deluge.transfer import PROTOCOL_VERSION, DelugeTransferProtocol
 
 RPC_RESPONSE = 1
 RPC_ERROR = 2
 RPC_EVENT = 3
+RPC_RESPONSE_CHUNK = 4
+
+#: The prefix of a host that is the path of a daemon Unix domain socket.
+UNIX_HOST_PREFIX = 'unix:'
 
 log = logging.getLogger(__name__)
 
@@ -33,6 +39,29 @@ def format_kwargs(kwargs):
     return ', '.join([key + '=' + str(value) for key, value in kwargs.items()])
 
 
+def get_unix_socket_path(host):
+    """Returns the socket path of a ``unix:/path`` host.
+
+    Args:
+        host (str): The daemon host.
+
+    Returns:
+        str: The Unix domain socket path or None if host is not a socket.
+
+    """
+    if host and host.startswith(UNIX_HOST_PREFIX):
+        return host[len(UNIX_HOST_PREFIX) :]
+    return None
+
+
+def format_connector(connector):
+    """Returns the daemon address of a connector for logging."""
+    try:
+        return '%s:%s' % (connector.host, connector.port)
+    except AttributeError:
+        return UNIX_HOST_PREFIX + connector.address
+
+
 class DelugeRPCRequest(object):
     """
     This object is created whenever there is a RPCRequest to be sent to the
@@ -80,18 +109,63 @@ def format_message(self):
         return (self.request_id, self.method, self.args, self.kwargs)
 
 
+class StreamedResponse(object):
+    """
+    Assembles the chunks of a 'daemon.stream' response as they are received,
+    or hands each chunk to a callback.
+
+    :param on_chunk: called with each chunk instead of assembling them.
+    :type on_chunk: function
+
+    """
+
+    def __init__(self, on_chunk=None):
+        self.on_chunk = on_chunk
+        self.result = None
+
+    def add_chunk(self, chunk):
+        """
+        Adds a chunk of the response, a dict or a list.
+        """
+        if self.on_chunk:
+            self.on_chunk(chunk)
+        elif self.result is None:
+            # Sequence chunks are copied to a list once, then extended.
+            self.result = list(chunk) if isinstance(chunk, (list, tuple)) else chunk
+        elif isinstance(self.result, dict):
+            self.result.update(chunk)
+        else:
+            self.result.extend(chunk)
+
+    def finish(self, last_chunk):
+        """
+        Adds the last chunk of the response.
+
+        :returns: the assembled response, None if a chunk callback is used.
+
+        """
+        self.add_chunk(last_chunk)
+        if isinstance(last_chunk, tuple) and isinstance(self.result, list):
+            # Sequences are decoded as tuples so return the same type.
+            return tuple(self.result)
+        return self.result
+
+
 class DelugeRPCProtocol(DelugeTransferProtocol):
     def connectionMade(self):  # NOQA: N802
         self.__rpc_requests = {}
         # Set the protocol in the daemon so it can send data
         self.factory.daemon.protocol = self
-        # Get the address of the daemon that we've connected to
+        # Get the address of the daemon that we've connected to, the host of a
+        # Unix domain socket is kept as it was given.
         peer = self.transport.getPeer()
-        self.factory.daemon.host = peer.host
-        self.factory.daemon.port = peer.port
+        if not isinstance(peer, UNIXAddress):
+            self.factory.daemon.host = peer.host
+            self.factory.daemon.port = peer.port
+        host, port = self.factory.daemon.host, self.factory.daemon.port
         self.factory.daemon.connected = True
-        log.debug('Connected to daemon at %s:%s..', peer.host, peer.port)
-        self.factory.daemon.connect_deferred.callback((peer.host, peer.port))
+        log.debug('Connected to daemon at %s:%s..', host, port)
+        self.factory.daemon.connect_deferred.callback((host, port))
 
     def message_received(self, request):
         """
@@ -124,6 +198,11 @@ def message_received(self, request):
 
         request_id = request[1]
 
+        if message_type == RPC_RESPONSE_CHUNK:
+            # A chunk of a streamed response, the last chunk is sent as RPC_RESPONSE.
+            self.factory.daemon.add_stream_chunk(request_id, request[2])
+            return
+
         # We get the Deferred object for this request_id to either run the
         # callbacks or the errbacks dependent on the response from the daemon.
         d = self.factory.daemon.pop_deferred(request_id)
@@ -209,22 +288,20 @@ def __init__(self, daemon, event_handlers):
         self.event_handlers = event_handlers
 
     def startedConnecting(self, connector):  # NOQA: N802
-        log.debug('Connecting to daemon at "%s:%s"...', connector.host, connector.port)
+        log.debug('Connecting to daemon at "%s"...', format_connector(connector))
 
     def clientConnectionFailed(self, connector, reason):  # NOQA: N802
         log.debug(
-            'Connection to daemon at "%s:%s" failed: %s',
-            connector.host,
-            connector.port,
+            'Connection to daemon at "%s" failed: %s',
+            format_connector(connector),
             reason.value,
         )
         self.daemon.connect_deferred.errback(reason)
 
     def clientConnectionLost(self, connector, reason):  # NOQA: N802
         log.debug(
-            'Connection lost to daemon at "%s:%s" reason: %s',
-            connector.host,
-            connector.port,
+            'Connection lost to daemon at "%s" reason: %s',
+            format_connector(connector),
             reason.value,
         )
         self.daemon.host = None
@@ -255,6 +332,10 @@ def __init__(self, event_handlers=None):
         self.__factory.noisy = False
         self.__request_counter = 0
         self.__deferred = {}
+        # The calls queued while a batch is open.
+        self.__batch = None
+        # The StreamedResponse of the streamed requests by request_id.
+        self.__streams = {}
 
         # This is set when a connection is made to the daemon
         self.protocol = None
@@ -277,6 +358,9 @@ def connect(self, host, port):
         """
         Connects to a daemon at host:port
 
+        A host of the form ``unix:/path`` connects to the Unix domain socket of
+        a local daemon without TLS, the port is then not used.
+
         :param host: str, the host to connect to
         :param port: int, the listening port on the daemon
 
@@ -286,9 +370,13 @@ def connect(self, host, port):
         log.debug('sslproxy.connect()')
         self.host = host
         self.port = port
-        self.__connector = reactor.connectSSL(
-            self.host, self.port, self.__factory, ssl.ClientContextFactory()
-        )
+        socket_path = get_unix_socket_path(host)
+        if socket_path:
+            self.__connector = reactor.connectUNIX(socket_path, self.__factory)
+        else:
+            self.__connector = reactor.connectSSL(
+                self.host, self.port, self.__factory, ssl.ClientContextFactory()
+            )
         self.connect_deferred = defer.Deferred()
         self.daemon_info_deferred = defer.Deferred()
 
@@ -317,6 +405,11 @@ def call(self, method, *args, **kwargs):
             or RPCError is received from the daemon
 
         """
+        if self.__batch is not None:
+            d = defer.Deferred()
+            self.__batch.append((method, args, kwargs, d))
+            return d
+
         # Create the DelugeRPCRequest to pass to protocol.send_request()
         request = DelugeRPCRequest()
         request.request_id = self.__request_counter
@@ -338,6 +431,142 @@ def call(self, method, *args, **kwargs):
 
         return d
 
+    def start_batch(self):
+        """
+        Starts queueing calls instead of sending them to the daemon.
+
+        :returns: False if a batch was already started, True otherwise.
+        :rtype: bool
+
+        """
+        if self.__batch is not None:
+            return False
+        self.__batch = []
+        return True
+
+    def send_batch(self, concurrent=False):
+        """
+        Sends the calls queued since :meth:`start_batch` in a single
+        'daemon.batch' request. If the daemon does not support batch requests
+        the calls are sent individually.
+
+        :param concurrent: if True, the daemon does not wait for the result of
+            a call before running the next one.
+        :type concurrent: bool
+
+        :returns: a DeferredList of the queued calls.
+        :rtype: twisted.internet.defer.DeferredList
+
+        """
+        calls, self.__batch = self.__batch, None
+        if not calls:
+            return defer.DeferredList([])
+
+        def on_batch_result(results):
+            for (dummy_method, dummy_args, dummy_kwargs, d), result in zip(
+                calls, results
+            ):
+                if result[0] == RPC_RESPONSE:
+                    d.callback(result[1])
+                else:
+                    try:
+                        exception_cls = getattr(error, result[1])
+                        exception = exception_cls(*result[2], **result[3])
+                    except (AttributeError, TypeError):
+                        exception = error.WrappedException(
+                            'Invalid batch error', result[1], result[4]
+                        )
+                    d.errback(exception)
+
+        def on_batch_fail(failure):
+            if (
+                failure.check(error.WrappedException)
+                and failure.value.type == 'AttributeError'
+                and failure.value.message.endswith('daemon.batch')
+            ):
+                # Older daemon without batch requests so send the calls one by one.
+                log.debug('Daemon does not support batch requests')
+                for method, args, kwargs, d in calls:
+                    self.call(method, *args, **kwargs).chainDeferred(d)
+            else:
+                for dummy_method, dummy_args, dummy_kwargs, d in calls:
+                    d.errback(failure)
+
+        self.call(
+            'daemon.batch',
+            [(method, args, kwargs) for method, args, kwargs, dummy_d in calls],
+            concurrent=concurrent,
+        ).addCallbacks(on_batch_result, on_batch_fail)
+        return defer.DeferredList([call[3] for call in calls])
+
+    def stream_call(self, method, args, kwargs, chunk_size, on_chunk=None):
+        """
+        Makes a RPCRequest to the daemon with a dict or list result sent back
+        in chunks, using 'daemon.stream'. If the daemon does not support
+        streamed requests the call is sent normally.
+
+        :param method: the method to call in the form of 'component.method'
+        :type method: str
+        :param args: the arguments to call the remote method with
+        :type args: list
+        :param kwargs: the keyword arguments to call the remote method with
+        :type kwargs: dict
+        :param chunk_size: the number of items per chunk.
+        :type chunk_size: int
+        :param on_chunk: called with each chunk as it is received, instead of
+            assembling the result.
+        :type on_chunk: function
+
+        :returns: a Deferred firing with the assembled result, or with None
+            if `on_chunk` is used.
+        :rtype: twisted.internet.defer.Deferred
+
+        """
+        stream = StreamedResponse(on_chunk)
+        if self.__batch is not None:
+            # Calls in a batch are not streamed.
+            return self.call(method, *args, **kwargs).addCallback(stream.finish)
+
+        request_id = self.__request_counter
+        self.__streams[request_id] = stream
+
+        def on_response(result):
+            del self.__streams[request_id]
+            return stream.finish(result)
+
+        def on_fail(failure):
+            del self.__streams[request_id]
+            if (
+                failure.check(error.WrappedException)
+                and failure.value.type == 'AttributeError'
+                and failure.value.message.endswith('daemon.stream')
+            ):
+                # Older daemon without streamed requests.
+                log.debug('Daemon does not support streamed requests')
+                d = self.call(method, *args, **kwargs)
+                return d.addCallback(stream.finish)
+            return failure
+
+        d = self.call('daemon.stream', method, args, kwargs, chunk_size=chunk_size)
+        return d.addCallbacks(on_response, on_fail)
+
+    def add_stream_chunk(self, request_id, chunk):
+        """
+        Adds a received chunk to the streamed response of a request.
+
+        :param request_id: the request_id of the streamed request
+        :type request_id: int
+        :param chunk: the chunk of the response
+        :type chunk: dict or list
+
+        """
+        try:
+            stream = self.__streams[request_id]
+        except KeyError:
+            log.debug('Received chunk for unknown streamed request: %s', request_id)
+            return
+        stream.add_chunk(chunk)
+
     def pop_deferred(self, request_id):
         """
         Pops a Deferred object.  This is generally called once we receive the
@@ -401,7 +630,10 @@ def on_info_fail(reason):
             log.exception(reason)
             self.daemon_info_deferred.errback(reason)
 
-        self.call('daemon.info').addCallback(on_info).addErrback(on_info_fail)
+        # Advertise the supported protocol version, older daemons ignore it and
+        # the daemon replies with a newer protocol message if it supports it.
+        d = self.call('daemon.info', protocol_version=PROTOCOL_VERSION)
+        d.addCallback(on_info).addErrback(on_info_fail)
         return self.daemon_info_deferred
 
     def __on_connect_fail(self, reason):
@@ -499,6 +731,18 @@ def call(self, method, *args, **kwargs):
         else:
             return defer.maybeDeferred(m, *copy.deepcopy(args), **copy.deepcopy(kwargs))
 
+    def start_batch(self):
+        # Calls are run directly in standalone mode so there is nothing to batch.
+        return False
+
+    def send_batch(self, concurrent=False):
+        return defer.DeferredList([])
+
+    def stream_call(self, method, args, kwargs, chunk_size, on_chunk=None):
+        # The result is passed as is in standalone mode so it is a single chunk.
+        stream = StreamedResponse(on_chunk)
+        return self.call(method, *args, **kwargs).addCallback(stream.finish)
+
     def register_event_handler(self, event, handler):
         """
         Registers a handler function to be called when `:param:event` is
@@ -574,7 +818,8 @@ def connect(
         """
         Connects to a daemon process.
 
-        :param host: str, the hostname of the daemon
+        :param host: str, the hostname of the daemon, or ``unix:/path`` for
+            the Unix domain socket of a local daemon
         :param port: int, the port of the daemon
         :param username: str, the username to login with
         :param password: str, the password to login with
@@ -606,7 +851,9 @@ def on_authenticate_fail(reason):
             return reason
 
         def authenticate(daemon_version, username, password):
-            if not username and host in ('127.0.0.1', 'localhost'):
+            if not username and (
+                host in ('127.0.0.1', 'localhost') or get_unix_socket_path(host)
+            ):
                 # No username provided and it's localhost, so attempt to get credentials from auth file.
                 username, password = get_localhost_auth()
 
@@ -700,7 +947,10 @@ def is_localhost(self):
         """
         if (
             self._daemon_proxy
-            and self._daemon_proxy.host in ('127.0.0.1', 'localhost')
+            and (
+                self._daemon_proxy.host in ('127.0.0.1', 'localhost')
+                or get_unix_socket_path(self._daemon_proxy.host)
+            )
             or isinstance(self._daemon_proxy, DaemonStandaloneProxy)
         ):
             return True
@@ -771,6 +1021,72 @@ def deregister_event_handler(self, event, handler):
         if self._daemon_proxy:
             self._daemon_proxy.deregister_event_handler(event, handler)
 
+    @contextmanager
+    def batch(self, concurrent=False):
+        """
+        Context manager that sends all the calls made within it to the daemon
+        in a single request.
+
+        Each call still returns its own Deferred, which fires once the batch
+        response is received. Calls in nested batches are sent with the
+        outermost batch.
+
+        Example::
+
+            with client.batch():
+                for torrent_id in torrent_ids:
+                    client.core.set_torrent_options([torrent_id], options)
+
+        :param concurrent: if True, the daemon does not wait for the result of
+            a call before running the next one.
+        :type concurrent: bool
+
+        """
+        started = self._daemon_proxy.start_batch()
+        try:
+            yield
+        finally:
+            if started:
+                self._daemon_proxy.send_batch(concurrent)
+
+    def stream_call(
+        self, method, args=None, kwargs=None, chunk_size=1000, on_chunk=None
+    ):
+        """
+        Calls a daemon method with a large dict or list result, e.g.
+        'core.get_torrents_status', and receives the result in chunks of
+        `chunk_size` items.
+
+        The chunks are either assembled as they arrive or handed to `on_chunk`,
+        so a UI can show the first items while the rest is still arriving.
+
+        Example::
+
+            client.stream_call(
+                'core.get_torrents_status', [{}, ['name']], on_chunk=update_list
+            )
+
+        :param method: the method to call in the form of 'component.method'
+        :type method: str
+        :param args: the arguments to call the method with
+        :type args: list
+        :param kwargs: the keyword arguments to call the method with
+        :type kwargs: dict
+        :param chunk_size: the number of items per chunk.
+        :type chunk_size: int
+        :param on_chunk: called with each chunk (a dict or list) as it is
+            received instead of assembling the result.
+        :type on_chunk: function
+
+        :returns: a Deferred firing with the assembled result, or with None
+            if `on_chunk` is used.
+        :rtype: twisted.internet.defer.Deferred
+
+        """
+        return self._daemon_proxy.stream_call(
+            method, args or [], kwargs or {}, chunk_size, on_chunk
+        )
+
     def force_call(self, block=False):
         # no-op for now.. we'll see if we need this in the future
         pass
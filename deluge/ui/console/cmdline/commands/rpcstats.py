@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Deluge and is licensed under GNU General Public License 3.0, or later, with
+# the additional special exception to link portions of this program with the OpenSSL library.
+# See LICENSE for more details.
+#
+
+from __future__ import unicode_literals
+
+import deluge.component as component
+from deluge.common import fsize
+from deluge.ui.client import client
+
+from . import BaseCommand
+
+SORT_KEYS = [
+    'calls',
+    'errors',
+    'latency_p50',
+    'latency_p95',
+    'latency_p99',
+    'request_bytes',
+    'response_bytes',
+    'encode_time',
+]
+
+
+def format_ms(seconds):
+    return '%.1fms' % (seconds * 1000)
+
+
+class Command(BaseCommand):
+    """Show the daemon RPC call statistics per method and per client"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-s',
+            '--sort',
+            action='store',
+            default='calls',
+            choices=SORT_KEYS,
+            dest='sort',
+            help=_('Sort by key (descending): %s') % ', '.join(SORT_KEYS),
+        )
+        parser.add_argument(
+            '-l',
+            '--limit',
+            action='store',
+            type=int,
+            default=0,
+            dest='limit',
+            help=_('Only show the first LIMIT methods and clients'),
+        )
+        parser.add_argument(
+            '-r',
+            '--reset',
+            action='store_true',
+            default=False,
+            dest='reset',
+            help=_('Reset the statistics after showing them'),
+        )
+
+    def handle(self, options):
+        self.console = component.get('ConsoleUI')
+
+        def on_rpc_stats(stats):
+            self.write_stats(_('Methods'), stats['methods'], options)
+            self.write_stats(_('Clients'), stats['clients'], options)
+            if stats.get('counts'):
+                self.console.write('{!info!}%s:' % _('Slow clients'))
+                for name, counts in sorted(stats['counts'].items()):
+                    self.console.write(
+                        '  {!input!}%s %s'
+                        % (
+                            name,
+                            ' '.join(
+                                '{!info!}%s: {!input!}%d' % item
+                                for item in sorted(counts.items())
+                            ),
+                        )
+                    )
+
+        return client.daemon.get_rpc_stats(options.reset).addCallback(on_rpc_stats)
+
+    def write_stats(self, title, stats, options):
+        self.console.write('{!info!}%s:' % title)
+        items = sorted(
+            stats.items(), key=lambda item: item[1][options.sort], reverse=True
+        )
+        if options.limit:
+            items = items[: options.limit]
+        for name, counters in items:
+            self.console.write(
+                '  {!input!}%s {!info!}calls: {!input!}%d {!info!}errors: {!input!}%d '
+                '{!info!}p50/p95/p99: {!input!}%s/%s/%s {!info!}in: {!input!}%s '
+                '{!info!}out: {!input!}%s {!info!}encode: {!input!}%s'
+                % (
+                    name,
+                    counters['calls'],
+                    counters['errors'],
+                    format_ms(counters['latency_p50']),
+                    format_ms(counters['latency_p95']),
+                    format_ms(counters['latency_p99']),
+                    fsize(counters['request_bytes']),
+                    fsize(counters['response_bytes']),
+                    format_ms(counters['encode_time']),
+                )
+            )
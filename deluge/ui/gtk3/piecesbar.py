@@ -23,7 +23,7 @@
 from gi.repository.Pango import SCALE, Weight
 
 # isort:imports-firstparty
-from deluge.common import PY2
+from deluge.common import PY2, encode_pieces_rle
 from deluge.configmanager import ConfigManager
 
 COLOR_STATES = ['missing', 'waiting', 'downloading', 'completed']
@@ -127,12 +127,12 @@ def draw_pieces(self):
             ctx = cairo.Context(self.pieces_overlay)
 
             if self.pieces:
-                pieces = self.pieces
-            elif self.num_pieces:
-                # Completed torrents do not send any pieces so create list using 'completed' state.
-                pieces = [COLOR_STATES.index('completed')] * self.num_pieces
+                runs = self.pieces
+            else:
+                # Completed torrents do not send any pieces so use a single 'completed' run.
+                runs = [COLOR_STATES.index('completed'), self.num_pieces]
             start_pos = 0
-            piece_width = self.width / len(pieces)
+            piece_width = self.width / self.num_pieces
             pieces_colors = [
                 [
                     color / 65535
@@ -140,11 +140,12 @@ def draw_pieces(self):
                 ]
                 for state in COLOR_STATES
             ]
-            for state in pieces:
+            # Draw each run of pieces in the same state at once.
+            for state, count in zip(runs[::2], runs[1::2]):
                 ctx.set_source_rgb(*pieces_colors[state])
-                ctx.rectangle(start_pos, 0, piece_width, self.height)
+                ctx.rectangle(start_pos, 0, piece_width * count, self.height)
                 ctx.fill()
-                start_pos += piece_width
+                start_pos += piece_width * count
 
         self.cr.set_source_surface(self.pieces_overlay)
         self.cr.paint()
@@ -215,8 +216,12 @@ def set_text(self, text):
         self.text = text
 
     def set_pieces(self, pieces, num_pieces):
+        self.set_pieces_rle(encode_pieces_rle(pieces or ()), num_pieces)
+
+    def set_pieces_rle(self, runs, num_pieces):
+        """Sets the pieces from the runs of the pieces_rle status key."""
         self.prev_pieces = self.pieces
-        self.pieces = pieces
+        self.pieces = runs or ()
         self.num_pieces = num_pieces
 
     def get_pieces(self):
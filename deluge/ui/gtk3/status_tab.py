@@ -38,6 +38,8 @@ def __init__(self):
 
         self.progressbar = self.main_builder.get_object('progressbar')
         self.piecesbar = None
+        # Daemons older than the pieces_rle status key only send pieces.
+        self.pieces_key = 'pieces_rle'
 
         self.add_tab_widget('summary_availability', fratio, ('distributed_copies',))
         self.add_tab_widget(
@@ -91,9 +93,9 @@ def update(self):
             return
 
         # Get the torrent status
-        status_keys = self.status_keys
+        status_keys = list(self.status_keys)
         if self.config['show_piecesbar']:
-            status_keys.extend(['pieces', 'num_pieces'])
+            status_keys.extend([self.pieces_key, 'num_pieces'])
 
         component.get('SessionProxy').get_torrent_status(
             selected, status_keys
@@ -116,17 +118,26 @@ def _on_get_torrent_status(self, status):
         if self.config['show_piecesbar']:
             if self.piecesbar.get_fraction() != fraction:
                 self.piecesbar.set_fraction(fraction)
-            if (
-                status['state'] != 'Checking'
-                and self.piecesbar.get_pieces() != status['pieces']
-            ):
+            if self.pieces_key not in status:
+                # An older daemon without the pieces_rle key.
+                self.pieces_key = 'pieces'
+            elif status['state'] == 'Checking':
                 # Skip pieces assignment if checking torrent.
+                pass
+            elif self.pieces_key == 'pieces':
                 self.piecesbar.set_pieces(status['pieces'], status['num_pieces'])
+            elif self.piecesbar.get_pieces() != (status['pieces_rle'] or ()):
+                self.piecesbar.set_pieces_rle(
+                    status['pieces_rle'], status['num_pieces']
+                )
             self.piecesbar.update()
         else:
             if self.progressbar.get_fraction() != fraction:
                 self.progressbar.set_fraction(fraction)
 
+    def stop(self):
+        self.pieces_key = 'pieces_rle'
+
     def on_show_piecesbar_config_changed(self, key, show):
         if show:
             self.show_piecesbar()
@@ -19,7 +19,12 @@
 from deluge.common import get_localhost_auth
 from deluge.config import Config
 from deluge.configmanager import get_config_dir
-from deluge.ui.client import Client, client
+from deluge.ui.client import (
+    UNIX_HOST_PREFIX,
+    Client,
+    client,
+    get_unix_socket_path,
+)
 
 log = logging.getLogger(__name__)
 
@@ -28,6 +33,11 @@
 LOCALHOST = ('127.0.0.1', 'localhost')
 
 
+def is_localhost(hostname):
+    """Checks if hostname is the local host, including a Unix domain socket."""
+    return hostname in LOCALHOST or bool(get_unix_socket_path(hostname))
+
+
 def default_hostlist():
     """Create a new hosts key for hostlist with a localhost entry"""
     host_id = uuid.uuid4().hex
@@ -39,17 +49,22 @@ def validate_host_info(hostname, port):
     """Checks that hostname and port are valid.
 
     Args:
-        hostname (str): The IP or hostname of the deluge daemon.
+        hostname (str): The IP or hostname of the deluge daemon, or
+            ``unix:/path`` for the Unix domain socket of a local daemon.
         port (int): The port of the deluge daemon.
 
     Raises:
         ValueError: Host details are not valid with reason.
     """
 
-    try:
-        gethostbyname(hostname)
-    except gaierror as ex:
-        raise ValueError('Host %s: %s', hostname, ex.args[1])
+    if hostname.startswith(UNIX_HOST_PREFIX):
+        if not get_unix_socket_path(hostname):
+            raise ValueError('Host %s: Missing socket path', hostname)
+    else:
+        try:
+            gethostbyname(hostname)
+        except gaierror as ex:
+            raise ValueError('Host %s: %s', hostname, ex.args[1])
 
     if not isinstance(port, int):
         raise ValueError('Invalid port. Must be an integer')
@@ -81,7 +96,7 @@ def migrate_config_2_to_3(config):
         # Nothing to do here, there's no auth file
         return
     for idx, (__, host, __, username, __) in enumerate(config['hosts'][:]):
-        if host in LOCALHOST and not username:
+        if is_localhost(host) and not username:
             config['hosts'][idx][3] = localclient_username
             config['hosts'][idx][4] = localclient_password
     return config
@@ -138,7 +153,7 @@ def add_host(self, hostname, port, username, password):
         """
         if (
             not password and not username or username == 'localclient'
-        ) and hostname in LOCALHOST:
+        ) and is_localhost(hostname):
             username, password = get_localhost_auth()
 
         validate_host_info(hostname, port)
@@ -209,16 +224,19 @@ def on_connect_failed(reason, host_id):
             log.warning('Problem getting host_id info from hostlist')
             return defer.succeed(status_offline)
 
-        try:
-            ip = gethostbyname(host)
-        except gaierror as ex:
-            log.error('Error resolving host %s to ip: %s', host, ex.args[1])
-            return defer.succeed(status_offline)
+        if get_unix_socket_path(host):
+            ip = host
+        else:
+            try:
+                ip = gethostbyname(host)
+            except gaierror as ex:
+                log.error('Error resolving host %s to ip: %s', host, ex.args[1])
+                return defer.succeed(status_offline)
 
         host_conn_info = (
             ip,
             port,
-            'localclient' if not user and host in LOCALHOST else user,
+            'localclient' if not user and is_localhost(host) else user,
         )
         if client.connected() and host_conn_info == client.connection_info():
             # Currently connected to host_id daemon.
@@ -251,7 +269,7 @@ def update_host(self, host_id, hostname, port, username, password):
 
         if (
             not password and not username or username == 'localclient'
-        ) and hostname in LOCALHOST:
+        ) and is_localhost(hostname):
             username, password = get_localhost_auth()
 
         for idx, host_entry in enumerate(self.config['hosts']):
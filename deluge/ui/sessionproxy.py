@@ -27,6 +27,10 @@ class SessionProxy(component.Component):
     It will query the Core for only changes in the status of the torrents
     and will try to satisfy client requests from the cache.
 
+    If the daemon supports it, the requested keys are subscribed to with
+    `core.subscribe_status` and the cache is kept up to date by the pushed
+    TorrentsStatusChangedEvent, so subscribed keys never need to be fetched.
+
     """
 
     def __init__(self):
@@ -43,12 +47,24 @@ def __init__(self):
         # Holds the time of the last key update.. {torrent_id: {key1, time, ...}, ...}
         self.cache_times = {}
 
+        # The subscribed status keys, and those the daemon pushes changes of.
+        # The other subscribed keys, e.g. of plugins, still expire.
+        self.subscribed_keys = set()
+        self.pushed_keys = set()
+        # Set to False if the daemon does not support status subscriptions.
+        self.subscriptions_supported = True
+        # The minimum time in seconds between pushed status updates.
+        self.subscription_interval = 1
+
     def start(self):
         client.register_event_handler(
             'TorrentStateChangedEvent', self.on_torrent_state_changed
         )
         client.register_event_handler('TorrentRemovedEvent', self.on_torrent_removed)
         client.register_event_handler('TorrentAddedEvent', self.on_torrent_added)
+        client.register_event_handler(
+            'TorrentsStatusChangedEvent', self.on_torrents_status_changed
+        )
 
         def on_get_session_state(torrent_ids):
             for torrent_id in torrent_ids:
@@ -66,7 +82,67 @@ def stop(self):
         )
         client.deregister_event_handler('TorrentRemovedEvent', self.on_torrent_removed)
         client.deregister_event_handler('TorrentAddedEvent', self.on_torrent_added)
+        client.deregister_event_handler(
+            'TorrentsStatusChangedEvent', self.on_torrents_status_changed
+        )
         self.torrents = {}
+        self.subscribed_keys = set()
+        self.pushed_keys = set()
+        self.subscriptions_supported = True
+
+    def is_key_expired(self, torrent_id, key, t):
+        """
+        Checks if the cached value of a status key needs to be fetched.
+
+        :param torrent_id: the torrent_id
+        :type torrent_id: string
+        :param key: the status key
+        :type key: string
+        :param t: the current time
+        :type t: float
+
+        :returns: True if the cached value is expired
+        :rtype: bool
+
+        """
+        if key in self.pushed_keys:
+            return False
+        return t - self.cache_times[torrent_id].get(key, 0.0) > self.cache_time
+
+    def subscribe_status(self, keys):
+        """
+        Subscribe to changes of the status keys in addition to the already
+        subscribed keys.
+
+        :param keys: the status keys
+        :type keys: list of strings
+
+        :returns: a Deferred firing when subscribed, or when the daemon does not
+            support subscriptions
+        :rtype: Deferred
+
+        """
+        keys = self.subscribed_keys.union(keys)
+
+        def on_subscribed(result):
+            self.subscribed_keys = keys
+            self.on_torrents_status_changed(result)
+            d = client.core.get_pushed_status_keys(sorted(keys))
+            return d.addCallbacks(on_pushed_keys, on_pushed_keys_failed)
+
+        def on_pushed_keys(pushed_keys):
+            self.pushed_keys = set(pushed_keys)
+
+        def on_pushed_keys_failed(failure):
+            log.debug('Unable to get the pushed status keys: %s', failure)
+            self.pushed_keys = set()
+
+        def on_subscribe_failed(failure):
+            log.debug('Status subscriptions not supported by daemon: %s', failure)
+            self.subscriptions_supported = False
+
+        d = client.core.subscribe_status({}, sorted(keys), self.subscription_interval)
+        return d.addCallbacks(on_subscribed, on_subscribe_failed)
 
     def create_status_dict(self, torrent_ids, keys):
         """
@@ -135,11 +211,9 @@ def get_torrent_status(self, torrent_id, keys):
             if not keys:
                 keys = list(self.torrents[torrent_id][1])
 
+            t = time()
             for key in keys:
-                if (
-                    time() - self.cache_times[torrent_id].get(key, 0.0)
-                    > self.cache_time
-                ):
+                if self.is_key_expired(torrent_id, key, t):
                     keys_to_get.append(key)
             if not keys_to_get:
                 return succeed(self.create_status_dict([torrent_id], keys)[torrent_id])
@@ -210,17 +284,15 @@ def on_status(result, torrent_ids, keys):
         def find_torrents_to_fetch(torrent_ids):
             to_fetch = []
             t = time()
+            subscribed = keys and self.pushed_keys.issuperset(keys)
             for torrent_id in torrent_ids:
                 torrent = self.torrents[torrent_id]
-                if t - torrent[0] > self.cache_time:
+                if t - torrent[0] > self.cache_time and not subscribed:
                     to_fetch.append(torrent_id)
                 else:
                     # We need to check if a key is expired
                     for key in keys:
-                        if (
-                            t - self.cache_times[torrent_id].get(key, 0.0)
-                            > self.cache_time
-                        ):
+                        if self.is_key_expired(torrent_id, key, t):
                             to_fetch.append(torrent_id)
                             break
 
@@ -228,6 +300,18 @@ def find_torrents_to_fetch(torrent_ids):
 
         # -----------------------------------------------------------------------
 
+        if (
+            keys
+            and self.subscriptions_supported
+            and not self.subscribed_keys.issuperset(keys)
+            and not client.is_standalone()
+            and (not filter_dict or list(filter_dict) == ['id'])
+        ):
+            d = self.subscribe_status(keys)
+            return d.addCallback(
+                lambda result: self.get_torrents_status(filter_dict, keys)
+            )
+
         if not filter_dict:
             # This means we want all the torrents status
             # We get a list of any torrent_ids with expired status dicts
@@ -255,6 +339,17 @@ def find_torrents_to_fetch(torrent_ids):
             d = client.core.get_torrents_status(filter_dict, keys, True)
             return d.addCallback(on_status, None, keys)
 
+    def on_torrents_status_changed(self, status):
+        t = time()
+        for torrent_id, torrent_status in status.items():
+            if torrent_status is None or torrent_id not in self.torrents:
+                # The torrent was removed or not yet added to the cache.
+                continue
+            self.torrents[torrent_id][0] = t
+            self.torrents[torrent_id][1].update(torrent_status)
+            for key in torrent_status:
+                self.cache_times[torrent_id][key] = t
+
     def on_torrent_state_changed(self, torrent_id, state):
         if torrent_id in self.torrents:
             self.torrents[torrent_id][1].setdefault('state', state)
@@ -25,7 +25,7 @@
 from deluge import component, httpdownloader
 from deluge.common import AUTH_LEVEL_DEFAULT, get_magnet_info, is_magnet
 from deluge.configmanager import get_config_dir
-from deluge.error import NotAuthorizedError
+from deluge.error import NotAuthorizedError, WrappedException
 from deluge.i18n import get_languages
 from deluge.ui.client import Client, client
 from deluge.ui.common import FileTree2, TorrentInfo
@@ -385,6 +385,11 @@ def __init__(self):
         self.hostlist = HostList()
         self.core_config = CoreConfig()
         self.event_queue = EventQueue()
+        # The last filter tree with its version, refetched only if changed.
+        self.filter_tree = None
+        self.filter_tree_version = -1
+        # Set to False if the daemon does not support filter tree updates.
+        self.filter_tree_updates = True
         try:
             self.sessionproxy = component.get('SessionProxy')
         except KeyError:
@@ -443,6 +448,9 @@ def _on_client_disconnect(self, *args):
         return self.stop()
 
     def start(self):
+        self.filter_tree = None
+        self.filter_tree_version = -1
+        self.filter_tree_updates = True
         self.core_config.start()
         return self.sessionproxy.start()
 
@@ -532,8 +540,12 @@ def got_stats(stats):
                 'has_incoming_connections'
             ]
 
-        def got_filters(filters):
-            ui_info['filters'] = filters
+        def got_filters(result):
+            version, filters = result
+            if filters is not None:
+                self.filter_tree_version = version
+                self.filter_tree = filters
+            ui_info['filters'] = self.filter_tree
 
         def got_free_space(free_space):
             ui_info['stats']['free_space'] = free_space
@@ -550,8 +562,26 @@ def on_complete(result):
         d1 = component.get('SessionProxy').get_torrents_status(filter_dict, keys)
         d1.addCallback(got_torrents)
 
-        d2 = client.core.get_filter_tree()
-        d2.addCallback(got_filters)
+        def on_filters_failed(failure):
+            if (
+                failure.check(WrappedException)
+                and failure.value.type == 'AttributeError'
+                and failure.value.message.endswith('core.get_filter_tree_update')
+            ):
+                # Older daemon without filter tree updates.
+                log.debug('Daemon does not support filter tree updates')
+                self.filter_tree_updates = False
+                return client.core.get_filter_tree().addCallback(get_filters)
+            return failure
+
+        def get_filters(filters):
+            got_filters((-1, filters))
+
+        if self.filter_tree_updates:
+            d2 = client.core.get_filter_tree_update(self.filter_tree_version)
+            d2.addCallbacks(got_filters, on_filters_failed)
+        else:
+            d2 = client.core.get_filter_tree().addCallback(get_filters)
 
         d3 = client.core.get_session_status(
             [